@@ -0,0 +1,64 @@
+"""
+Measures the peak memory and time of converting a large synthetic json trace to perfetto with
+`tools/json_to_perfetto.py convert`, compared with just loading the same trace with `json.load`
+
+    python benchmarks/convert_memory.py [event_count] [jobs]
+"""
+
+from os import path
+import resource
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from trace_events.events import CompleteEvent
+from trace_events.writer import TraceWriter
+
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+CONVERTER = path.join(ROOT, 'tools', 'json_to_perfetto.py')
+
+
+def write_trace(file_path: str, event_count: int):
+    with open(file_path, 'w') as file:
+        writer = TraceWriter(file, compact=True)
+        for index in range(event_count):
+            writer.write_event(CompleteEvent(
+                f'module.function_{index % 100}', index * 1.37, 0.91,
+                process_id=1, thread_id=index % 8))
+        writer.close()
+
+
+def measure(command: list) -> tuple:
+    """ Runs a command, returning its wall time in seconds and peak resident memory in MB """
+    before = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    start = perf_counter()
+    subprocess.run(command, check=True)
+    elapsed = perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return elapsed, max(peak, before) / 1024
+
+
+def main():
+    event_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    with TemporaryDirectory() as directory:
+        json_path = path.join(directory, 'trace.json')
+        perfetto_path = path.join(directory, 'trace.pftrace')
+        write_trace(json_path, event_count)
+        print(f'{event_count} events, {path.getsize(json_path) / 2 ** 20:.0f} MB of json')
+
+        # Measured first, since RUSAGE_CHILDREN only reports the largest child so far
+        elapsed, peak = measure([
+            sys.executable, CONVERTER, 'convert', '--jobs', str(jobs), json_path, perfetto_path])
+        print(f'convert -j {jobs}: {elapsed:6.1f}s, {peak:7.0f} MB peak, {path.getsize(perfetto_path) / 2 ** 20:.0f} MB written')
+
+        elapsed, peak = measure([
+            sys.executable, '-c', f'import json; json.load(open({json_path!r}))'])
+        print(f'json.load:  {elapsed:6.1f}s, {peak:7.0f} MB peak')
+
+
+if __name__ == '__main__':
+    main()
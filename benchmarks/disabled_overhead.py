@@ -0,0 +1,51 @@
+"""
+Measures the per-call overhead of decorated functions while tracing is disabled at runtime, compared
+with an undecorated function and with tracing enabled
+
+    python benchmarks/disabled_overhead.py
+"""
+
+from timeit import timeit
+
+import trace_events
+from trace_events.profiler import global_profiler
+
+
+CALL_COUNT = 1_000_000
+
+
+def plain():
+    pass
+
+
+@trace_events.profile
+def profiled():
+    pass
+
+
+@trace_events.counter(topic='counted')
+def counted():
+    pass
+
+
+def measure(func) -> float:
+    """ Returns the time per call in nanoseconds """
+    return timeit(func, number=CALL_COUNT) / CALL_COUNT * 1e9
+
+
+if __name__ == '__main__':
+    trace_events.init_trace(disable=True, save_at_exit=False)
+
+    baseline = measure(plain)
+    print(f'{"undecorated":22} {baseline:7.1f} ns/call')
+
+    for name, func in (('profile', profiled), ('counter', counted)):
+        trace_events.disable_trace()
+        disabled = measure(func)
+        print(f'{name + " (disabled)":22} {disabled:7.1f} ns/call  (+{disabled - baseline:.1f} ns)')
+
+        trace_events.enable_trace()
+        enabled = measure(func)
+        print(f'{name + " (enabled)":22} {enabled:7.1f} ns/call  (+{enabled - baseline:.1f} ns)')
+
+        global_profiler().reset()
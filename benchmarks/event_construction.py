@@ -0,0 +1,67 @@
+"""
+Measures the cost of constructing trace events: retained memory blocks and bytes per event, and
+constructor time per event
+
+    python benchmarks/event_construction.py
+"""
+
+from timeit import timeit
+import tracemalloc
+
+from trace_events.events import CompleteEvent, CounterEvent
+
+
+EVENT_COUNT = 100_000
+
+
+def make_complete_event(index: int):
+    return CompleteEvent('foo', float(index), 1.0)
+
+
+def make_complete_event_with_ids(index: int):
+    """ Matches the profiler, which supplies the process and thread ids """
+    return CompleteEvent('foo', float(index), 1.0, process_id=1, thread_id=2)
+
+
+def make_counter_event(index: int):
+    return CounterEvent('foo', float(index))
+
+
+def make_counter_event_with_ids(index: int):
+    return CounterEvent('foo', float(index), process_id=1, thread_id=2)
+
+
+def measure_memory(factory) -> tuple:
+    """ Returns (allocated blocks, allocated bytes) retained per event """
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    events = [factory(index) for index in range(EVENT_COUNT)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+
+    # The list holding the events is not part of the per-event cost
+    del events
+    return blocks / EVENT_COUNT, size / EVENT_COUNT
+
+
+def measure_time(factory) -> float:
+    """ Returns the constructor time per event in nanoseconds """
+    seconds = timeit(lambda: factory(0), number=EVENT_COUNT)
+    return seconds / EVENT_COUNT * 1e9
+
+
+if __name__ == '__main__':
+    benchmarks = (
+        ('CompleteEvent', make_complete_event),
+        ('CompleteEvent(ids)', make_complete_event_with_ids),
+        ('CounterEvent', make_counter_event),
+        ('CounterEvent(ids)', make_counter_event_with_ids))
+
+    for name, factory in benchmarks:
+        blocks, size = measure_memory(factory)
+        nanoseconds = measure_time(factory)
+        print(f'{name:18} {blocks:6.2f} blocks/event  {size:7.1f} bytes/event  {nanoseconds:7.1f} ns/event')
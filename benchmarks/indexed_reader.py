@@ -0,0 +1,56 @@
+"""
+Measures reading a small time window out of a large trace with `IndexedTraceReader`: building the
+index, opening the saved index, and the query itself, against loading the whole trace
+
+    python benchmarks/indexed_reader.py [event_count]
+"""
+
+from os import path
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from trace_events.events import CompleteEvent
+from trace_events.loader import load_trace
+from trace_events.reader import IndexedTraceReader
+from trace_events.writer import TraceWriter
+
+
+def write_trace(file_path: str, event_count: int):
+    with open(file_path, 'w') as file:
+        writer = TraceWriter(file)
+        # One long event spanning the trace, as the outermost function of a profile would
+        writer.write_event(CompleteEvent('main', 0.0, event_count * 1.37, process_id=1, thread_id=1))
+        for index in range(event_count - 1):
+            writer.write_event(CompleteEvent(
+                f'module.function_{index % 100}', index * 1.37, 0.91, process_id=1,
+                thread_id=index % 4))
+        writer.close()
+
+
+def timed(label: str, func):
+    start = perf_counter()
+    result = func()
+    print(f'{label:>24}: {perf_counter() - start:8.4f}s')
+    return result
+
+
+def main():
+    event_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    window_start = event_count * 1.37 / 2
+
+    with TemporaryDirectory() as directory:
+        file_path = path.join(directory, 'trace.json')
+        write_trace(file_path, event_count)
+
+        timed('load_trace', lambda: load_trace(file_path))
+        timed('build index', lambda: IndexedTraceReader(file_path).close())
+        reader = timed('open saved index', lambda: IndexedTraceReader(file_path))
+        with reader:
+            events = timed('query 1000us window', lambda: list(reader.events(window_start, window_start + 1000.0)))
+            timed('query window, thread', lambda: list(reader.events(window_start, window_start + 1000.0, 1)))
+        print(f'{len(events)} events in the window')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Measures the time to load a saved trace with the generic `TraceJsonDecoder` object hook, and with
+the dispatching loader as event objects and as columns
+
+    python benchmarks/load_trace.py [event_count]
+"""
+
+from json import load
+from os import path
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from trace_events.events import CompleteEvent, CounterEvent
+from trace_events.json import TraceJsonDecoder
+from trace_events.loader import load_trace
+from trace_events.writer import TraceWriter
+
+
+def write_trace(file_path: str, event_count: int):
+    with open(file_path, 'w') as file:
+        writer = TraceWriter(file)
+        for index in range(event_count):
+            if index % 10:
+                writer.write_event(CompleteEvent(
+                    f'module.function_{index % 100}', index * 1.37, 0.91, process_id=1, thread_id=2))
+            else:
+                writer.write_event(CounterEvent(
+                    'calls', index * 1.37, process_id=1, thread_id=2, args=dict(calls=index)))
+        writer.close()
+
+
+def decode(file_path: str):
+    with open(file_path) as file:
+        return load(file, cls=TraceJsonDecoder)
+
+
+def main():
+    event_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with TemporaryDirectory() as directory:
+        file_path = path.join(directory, 'trace.json')
+        write_trace(file_path, event_count)
+
+        for label, func in (
+                ('TraceJsonDecoder', lambda: decode(file_path)),
+                ('load_trace', lambda: load_trace(file_path)),
+                ('load_trace raw', lambda: load_trace(file_path, raw=True))):
+            start = perf_counter()
+            trace = func()
+            elapsed = perf_counter() - start
+            assert len(trace.events) == event_count
+            print(f'{label:>16}: {elapsed:6.2f}s, {elapsed / event_count * 1e6:5.2f} us/event')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Measures the time and peak memory of merging many per-process trace files into one
+
+    python benchmarks/merge_traces.py [file_count] [events_per_file]
+"""
+
+from os import path
+import resource
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from trace_events.events import CompleteEvent
+from trace_events.merge import merge_traces
+from trace_events.writer import TraceWriter
+
+
+def write_trace(file_path: str, process_id: int, event_count: int):
+    with open(file_path, 'w') as file:
+        writer = TraceWriter(file)
+        for index in range(event_count):
+            writer.write_event(CompleteEvent(
+                f'module.function_{index % 100}', index * 1.37, 0.91, process_id=process_id,
+                thread_id=process_id))
+        start_ns = 1_700_000_000_000_000_000 + process_id * 1_000_000
+        writer.close(dict(start_ns=start_ns, clock_anchor=dict(clock='realtime', clock_ns=start_ns, realtime_ns=start_ns)))
+
+
+def main():
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    event_count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    with TemporaryDirectory() as directory:
+        file_paths = [path.join(directory, f'trace-{index}.json') for index in range(file_count)]
+        for index, file_path in enumerate(file_paths):
+            write_trace(file_path, index, event_count)
+
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = perf_counter()
+        merge_traces(file_paths, path.join(directory, 'merged.json'))
+        elapsed = perf_counter() - start
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(f'merged {file_count} files of {event_count} events in {elapsed:.2f}s, '
+          f'peak memory grew by {(after - before) / 1024:.1f}MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Measures the size and write time of a saved trace for each output format: the default json, compact
+json with rounded timestamps, and compressed files
+
+    python benchmarks/output_size.py
+"""
+
+from os import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from trace_events.profiler import Profiler
+
+
+EVENT_COUNT = 200_000
+
+FORMATS = [
+    ('json', 'trace.json', dict()),
+    ('compact', 'trace.json', dict(compact=True)),
+    ('compact, us', 'trace.json', dict(compact=True, timestamp_precision=0)),
+    ('gzip', 'trace.json.gz', dict()),
+    ('compact, us, gzip', 'trace.json.gz', dict(compact=True, timestamp_precision=0)),
+    ('compact, us, bz2', 'trace.json.bz2', dict(compact=True, timestamp_precision=0)),
+    ('compact, us, xz', 'trace.json.xz', dict(compact=True, timestamp_precision=0)),
+]
+
+
+def record(profiler: Profiler):
+    start_ns = profiler.start_ns
+    for index in range(EVENT_COUNT):
+        timestamp = start_ns + index * 1370
+        profiler._add_complete_event(f'module.function_{index % 50}', timestamp, timestamp + 910)
+
+
+def main():
+    with TemporaryDirectory() as directory:
+        for label, file_name, options in FORMATS:
+            profiler = Profiler(path.join(directory, label.replace(', ', '-'), file_name), **options)
+            record(profiler)
+
+            start = perf_counter()
+            file_path = profiler.save_trace()
+            elapsed = perf_counter() - start
+
+            size = path.getsize(file_path)
+            print(f'{label:>18}: {size / EVENT_COUNT:6.1f} bytes/event, {elapsed:5.2f}s')
+
+
+if __name__ == '__main__':
+    main()
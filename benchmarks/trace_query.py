@@ -0,0 +1,55 @@
+"""
+Measures `Trace.query` against a linear scan of the events: building the indexes on first use, then
+filter, time window and slowest event queries
+
+    python benchmarks/trace_query.py [event_count]
+"""
+
+import sys
+from time import perf_counter
+
+from trace_events.events import CompleteEvent
+from trace_events.trace import Trace
+
+
+def make_trace(event_count: int) -> Trace:
+    events = [CompleteEvent('main', 0.0, event_count * 1.37, process_id=1, thread_id=0)]
+    for index in range(event_count - 1):
+        events.append(CompleteEvent(
+            f'module.function_{index % 1000}', index * 1.37, 0.5 + (index * 7919 % 1000) / 100,
+            process_id=1, thread_id=index % 8))
+    return Trace(events)
+
+
+def timed(label: str, func, repeat: int = 1):
+    start = perf_counter()
+    for _ in range(repeat):
+        result = func()
+    print(f'{label:>32}: {(perf_counter() - start) / repeat * 1e3:10.3f}ms')
+    return result
+
+
+def main():
+    event_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    trace = make_trace(event_count)
+    events = trace.events
+    query = trace.query()
+    start = event_count * 1.37 / 2
+    end = start + 1000.0
+
+    def scan():
+        return [event for event in events if event.name == 'module.function_7' and event.thread_id == 7
+                and event.start_time <= end and event.start_time + event.duration >= start]
+
+    expected = timed('linear scan', scan)
+    timed('first query, builds indexes', lambda: query.select(name='module.function_7', thread_id=7, start=start, end=end))
+    result = timed('name, thread and window', lambda: query.select(name='module.function_7', thread_id=7, start=start, end=end), 100)
+    assert result == expected
+    timed('window', lambda: query.overlapping(start, end), 100)
+    timed('first slowest, sorts durations', lambda: query.slowest(10))
+    timed('slowest 10', lambda: query.slowest(10), 100)
+    timed('slowest 10 of a thread', lambda: query.slowest(10, thread_id=3), 100)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Measures event serialization throughput: the generic `TraceJsonEncoder` against `TraceEncoder` with
+each backend, and a whole `TraceWriter` to a file
+
+    python benchmarks/write_trace.py [event_count]
+"""
+
+from os import devnull
+import sys
+from time import perf_counter
+
+from trace_events.encoder import TraceEncoder, orjson
+from trace_events.events import CompleteEvent, CounterEvent
+from trace_events.json import TraceJsonEncoder
+from trace_events.writer import TraceWriter
+
+
+def make_events(event_count: int):
+    events = []
+    for index in range(event_count):
+        if index % 10:
+            events.append(CompleteEvent(
+                f'module.function_{index % 100}', index * 1.37, 0.91, process_id=1234,
+                thread_id=139816706759552))
+        else:
+            events.append(CounterEvent(
+                'calls', index * 1.37, process_id=1234, thread_id=139816706759552,
+                args=dict(calls=index)))
+    return events
+
+
+def write(events, **options):
+    with open(devnull, 'w') as file:
+        writer = TraceWriter(file, **options)
+        writer.write_events(events)
+        writer.close()
+
+
+def main():
+    event_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    events = make_events(event_count)
+
+    encoders = [
+        ('TraceJsonEncoder', TraceJsonEncoder().encode),
+        ('TraceEncoder', TraceEncoder().encode_event),
+        ('compact json', TraceEncoder(compact=True, backend='json').encode_event),
+    ]
+    if orjson is not None:
+        encoders.append(('compact orjson', TraceEncoder(compact=True, backend='orjson').encode_event))
+
+    runs = [(label, lambda encode=encode: list(map(encode, events))) for label, encode in encoders]
+    runs.append(('TraceWriter', lambda: write(events)))
+    runs.append(('TraceWriter compact', lambda: write(events, compact=True)))
+
+    for label, func in runs:
+        start = perf_counter()
+        func()
+        elapsed = perf_counter() - start
+        print(f'{label:>20}: {elapsed:6.2f}s, {event_count / elapsed / 1e6:5.2f}M events/s')
+
+
+if __name__ == '__main__':
+    main()
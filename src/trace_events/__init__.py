@@ -11,19 +11,73 @@ __version__ = '0.1.0'
 
 import atexit
 from logging import Logger
-
-from .context import init_context as _init_context, global_context as _global_context
-from .profiler import Profiler, global_profiler as _global_profiler, counter, exit_counter, profile
+import signal
+from threading import Lock, Thread
+
+from .context import init_context as _init_context, global_context as _global_context, trace_switch as _switch
+from .sampling import AdaptiveSampler, CountSampler, ProbabilitySampler, Sampler
+from .profiler import (
+    Profiler, configure_global_profiler as _configure_global_profiler,
+    global_profiler as _global_profiler, counter, exit_counter, profile)
 from .timer import EventTimer, timeit
+from .loader import load_trace
+from .reader import IndexedTraceReader
 from .utils import get_environ_flag as _get_environ_flag
+from .workers import WorkerTraces
+from .writer import TraceWriter, recover_trace_file
+
+
+_signal_save_lock = Lock()
 
 
 def _save_at_exit():
     """Save the global profiler trace, registered with atexit"""
 
     context = _global_context()
+    profiler = _global_profiler()
+    if not context.enabled and not profiler.has_events:
+        return
+    if profiler.shard_id is not None and not profiler.has_events:
+        # A forked child which recorded nothing, e.g. a subprocess about to exec
+        return
+
     file_path = context.trace_file_path(context.global_trace_file_name)
-    _global_profiler().save_trace(file_path)
+    profiler.save_trace(file_path)
+
+
+def _save_serially():
+    """ Save the global profiler trace, one save at a time when signals arrive in a burst """
+    with _signal_save_lock:
+        _save_at_exit()
+
+
+def _save_on_signal(signum, frame):
+    """
+    Save the global profiler trace, installed as a signal handler. The handler runs on the main thread
+    between two bytecodes, possibly while it holds a profiler lock, so the trace is saved from another
+    thread
+    """
+    Thread(target=_save_serially, name='trace-events-save').start()
+
+
+def _toggle_on_signal(signum, frame):
+    """ Toggle tracing, installed as a signal handler """
+    _switch.enabled = not _switch.enabled
+
+
+def enable_trace() -> None:
+    """ Enables tracing at runtime, including for functions decorated while tracing was disabled """
+    _global_context().enabled = True
+
+
+def disable_trace() -> None:
+    """ Disables tracing at runtime, decorated functions then only pay for a single flag check """
+    _global_context().enabled = False
+
+
+def is_trace_enabled() -> bool:
+    """ Returns whether tracing is currently enabled """
+    return _global_context().enabled
 
 
 def init_trace(
@@ -33,17 +87,46 @@ def init_trace(
     trace_file_name: str = "trace.json",
     save_at_exit: bool = True,
     overwrite_trace_files: bool = False,
+    columnar_storage: bool = False,
+    max_events: int | None = None,
+    max_age: float | None = None,
+    min_duration: float | None = None,
+    statistics: bool = False,
+    stream: bool = False,
+    compact: bool = False,
+    timestamp_precision: int | None = None,
+    clock: str = 'perf',
+    save_signal: int | None = None,
+    toggle_signal: int | None = None,
+    sampler: Sampler | None = None,
     logger: Logger | None = None
 ) -> None:
-    """Initializes global tracing. The `disable` controls will prevent any tracing decorators from
-    inserting tracing to functions they wrap
+    """Initializes global tracing. The `disable` controls set whether tracing starts disabled, it can
+    be switched at runtime with `enable_trace`, `disable_trace` or the `toggle_signal`
 
     :param disable: Flag that will entirely disable tracing
     :param disable_env_var: Name of an environment variable to fall back on when `disable` param is not given
     :param trace_file_dir: Path to a directory prepended to file names when saving traces
-    :param trace_file_name: Name of the global trace file
+    :param trace_file_name: Name of the global trace file, compressed when ending with `.gz`, `.bz2`,
+        `.xz` or `.zst`, and written in the perfetto protobuf format when ending with `.pftrace`
     :param save_at_exit: Flag to enable saving the global trace atexit, defaults to `True`
     :param overwrite_trace_files: Flag to enable overwriting existing trace files, defaults to `False`
+    :param columnar_storage: Flag to store events in compact typed array columns, defaults to `False`
+    :param max_events: Flight recorder mode, retain only the last `max_events` events per thread
+    :param max_age: Flight recorder mode, retain only events from the last `max_age` seconds, and at
+        most 100,000 events per thread unless `max_events` is given
+    :param min_duration: Spans shorter than `min_duration` seconds are only recorded as aggregates
+    :param statistics: Flag to record per-function latency histograms instead of a timeline
+    :param stream: Flag to write events to the trace file in batches while recording
+    :param compact: Flag to write json without whitespace between event fields
+    :param timestamp_precision: Number of decimal places of a microsecond kept in written timestamps,
+        e.g. `0` for whole microseconds
+    :param clock: Clock timestamps are read from, one of `perf`, `monotonic`, `boottime` or `realtime`,
+        defaults to `perf`
+    :param save_signal: Optional signal number which saves the global trace when received, e.g.
+        `signal.SIGUSR1` to dump the flight recorder window on demand
+    :param toggle_signal: Optional signal number which toggles tracing on and off when received
+    :param sampler: Default sampler for decorated functions, each function gets its own copy
     :param logger: Optional logger
     """
 
@@ -63,14 +146,32 @@ def init_trace(
         trace_file_dir=trace_file_dir,
         global_trace_file_name=trace_file_name,
         overwrite_trace_files=overwrite_trace_files,
+        columnar_storage=columnar_storage,
+        max_events=max_events,
+        max_age=max_age,
+        min_duration=min_duration,
+        statistics=statistics,
+        stream=stream,
+        compact=compact,
+        timestamp_precision=timestamp_precision,
+        clock=clock,
+        sampler=sampler,
         logger=logger)
 
-    if not enabled:
-        return
+    _configure_global_profiler()
 
     if save_at_exit:
         atexit.register(_save_at_exit)
 
+    if save_signal is not None:
+        signal.signal(save_signal, _save_on_signal)
+
+    if toggle_signal is not None:
+        signal.signal(toggle_signal, _toggle_on_signal)
+
 
 __all__ = [Profiler, EventTimer, init_trace,
-           counter, exit_counter, profile, timeit]
+           enable_trace, disable_trace, is_trace_enabled,
+           counter, exit_counter, profile, timeit,
+           AdaptiveSampler, CountSampler, ProbabilitySampler, Sampler,
+           IndexedTraceReader, TraceWriter, WorkerTraces, load_trace, recover_trace_file]
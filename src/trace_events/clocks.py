@@ -0,0 +1,76 @@
+from functools import partial
+import socket
+import time
+import typing as t
+
+
+ClockFunction = t.Callable[[], int]
+
+
+def _clock_gettime_ns(clock_name: str) -> ClockFunction | None:
+    clock_id = getattr(time, clock_name, None)
+    return partial(time.clock_gettime_ns, clock_id) if clock_id is not None else None
+
+
+_clocks: t.Dict[str, ClockFunction | None] = {
+    'perf': time.perf_counter_ns,
+    'monotonic': time.monotonic_ns,
+    # Keeps counting while the system is suspended, Linux only
+    'boottime': _clock_gettime_ns('CLOCK_BOOTTIME'),
+    'realtime': time.time_ns,
+}
+
+CLOCK_SOURCES = tuple(_clocks)
+
+# Clocks read in every anchor, to map trace timestamps into any of them
+_ANCHOR_CLOCKS = ('monotonic', 'boottime', 'realtime')
+
+
+def clock_source(name: str) -> ClockFunction:
+    """ Returns a function reading the named clock in integer nanoseconds, see `CLOCK_SOURCES` """
+    if name not in _clocks:
+        raise ValueError(f'Unknown clock \'{name}\', expected one of {CLOCK_SOURCES}')
+
+    clock = _clocks[name]
+    if clock is None:
+        raise ValueError(f'The {name} clock is not available on this platform')
+    return clock
+
+
+def _read_boot_id() -> str | None:
+    """ Identifies the current boot on Linux, monotonic clocks are only comparable within one boot """
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+_boot_id = _read_boot_id()
+
+
+def clock_anchor(clock: str) -> dict:
+    """
+    Reads `clock` together with the monotonic, boottime and realtime clocks, all in integer
+    nanoseconds. The other clocks are read between two readings of `clock`, which is taken as their
+    midpoint, `uncertainty_ns` is the time between both
+
+    Two anchors map timestamps of `clock` into any of the other clocks, monotonic and boottime only
+    for traces of the same `host` and `boot_id`
+    """
+    read = clock_source(clock)
+    others = [(name, _clocks[name]) for name in _ANCHOR_CLOCKS if _clocks[name] is not None]
+
+    before = read()
+    readings = [(name, other()) for name, other in others]
+    after = read()
+
+    anchor = dict(clock=clock, clock_ns=(before + after) // 2, uncertainty_ns=after - before)
+    anchor.update((f'{name}_ns', value) for name, value in readings)
+    anchor['host'] = socket.gethostname()
+    if _boot_id is not None:
+        anchor['boot_id'] = _boot_id
+    return anchor
+
+
+__all__ = [CLOCK_SOURCES, ClockFunction, clock_anchor, clock_source]
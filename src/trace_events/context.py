@@ -1,25 +1,75 @@
 from os import getcwd, path
 from logging import Logger
 
+from .sampling import Sampler
+
+
+class TraceSwitch:
+    """
+    Runtime switch checked by every decorated function. Decorated functions hold a reference to the
+    single instance, so toggling it takes effect immediately, and a disabled call costs one attribute
+    check
+    """
+
+    __slots__ = ('enabled',)
+
+    enabled: bool
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+
+
+trace_switch = TraceSwitch()
+
 
 class Context:
     """ Context manages global configuration """
 
-    enabled: bool
     trace_file_dir: str
     global_trace_file_name: str
     overwrite_trace_files: bool
+    columnar_storage: bool
+    max_events: int | None
+    max_age: float | None
+    min_duration: float | None
+    statistics: bool
+    stream: bool
+    compact: bool
+    timestamp_precision: int | None
+    clock: str
+    sampler: Sampler | None
     logger: Logger | None
 
     def __init__(
             self, enabled: bool, trace_file_dir: str, global_trace_file_name: str,
-            overwrite_trace_files: bool, logger: Logger | None):
-        self.enabled = enabled or True
+            overwrite_trace_files: bool, columnar_storage: bool, max_events: int | None,
+            max_age: float | None, min_duration: float | None, statistics: bool, stream: bool,
+            compact: bool, timestamp_precision: int | None, clock: str, sampler: Sampler | None,
+            logger: Logger | None):
+        self.enabled = enabled
         self.trace_file_dir = trace_file_dir
         self.global_trace_file_name = global_trace_file_name
         self.overwrite_trace_files = overwrite_trace_files
+        self.columnar_storage = columnar_storage
+        self.max_events = max_events
+        self.max_age = max_age
+        self.min_duration = min_duration
+        self.statistics = statistics
+        self.stream = stream
+        self.compact = compact
+        self.timestamp_precision = timestamp_precision
+        self.clock = clock
+        self.sampler = sampler
         self.logger = logger
 
+    @property
+    def enabled(self) -> bool:
+        return trace_switch.enabled
+
+    @enabled.setter
+    def enabled(self, value: bool):
+        trace_switch.enabled = value
+
     def trace_file_path(self, file_name: str) -> str:
         return path.join(self.trace_file_dir, file_name)
 
@@ -32,6 +82,16 @@ def init_context(
         trace_file_dir: str | None = None,
         global_trace_file_name: str | None = None,
         overwrite_trace_files: bool = False,
+        columnar_storage: bool = False,
+        max_events: int | None = None,
+        max_age: float | None = None,
+        min_duration: float | None = None,
+        statistics: bool = False,
+        stream: bool = False,
+        compact: bool = False,
+        timestamp_precision: int | None = None,
+        clock: str = 'perf',
+        sampler: Sampler | None = None,
         logger: Logger | None = None):
 
     file_dir = trace_file_dir or getcwd()
@@ -45,10 +105,22 @@ def init_context(
         logger.debug(f'  trace_file_dir: {trace_file_dir}')
         logger.debug(f'  global_trace_file_name: {file_name}')
         logger.debug(f'  overwrite_trace_files: {overwrite_trace_files}')
+        logger.debug(f'  columnar_storage: {columnar_storage}')
+        logger.debug(f'  max_events: {max_events}')
+        logger.debug(f'  max_age: {max_age}')
+        logger.debug(f'  min_duration: {min_duration}')
+        logger.debug(f'  statistics: {statistics}')
+        logger.debug(f'  stream: {stream}')
+        logger.debug(f'  compact: {compact}')
+        logger.debug(f'  timestamp_precision: {timestamp_precision}')
+        logger.debug(f'  clock: {clock}')
+        logger.debug(f'  sampler: {sampler.to_json() if sampler else None}')
 
     global _gloabl_context
     _gloabl_context = Context(
-        enabled, file_dir, file_name, overwrite_trace_files, logger)
+        enabled, file_dir, file_name, overwrite_trace_files, columnar_storage, max_events,
+        max_age, min_duration, statistics, stream, compact, timestamp_precision,
+        clock, sampler, logger)
 
 
 def global_context() -> Context:
@@ -58,4 +130,4 @@ def global_context() -> Context:
     return _gloabl_context
 
 
-__all__ = [Context, init_context, global_context]
+__all__ = [Context, TraceSwitch, global_context, init_context, trace_switch]
@@ -0,0 +1,194 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
+from itertools import chain
+from json import loads
+import typing as t
+
+from .perfetto import PerfettoWriter
+from .stream import TraceEventReader
+
+
+# First line of traces written by `TraceWriter`, which are then one event per line
+_LINE_HEADER = '{"traceEvents": ['
+# Longest first event line read to check the layout, a longer one is parsed incrementally instead
+_MAX_FIRST_LINE = 1 << 20
+
+
+class _PrefixedFile:
+    """ Reads `prefix` before the rest of `file`, to put back a line read while sniffing the format """
+
+    _prefix: str
+    _file: t.TextIO
+
+    def __init__(self, prefix: str, file: t.TextIO):
+        self._prefix = prefix
+        self._file = file
+
+    def read(self, size: int = -1) -> str:
+        if not self._prefix:
+            return self._file.read(size)
+
+        prefix, self._prefix = self._prefix, ''
+        return prefix
+
+
+def _parse_line(line: str) -> dict | None:
+    """ Parses an event line written by `TraceWriter`, returning `None` for the closing lines """
+    line = line.strip()
+    if line.startswith(','):
+        line = line[1:]
+    if not line.startswith('{'):
+        return None
+    try:
+        return loads(line)
+    except ValueError:
+        raise ValueError(
+            'Unable to convert the trace, it starts with one event per line but then splits an event '
+            'over several lines') from None
+
+
+def _event_lines(file: t.TextIO) -> t.Iterator[str]:
+    """ Yields the event lines of a trace written by `TraceWriter`, once its header line is read """
+    for line in file:
+        if line.startswith(']'):
+            return
+        yield line
+
+
+def _read_events(json_file: t.TextIO) -> t.Tuple[t.Iterator[dict | str], bool]:
+    """
+    Returns the events of a trace and whether they are unparsed lines. Traces starting like those of
+    `TraceWriter` are split by line, unless their first event is not on a line of its own
+    """
+    # Limited, as a trace on a single line would otherwise be read whole
+    header = json_file.readline(len(_LINE_HEADER) + 2)
+    if header.strip() == _LINE_HEADER and header.endswith('\n'):
+        first = json_file.readline(_MAX_FIRST_LINE)
+        if first.startswith(']'):
+            return iter(()), True
+        try:
+            _parse_line(first)
+            return chain([first], _event_lines(json_file)), True
+        except ValueError:
+            header += first
+
+    return iter(TraceEventReader(_PrefixedFile(header, json_file))), False
+
+
+def _chunks(items: t.Iterable, chunk_size: int) -> t.Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_events(
+        writer: PerfettoWriter, events: t.Iterable[dict | str], skipped: t.Dict[str, int],
+        lines: bool = False):
+    for event in events:
+        if lines:
+            event = _parse_line(event)
+            if event is None:
+                continue
+
+        try:
+            writer.write_json_event(event)
+        except TypeError:
+            event_type = event.get('ph')
+            skipped[event_type] = skipped.get(event_type, 0) + 1
+
+
+def _encode_chunk(
+        events: t.List[dict | str], lines: bool, time_offset: float
+) -> t.Tuple[bytes, t.Dict[str, int]]:
+    """ Encodes one chunk of events as a self contained packet stream, run in the worker processes """
+    output = BytesIO()
+    skipped = dict()
+    # Every chunk starts its own interned state, and track uuids are derived from the process and
+    # thread ids, so the chunks can be concatenated in any number
+    writer = PerfettoWriter(output, len(events), time_offset=time_offset, stable_uuids=True)
+    _write_events(writer, events, skipped, lines)
+    writer.close()
+    return output.getvalue(), skipped
+
+
+def _first_timestamp(events: t.Iterable[dict | str], lines: bool) -> float:
+    for event in events:
+        if lines:
+            event = _parse_line(event)
+        if event is not None and 'ts' in event:
+            return event['ts']
+    return 0.0
+
+
+def json_to_perfetto(
+        json_file: t.TextIO, output: t.BinaryIO, time_offset: float | None = None, jobs: int = 1,
+        chunk_size: int = 50_000, batch_size: int = 1000) -> t.Dict[str, int]:
+    """
+    Converts a json trace to the perfetto protobuf format, one event at a time in constant memory.
+    Returns the number of events skipped for each unsupported event type
+
+    With `jobs` above one, chunks of `chunk_size` events are encoded in a pool of processes and their
+    packet streams written in order. Traces written by `TraceWriter` are split by line, so only the
+    workers parse json; other layouts are parsed incrementally in this process. A trace which starts
+    with one event per line then splits an event over several lines raises a `ValueError`
+
+    :param json_file: Text file of the json trace
+    :param output: Binary file to write to
+    :param time_offset: Microseconds added to every timestamp, by default a negative first timestamp
+        is shifted to zero
+    :param jobs: Number of processes encoding events
+    :param chunk_size: Number of events per chunk sent to a process
+    :param batch_size: Number of events encoded before writing, when not using processes
+    """
+    events, lines = _read_events(json_file)
+    skipped = dict()
+
+    if jobs <= 1:
+        first = next(events, None)
+        if first is None:
+            return skipped
+
+        if time_offset is None:
+            time_offset = max(0.0, -_first_timestamp([first], lines))
+
+        writer = PerfettoWriter(output, batch_size, time_offset=time_offset)
+        _write_events(writer, chain([first], events), skipped, lines)
+        writer.close()
+        return skipped
+
+    chunks = _chunks(events, chunk_size)
+    first = next(chunks, None)
+    if first is None:
+        return skipped
+
+    if time_offset is None:
+        time_offset = max(0.0, -_first_timestamp(first, lines))
+
+    def write(future: Future):
+        packets, chunk_skipped = future.result()
+        output.write(packets)
+        for event_type, count in chunk_skipped.items():
+            skipped[event_type] = skipped.get(event_type, 0) + count
+
+    with ProcessPoolExecutor(jobs) as executor:
+        # Bounded so the reader never runs more than a few chunks ahead of the output
+        pending = deque([executor.submit(_encode_chunk, first, lines, time_offset)])
+        for chunk in chunks:
+            if len(pending) >= 2 * jobs:
+                write(pending.popleft())
+            pending.append(executor.submit(_encode_chunk, chunk, lines, time_offset))
+
+        while pending:
+            write(pending.popleft())
+
+    output.flush()
+    return skipped
+
+
+__all__ = [json_to_perfetto]
@@ -0,0 +1,231 @@
+import typing as t
+
+from .events import CompleteEvent
+from .files import is_perfetto_file, open_trace_file
+from .stats import LatencyHistogram, mann_whitney
+from .stream import TraceEventReader
+
+
+# A span of one thread: start, end and name
+_Span = t.Tuple[float, float, str]
+
+
+class FunctionStats:
+    """ Aggregated spans of one name: call count, inclusive and self time, and latency histogram """
+
+    __slots__ = ('name', 'count', 'inclusive', 'self_time', 'histogram')
+
+    name: str
+    count: int
+    inclusive: float
+    self_time: float
+    histogram: LatencyHistogram
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.inclusive = 0.0
+        self.self_time = 0.0
+        self.histogram = LatencyHistogram()
+
+    def to_json(self) -> dict:
+        """ Convert to json, times in microseconds """
+        data = dict(count=self.count, inclusive=self.inclusive, self_time=self.self_time)
+        for name, q in LatencyHistogram.quantiles:
+            data[name] = self.histogram.quantile(q)
+        return data
+
+
+def _add_thread_spans(stats: t.Dict[str, FunctionStats], spans: t.List[_Span]):
+    """
+    Nests the spans of one thread by time to split their durations into self time and time spent in
+    the spans they enclose. Inclusive time only counts the outermost span of recursive calls
+    """
+    # Enclosing spans first when two start together
+    spans.sort(key=lambda span: (span[0], -span[1]))
+
+    # [end, name, time in enclosed spans, duration] of the open spans, innermost last
+    stack = []
+    open_names = dict()
+
+    def close():
+        end, name, enclosed, duration = stack.pop()
+        function = stats.get(name)
+        if function is None:
+            function = stats[name] = FunctionStats(name)
+        function.count += 1
+        function.self_time += max(duration - enclosed, 0.0)
+        function.histogram.add(duration)
+
+        open_names[name] -= 1
+        if not open_names[name]:
+            function.inclusive += duration
+
+    for start, end, name in spans:
+        while stack and stack[-1][0] <= start:
+            close()
+
+        if stack:
+            parent = stack[-1]
+            parent[2] += min(end, parent[0]) - start
+
+        stack.append([end, name, 0.0, end - start])
+        open_names[name] = open_names.get(name, 0) + 1
+
+    while stack:
+        close()
+
+
+def function_stats(events: t.Iterable[dict], category: str | None = None) -> t.Dict[str, FunctionStats]:
+    """
+    Aggregates the complete events of a trace by name, e.g. the spans recorded by `profile`
+
+    :param events: Json dictionaries of the events, e.g. from a `TraceEventReader`
+    :param category: Only events of this category, e.g. `function`
+    """
+    threads = dict()
+    for event in events:
+        if event.get('ph') != CompleteEvent.event_type:
+            continue
+        if category is not None and event.get('cat') != category:
+            continue
+
+        thread = event.get('pid'), event.get('tis', event.get('tid'))
+        spans = threads.get(thread)
+        if spans is None:
+            spans = threads[thread] = []
+        start = event.get('ts', 0.0)
+        spans.append((start, start + event.get('dur', 0.0), event.get('name', '')))
+
+    stats = dict()
+    for spans in threads.values():
+        _add_thread_spans(stats, spans)
+    return stats
+
+
+def load_function_stats(file_path: str, category: str | None = None) -> t.Dict[str, FunctionStats]:
+    """ Aggregates the complete events of a json trace file by name, see `function_stats` """
+    if is_perfetto_file(file_path):
+        raise ValueError(f'Only json traces can be compared: \'{file_path}\'')
+
+    with open_trace_file(file_path) as file:
+        return function_stats(TraceEventReader(file), category)
+
+
+class FunctionDiff:
+    """
+    Comparison of one name between two traces. `change` is the relative change of the median latency,
+    and `p_value` the significance of the candidate calls being slower than the baseline ones
+    """
+
+    __slots__ = ('name', 'baseline', 'candidate', 'change', 'p_value', 'regression')
+
+    name: str
+    baseline: FunctionStats | None
+    candidate: FunctionStats | None
+    change: float | None
+    p_value: float | None
+    regression: bool
+
+    def __init__(
+            self, name: str, baseline: FunctionStats | None, candidate: FunctionStats | None,
+            threshold: float, alpha: float, min_count: int):
+        self.name = name
+        self.baseline = baseline
+        self.candidate = candidate
+        self.change = None
+        self.p_value = None
+        self.regression = False
+
+        if baseline is None or candidate is None:
+            return
+
+        baseline_median = baseline.histogram.quantile(0.5)
+        candidate_median = candidate.histogram.quantile(0.5)
+        if baseline_median:
+            self.change = candidate_median / baseline_median - 1.0
+
+        if baseline.count >= min_count and candidate.count >= min_count:
+            self.p_value = mann_whitney(baseline.histogram, candidate.histogram)
+            self.regression = self.change is not None and self.change > threshold and self.p_value < alpha
+
+    def to_json(self) -> dict:
+        return dict(
+            name=self.name,
+            baseline=self.baseline.to_json() if self.baseline is not None else None,
+            candidate=self.candidate.to_json() if self.candidate is not None else None,
+            change=self.change, p_value=self.p_value, regression=self.regression)
+
+
+class TraceDiff:
+    """ Comparison of every name found in either of two traces, regressions first """
+
+    functions: t.List[FunctionDiff]
+    threshold: float
+    alpha: float
+
+    def __init__(self, functions: t.List[FunctionDiff], threshold: float, alpha: float):
+        self.functions = functions
+        self.threshold = threshold
+        self.alpha = alpha
+
+    @property
+    def regressions(self) -> t.List[FunctionDiff]:
+        return [function for function in self.functions if function.regression]
+
+    def to_json(self) -> dict:
+        return dict(
+            threshold=self.threshold, alpha=self.alpha,
+            regressions=[function.name for function in self.regressions],
+            functions=[function.to_json() for function in self.functions])
+
+
+def diff_stats(
+        baseline: t.Dict[str, FunctionStats], candidate: t.Dict[str, FunctionStats],
+        threshold: float = 0.05, alpha: float = 0.01, min_count: int = 10) -> TraceDiff:
+    """
+    Compares the aggregated spans of two traces. A name regressed when its median latency grew by
+    more than `threshold` and the Mann-Whitney U test finds the candidate calls slower with a p-value
+    below `alpha`
+
+    :param baseline: Stats of the reference trace, see `function_stats`
+    :param candidate: Stats of the trace tested for regressions
+    :param threshold: Relative growth of the median latency ignored as noise, e.g. `0.05` for 5%
+    :param alpha: Significance level of the test
+    :param min_count: Names called fewer times in either trace are not tested
+    """
+    names = list(baseline) + [name for name in candidate if name not in baseline]
+    functions = [
+        FunctionDiff(name, baseline.get(name), candidate.get(name), threshold, alpha, min_count)
+        for name in names]
+
+    def order(function: FunctionDiff):
+        # Regressions first, then by the change in time spent in the function itself
+        base = function.baseline.self_time if function.baseline is not None else 0.0
+        new = function.candidate.self_time if function.candidate is not None else 0.0
+        return not function.regression, -abs(new - base)
+
+    functions.sort(key=order)
+    return TraceDiff(functions, threshold, alpha)
+
+
+def diff_traces(
+        baseline_path: str, candidate_path: str, threshold: float = 0.05, alpha: float = 0.01,
+        min_count: int = 10, category: str | None = None) -> TraceDiff:
+    """
+    Compares two json trace files, e.g. of the same workload on two builds, see `diff_stats`. Each
+    file is read through once, and only the spans of one trace are held at a time
+
+    :param baseline_path: Reference trace file, optionally compressed
+    :param candidate_path: Trace file tested for regressions
+    :param threshold: Relative growth of the median latency ignored as noise, e.g. `0.05` for 5%
+    :param alpha: Significance level of the test
+    :param min_count: Names called fewer times in either trace are not tested
+    :param category: Only events of this category, e.g. `function`
+    """
+    return diff_stats(
+        load_function_stats(baseline_path, category), load_function_stats(candidate_path, category),
+        threshold, alpha, min_count)
+
+
+__all__ = [FunctionDiff, FunctionStats, TraceDiff, diff_stats, diff_traces, function_stats, load_function_stats]
@@ -0,0 +1,211 @@
+from json.encoder import encode_basestring_ascii
+import typing as t
+
+from .events import AnyEvent, CompleteEvent, CounterEvent
+from .json import TraceJsonEncoder
+from .trace import Trace
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_BACKENDS = ('json', 'orjson')
+
+
+def _event_parts(
+        key_names: t.Sequence[str], event_type: str, item_separator: str, key_separator: str
+) -> t.Tuple[str, ...]:
+    """
+    Returns the constant text between the values of an event, the name is preceded by `{"name":`
+    and `ph` is written between the category and the process id
+    """
+    keys = [f'"{key}"{key_separator}' for key in key_names]
+    parts = ['{' + keys[0], item_separator + keys[1]]
+    parts.append(f'{item_separator}"ph"{key_separator}"{event_type}"{item_separator}{keys[2]}')
+    parts.extend(item_separator + key for key in keys[3:])
+    parts.append(f'{item_separator}"args"{key_separator}')
+    return tuple(parts)
+
+
+class TraceEncoder:
+    """
+    Serializes traces and events straight from their fields, with the same output as
+    `TraceJsonEncoder`. No dictionary is built per event and only the args go through a json encoder
+
+    Events holding anything other than plain strings and finite numbers, and any other values, are
+    left to `TraceJsonEncoder`
+
+    The `orjson` backend encodes whole events with the optional `orjson` package, which is only
+    available with compact separators. It writes non-ascii characters as utf-8 rather than escaping
+    them, and is used by default for compact output when the package is installed
+    """
+
+    _encoder: TraceJsonEncoder
+    _item_separator: str
+    _precision: int | None
+    _orjson: bool
+    _complete_parts: t.Tuple[str, ...]
+    _counter_parts: t.Tuple[str, ...]
+    _event_encoders: t.Dict[type, t.Callable[[AnyEvent], str]]
+
+    def __init__(
+            self, compact: bool = False, timestamp_precision: int | None = None,
+            backend: str | None = None):
+        """
+        :param compact: Removes the whitespace from separators
+        :param timestamp_precision: Rounds timestamps and durations to this many decimal places of a
+            microsecond
+        :param backend: `json` or `orjson`, defaults to `orjson` for compact output when installed
+        """
+        if backend is None:
+            backend = 'orjson' if compact and orjson is not None else 'json'
+        if backend not in _BACKENDS:
+            raise ValueError(f'Unknown json backend \'{backend}\', expected one of {_BACKENDS}')
+        if backend == 'orjson':
+            if orjson is None:
+                raise ImportError('The orjson json backend requires the optional `orjson` package')
+            if not compact:
+                raise ValueError('The orjson json backend only writes compact json')
+
+        item_separator, key_separator = (',', ':') if compact else (', ', ': ')
+        self._encoder = TraceJsonEncoder(separators=(item_separator, key_separator))
+        self._item_separator = item_separator
+        self._precision = timestamp_precision
+        self._orjson = backend == 'orjson'
+
+        self._complete_parts = _event_parts(
+            ('name', 'cat', 'pid', 'tis', 'ts', 'dur'), CompleteEvent.event_type, item_separator,
+            key_separator)
+        self._counter_parts = _event_parts(
+            ('name', 'cat', 'pid', 'tis', 'ts'), CounterEvent.event_type, item_separator,
+            key_separator)
+        self._event_encoders = {
+            CompleteEvent: self._encode_complete,
+            CounterEvent: self._encode_counter,
+        }
+
+    def _round(self, value: float) -> float:
+        precision = self._precision
+        return round(value, precision) if precision > 0 else round(value)
+
+    def _encode_complete(self, event: CompleteEvent) -> str:
+        name = event.name
+        category = event.category
+        process_id = event.process_id
+        thread_id = event.thread_id
+        start_time = event.start_time
+        duration = event.duration
+        args = event.args
+
+        if self._precision is not None:
+            start_time = self._round(start_time)
+            duration = self._round(duration)
+
+        # Anything else, e.g. nan or bool, is left to the json encoder
+        if not (name.__class__ is str and category.__class__ is str
+                and process_id.__class__ is int and thread_id.__class__ is int
+                and (start_time.__class__ is float or start_time.__class__ is int)
+                and (duration.__class__ is float or duration.__class__ is int)
+                and start_time - start_time + duration - duration == 0):
+            return self._encode_fallback(event)
+
+        if self._orjson:
+            data = dict(
+                name=name, cat=category, ph='X', pid=process_id, tis=thread_id, ts=start_time,
+                dur=duration)
+            if args:
+                data['args'] = args
+            return self._orjson_dumps(data)
+
+        name_part, category_part, process_part, thread_part, start_part, duration_part, args_part = \
+            self._complete_parts
+        if args:
+            return (f'{name_part}{encode_basestring_ascii(name)}{category_part}'
+                    f'{encode_basestring_ascii(category)}{process_part}{process_id!r}{thread_part}'
+                    f'{thread_id!r}{start_part}{start_time!r}{duration_part}{duration!r}{args_part}'
+                    f'{self._encoder.encode(args)}}}')
+        return (f'{name_part}{encode_basestring_ascii(name)}{category_part}'
+                f'{encode_basestring_ascii(category)}{process_part}{process_id!r}{thread_part}'
+                f'{thread_id!r}{start_part}{start_time!r}{duration_part}{duration!r}}}')
+
+    def _encode_counter(self, event: CounterEvent) -> str:
+        name = event.name
+        category = event.category
+        process_id = event.process_id
+        thread_id = event.thread_id
+        timestamp = event.timestamp
+        args = event.args
+
+        if self._precision is not None:
+            timestamp = self._round(timestamp)
+
+        if not (name.__class__ is str and category.__class__ is str
+                and process_id.__class__ is int and thread_id.__class__ is int
+                and (timestamp.__class__ is float or timestamp.__class__ is int)
+                and timestamp - timestamp == 0):
+            return self._encode_fallback(event)
+
+        if self._orjson:
+            data = dict(
+                name=name, cat=category, ph='C', pid=process_id, tis=thread_id, ts=timestamp)
+            if args:
+                data['args'] = args
+            return self._orjson_dumps(data)
+
+        name_part, category_part, process_part, thread_part, timestamp_part, args_part = \
+            self._counter_parts
+        if args:
+            return (f'{name_part}{encode_basestring_ascii(name)}{category_part}'
+                    f'{encode_basestring_ascii(category)}{process_part}{process_id!r}{thread_part}'
+                    f'{thread_id!r}{timestamp_part}{timestamp!r}{args_part}'
+                    f'{self._encoder.encode(args)}}}')
+        return (f'{name_part}{encode_basestring_ascii(name)}{category_part}'
+                f'{encode_basestring_ascii(category)}{process_part}{process_id!r}{thread_part}'
+                f'{thread_id!r}{timestamp_part}{timestamp!r}}}')
+
+    def _orjson_dumps(self, data: dict) -> str:
+        try:
+            return orjson.dumps(data, default=self._encoder.default).decode()
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits or dictionaries with non-string keys in the args
+            return self._encoder.encode(data)
+
+    def _encode_fallback(self, event: AnyEvent | dict) -> str:
+        if self._precision is not None:
+            event = _round_timestamps(event, self._precision)
+        return self._encoder.encode(event)
+
+    def encode_event(self, event: AnyEvent | dict) -> str:
+        """ Returns the json text of one event, either an event object or its json dictionary """
+        encoder = self._event_encoders.get(type(event))
+        if encoder is None:
+            return self._encode_fallback(event)
+        return encoder(event)
+
+    def encode(self, value: Trace | AnyEvent | t.Any) -> str:
+        """ Returns the json text of a trace, an event or any other value `TraceJsonEncoder` accepts """
+        if isinstance(value, Trace):
+            events = self._item_separator.join(map(self.encode_event, value.events))
+            key_separator = self._encoder.key_separator
+            return (f'{{"traceEvents"{key_separator}[{events}]{self._item_separator}'
+                    f'"otherData"{key_separator}{self._encoder.encode(value.data)}}}')
+
+        encoder = self._event_encoders.get(type(value))
+        if encoder is None:
+            return self._encoder.encode(value)
+        return encoder(value)
+
+
+def _round_timestamps(event: AnyEvent | dict, precision: int) -> dict:
+    data = event.to_json() if not isinstance(event, dict) else dict(event)
+    for key in ('ts', 'dur'):
+        value = data.get(key)
+        if value is not None:
+            data[key] = round(value, precision) if precision > 0 else round(value)
+    return data
+
+
+__all__ = [TraceEncoder]
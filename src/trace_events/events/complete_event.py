@@ -2,7 +2,7 @@ from os import getpid
 from threading import current_thread
 
 from .event import EventMetaData
-from ..field import Field, get_fields
+from ..field import Field, field_extractor, schema_property
 
 
 class CompleteEventMetaData(EventMetaData):
@@ -10,23 +10,23 @@ class CompleteEventMetaData(EventMetaData):
     CompleteEvent metadata
     """
 
-    @property
+    @schema_property
     def event_type(cls) -> str:
         return 'X'
 
-    @property
+    @schema_property
     def start_time_field(cls) -> Field:
         return Field(float, 'ts')
 
-    @property
+    @schema_property
     def duration_field(cls) -> Field:
         return Field(float, 'dur')
 
-    @property
+    @schema_property
     def args_field(cls) -> Field:
         return Field(dict, 'args', False)
 
-    @property
+    @schema_property
     def fields(cls):
         return (
             cls.name_field,
@@ -44,6 +44,8 @@ class CompleteEvent(object, metaclass=CompleteEventMetaData):
     Complete event, using 'ph': 'X'
     """
 
+    __slots__ = ('name', 'category', 'process_id', 'thread_id', 'start_time', 'duration', 'args')
+
     name: str
     category: str
     process_id: int
@@ -64,8 +66,8 @@ class CompleteEvent(object, metaclass=CompleteEventMetaData):
     @classmethod
     def from_dict(cls, data: dict):
         """ Load from  dictionary """
-        name, event_type, category, process_id, thread_id, start_time, duration, args = get_fields(
-            CompleteEvent, data)
+        name, event_type, category, process_id, thread_id, start_time, duration, args = field_extractor(
+            CompleteEvent)(data)
         assert event_type == 'X', 'CompleteEvent::event_type should equal \'X\''
 
         return CompleteEvent(
@@ -2,7 +2,7 @@ from os import getpid
 from threading import current_thread
 
 from .event import EventMetaData
-from ..field import Field, get_fields
+from ..field import Field, field_extractor, schema_property
 
 
 class CounterEventMetaData(EventMetaData):
@@ -10,19 +10,19 @@ class CounterEventMetaData(EventMetaData):
     CounterEvent metadata
     """
 
-    @property
+    @schema_property
     def event_type(cls) -> str:
         return 'C'
 
-    @property
+    @schema_property
     def timestamp_field(cls) -> Field:
         return Field(float, 'ts')
 
-    @property
+    @schema_property
     def args_field(cls) -> Field:
         return Field(dict, 'args', True)
 
-    @property
+    @schema_property
     def fields(cls):
         return (cls.name_field, cls.event_type_field, cls.category_field, cls.process_id_field, cls.thread_id_field, cls.timestamp_field, cls.args_field)
 
@@ -32,6 +32,8 @@ class CounterEvent(object, metaclass=CounterEventMetaData):
     Counter event, using 'ph': 'C'
     """
 
+    __slots__ = ('name', 'category', 'process_id', 'thread_id', 'timestamp', 'args')
+
     name: str
     category: str
     process_id: int
@@ -50,8 +52,8 @@ class CounterEvent(object, metaclass=CounterEventMetaData):
     @staticmethod
     def from_dict(data: dict):
         """ Load from dictionary """
-        name, event_type, category, process_id, thread_id, timestamp, args = get_fields(
-            CounterEvent, data)
+        name, event_type, category, process_id, thread_id, timestamp, args = field_extractor(
+            CounterEvent)(data)
         assert event_type == 'C', 'CounterEvent::event_type should equal \'C\''
 
         return CounterEvent(
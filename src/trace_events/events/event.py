@@ -1,4 +1,4 @@
-from ..field import Field
+from ..field import Field, schema_property
 
 
 class EventMetaData(type):
@@ -8,22 +8,22 @@ class EventMetaData(type):
     Field properties denote the data type, name, and a flag indicating whether they are required
     """
 
-    @property
+    @schema_property
     def name_field(cls) -> Field:
         return Field(str, 'name')
 
-    @property
+    @schema_property
     def event_type_field(cls) -> Field:
         return Field(str, 'ph')
 
-    @property
+    @schema_property
     def category_field(cls) -> Field:
         return Field(str, 'cat', False, 'function')
 
-    @property
+    @schema_property
     def process_id_field(cls) -> Field:
         return Field(int, 'pid', False, 0)
 
-    @property
+    @schema_property
     def thread_id_field(cls) -> Field:
         return Field(int, 'tis', False, 0)
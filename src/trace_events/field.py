@@ -1,9 +1,12 @@
+from copy import copy
 import typing as t
 
 
 class Field:
     """ Description of an output field """
 
+    __slots__ = ('data_type', 'name', 'required', 'default')
+
     data_type: type
     name: str
     required: bool
@@ -21,6 +24,28 @@ class Field:
                 f'{self.name} default_value should be {data_type.__name__}, but is {type(self.default).__name__}'
 
 
+class schema_property:
+    """
+    Metaclass property computed once per class. The value is stored on the class itself, which takes
+    precedence over this non-data descriptor on later lookups, so schema fields are only built once
+    """
+
+    def __init__(self, func):
+        self._func = func
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self._name = name
+
+    def __get__(self, cls, owner=None):
+        if cls is None:
+            return self
+
+        value = self._func(cls)
+        setattr(cls, self._name, value)
+        return value
+
+
 def get_fields(data_type: type, data: dict):
     """ Extracts data fields for the given data_type from a dictionary """
 
@@ -36,7 +61,8 @@ def get_fields(data_type: type, data: dict):
                     f'Required field \'{field.name}\' of {data_type.__name__} is missing from json data')
 
             if field.default is not None:
-                return field.default
+                # Defaults are shared by the cached schema, so mutable values are copied
+                return copy(field.default)
 
             return None
 
@@ -46,3 +72,51 @@ def get_fields(data_type: type, data: dict):
         return field.data_type(value)
 
     return map(mapper, data_type.fields)
+
+
+_extractors: t.Dict[type, t.Callable[[dict], tuple]] = dict()
+
+
+def _compile_extractor(data_type: type) -> t.Callable[[dict], tuple]:
+    namespace = dict(copy=copy)
+    lines = ['def extract(data):', '    get = data.get']
+
+    for index, field in enumerate(data_type.fields):
+        value = f'v{index}'
+        namespace[f't{index}'] = field.data_type
+        namespace[f'd{index}'] = field.default
+        lines.append(f'    {value} = get({field.name!r})')
+        lines.append(f'    if {value} is None:')
+
+        if field.required:
+            namespace[f'm{index}'] = \
+                f'Required field \'{field.name}\' of {data_type.__name__} is missing from json data'
+            lines.append(f'        raise KeyError(m{index})')
+        elif isinstance(field.default, (dict, list, set)):
+            # Defaults are shared by the cached schema, so mutable values are copied
+            lines.append(f'        {value} = copy(d{index})')
+        else:
+            lines.append(f'        {value} = d{index}')
+
+        lines.append(f'    elif {value}.__class__ is not t{index} and not isinstance({value}, t{index}):')
+        lines.append(f'        {value} = t{index}({value})')
+
+    values = ', '.join(f'v{index}' for index in range(len(data_type.fields)))
+    lines.append(f'    return ({values},)')
+
+    exec('\n'.join(lines), namespace)
+    return namespace['extract']
+
+
+def field_extractor(data_type: type) -> t.Callable[[dict], tuple]:
+    """
+    Returns a function extracting the fields of data_type from a dictionary as a tuple, with the
+    same checks and conversions as `get_fields`. The function is generated once per type as straight
+    line code, so no per-field objects are built for each dictionary
+    """
+    extractor = _extractors.get(data_type)
+    if extractor is None:
+        assert hasattr(
+            data_type, 'fields'), f'type:{data_type.__name__} requires a \'fields\' property'
+        extractor = _extractors[data_type] = _compile_extractor(data_type)
+    return extractor
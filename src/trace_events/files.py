@@ -0,0 +1,70 @@
+import bz2
+import gzip
+import lzma
+from os import path
+import typing as t
+
+
+def _open_gzip(file_path: str, mode: str, encoding: str | None = None):
+    # Level 9 is several times slower than 6 for a negligible gain on trace json
+    return gzip.open(file_path, mode, compresslevel=6, encoding=encoding)
+
+
+def _open_zstd(file_path: str, mode: str, encoding: str | None = None):
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            f'Writing or reading \'{file_path}\' requires the optional `zstandard` package') from None
+    return zstandard.open(file_path, mode, encoding=encoding)
+
+
+_compressors: t.Dict[str, t.Callable] = {
+    '.gz': _open_gzip,
+    '.bz2': bz2.open,
+    '.xz': lzma.open,
+    '.lzma': lzma.open,
+    '.zst': _open_zstd,
+}
+
+
+_perfetto_extensions = ('.pftrace', '.perfetto-trace', '.perfetto')
+
+
+def split_trace_extension(file_name: str) -> t.Tuple[str, str]:
+    """ Splits a trace file name into base and extension, keeping compression suffixes e.g. `.json.gz` """
+    base, extension = path.splitext(file_name)
+    if extension in _compressors:
+        base, inner_extension = path.splitext(base)
+        extension = inner_extension + extension
+    return base, extension
+
+
+def is_compressed(file_path: str) -> bool:
+    """ Flag indicating whether the file extension selects a compression format """
+    return path.splitext(file_path)[1] in _compressors
+
+
+def is_perfetto_file(file_path: str) -> bool:
+    """ Flag indicating whether the file extension selects the perfetto protobuf format """
+    extension = split_trace_extension(file_path)[1]
+    return any(extension.startswith(perfetto) for perfetto in _perfetto_extensions)
+
+
+def open_trace_file(file_path: str, mode: str = 'r') -> t.IO:
+    """
+    Opens a trace file, in text mode unless `mode` says otherwise, compressing or decompressing it when the extension is one of
+    `.gz`, `.bz2`, `.xz`, `.lzma` or `.zst`. Zstandard requires the optional `zstandard` package
+    """
+    mode = mode if 't' in mode or 'b' in mode else f'{mode}t'
+    # Json is utf-8 whatever the locale, and compact output may not escape non-ascii characters
+    encoding = 'utf-8' if 't' in mode else None
+    compressor = _compressors.get(path.splitext(file_path)[1])
+
+    if compressor is None:
+        return open(file_path, mode, encoding=encoding)
+
+    return compressor(file_path, mode, encoding=encoding)
+
+
+__all__ = [is_compressed, is_perfetto_file, open_trace_file, split_trace_extension]
@@ -0,0 +1,102 @@
+from array import array
+from bisect import bisect_right
+import typing as t
+
+
+class IntervalIndex:
+    """
+    Static interval tree over `[start, end]` intervals, answering which intervals overlap a range in
+    O(log n + k). Intervals are sorted by start, and the middle of every range of the sorted arrays is
+    the root of the implicit subtree over that range, storing the maximum end of the subtree. A
+    subtree ending before the queried range is skipped whole
+
+    The columns are any sequences of numbers, so a persisted index can be used straight from memory
+    mapped buffers with `from_columns`
+    """
+
+    rows: t.Sequence[int]
+    starts: t.Sequence[float]
+    ends: t.Sequence[float]
+    max_ends: t.Sequence[float]
+
+    def __init__(self, starts: t.Sequence[float], ends: t.Sequence[float]):
+        """
+        :param starts: Start of each interval, in any order
+        :param ends: End of each interval, not before its start
+        """
+        assert len(starts) == len(ends), 'starts and ends should have the same length'
+
+        order = sorted(range(len(starts)), key=starts.__getitem__)
+        self.rows = array('q', order)
+        self.starts = array('d', (starts[row] for row in order))
+        self.ends = array('d', (ends[row] for row in order))
+        self.max_ends = array('d', self.ends)
+
+        if order:
+            self._build(0, len(order))
+
+    @classmethod
+    def from_columns(
+            cls, rows: t.Sequence[int], starts: t.Sequence[float], ends: t.Sequence[float],
+            max_ends: t.Sequence[float]) -> 'IntervalIndex':
+        """ Wraps the columns of an index built before, e.g. read back from a file """
+        index = cls.__new__(cls)
+        index.rows = rows
+        index.starts = starts
+        index.ends = ends
+        index.max_ends = max_ends
+        return index
+
+    def _build(self, low: int, high: int) -> float:
+        # Recursion only goes as deep as the tree, i.e. log2 of the number of intervals
+        middle = (low + high) >> 1
+        max_end = self.ends[middle]
+        if low < middle:
+            max_end = max(max_end, self._build(low, middle))
+        if middle + 1 < high:
+            max_end = max(max_end, self._build(middle + 1, high))
+        self.max_ends[middle] = max_end
+        return max_end
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def overlapping(self, start: float | None = None, end: float | None = None) -> t.Iterator[int]:
+        """
+        Yields the rows of the intervals overlapping `[start, end]` in order of their start, an open
+        bound includes everything on that side
+        """
+        rows = self.rows
+        if start is None and end is None:
+            yield from rows
+            return
+
+        starts = self.starts
+        ends = self.ends
+        max_ends = self.max_ends
+        start = float('-inf') if start is None else start
+        # Intervals from here on start after the range
+        limit = len(rows) if end is None else bisect_right(starts, end)
+
+        # Visits the tree in order, a negative high marks a row to yield rather than a subtree
+        stack = [(0, len(rows))]
+        while stack:
+            low, high = stack.pop()
+            if high < 0:
+                yield rows[low]
+                continue
+            if low >= high or low >= limit:
+                continue
+
+            middle = (low + high) >> 1
+            if max_ends[middle] < start:
+                continue
+
+            if middle < limit:
+                stack.append((middle + 1, high))
+                if ends[middle] >= start:
+                    stack.append((middle, -1))
+            stack.append((low, middle))
+
+
+__all__ = [IntervalIndex]
@@ -14,6 +14,9 @@ class TraceJsonEncoder(JSONEncoder):
         return super().default(obj)
 
 
+_event_types = {event_type.event_type: event_type for event_type in AllEventTypes}
+
+
 class TraceJsonDecoder(JSONDecoder):
     """ Converts json representations to python objects """
 
@@ -31,11 +34,10 @@ class TraceJsonDecoder(JSONDecoder):
             assert isinstance(
                 event_type, str), f'event_type value is {type(event_type).__name__} should be a str'
 
-            event_type = next(
-                (t for t in AllEventTypes if event_type == t.event_type), None)
-            if event_type is None:
+            event_class = _event_types.get(event_type)
+            if event_class is None:
                 raise TypeError(
                     f'Unable to process event with \'ph\': \'{event_type}\'')
-            return event_type.from_dict(data)
+            return event_class.from_dict(data)
 
         return data
@@ -0,0 +1,112 @@
+from json import load
+import typing as t
+
+from .events import AnyEvent, CompleteEvent, CounterEvent
+from .field import field_extractor
+from .files import open_trace_file
+from .storage import ColumnarEvents
+from .trace import Trace
+from .utils import gc_paused
+
+
+_extract_complete = field_extractor(CompleteEvent)
+_extract_counter = field_extractor(CounterEvent)
+
+
+def _complete_event(data: dict) -> CompleteEvent:
+    name, _, category, process_id, thread_id, start_time, duration, args = _extract_complete(data)
+    return CompleteEvent(
+        name, start_time, duration, category=category, args=args, process_id=process_id,
+        thread_id=thread_id)
+
+
+def _counter_event(data: dict) -> CounterEvent:
+    name, _, category, process_id, thread_id, timestamp, args = _extract_counter(data)
+    return CounterEvent(
+        name, timestamp, category=category, process_id=process_id, thread_id=thread_id, args=args)
+
+
+def _add_complete_event(events: ColumnarEvents, data: dict):
+    name, _, category, process_id, thread_id, start_time, duration, args = _extract_complete(data)
+    events.add_complete_event(name, start_time, duration, category, args, process_id, thread_id)
+
+
+def _add_counter_event(events: ColumnarEvents, data: dict):
+    name, _, category, process_id, thread_id, timestamp, args = _extract_counter(data)
+    events.add_counter_event(name, timestamp, category, args, process_id, thread_id)
+
+
+_event_loaders: t.Dict[str, t.Callable[[dict], AnyEvent]] = {
+    CompleteEvent.event_type: _complete_event,
+    CounterEvent.event_type: _counter_event,
+}
+
+_column_loaders: t.Dict[str, t.Callable[[ColumnarEvents, dict], None]] = {
+    CompleteEvent.event_type: _add_complete_event,
+    CounterEvent.event_type: _add_counter_event,
+}
+
+
+def _unknown_event(data: dict):
+    event_type = data.get('ph')
+    assert isinstance(
+        event_type, str), f'event_type value is {type(event_type).__name__} should be a str'
+    raise TypeError(f'Unable to process event with \'ph\': \'{event_type}\'')
+
+
+def load_event(data: dict) -> AnyEvent:
+    """ Converts the json representation of an event to an event object """
+    loader = _event_loaders.get(data.get('ph'))
+    if loader is None:
+        _unknown_event(data)
+    return loader(data)
+
+
+def load_events(events: t.Iterable[dict], raw: bool = False) -> t.List[AnyEvent] | ColumnarEvents:
+    """
+    Converts json event dictionaries to event objects, or with `raw` to a `ColumnarEvents` store
+    which only materializes event objects when they are accessed
+    """
+    with gc_paused():
+        if not raw:
+            loaded = []
+            event_loaders = _event_loaders
+            for data in events:
+                loader = event_loaders.get(data.get('ph'))
+                if loader is None:
+                    _unknown_event(data)
+                loaded.append(loader(data))
+            return loaded
+
+        columns = ColumnarEvents()
+        column_loaders = _column_loaders
+        for data in events:
+            loader = column_loaders.get(data.get('ph'))
+            if loader is None:
+                _unknown_event(data)
+            loader(columns, data)
+        return columns
+
+
+def trace_from_dict(data: dict | list, raw: bool = False) -> Trace:
+    """ Builds a trace from its json representation, in either the object or the array format """
+    if isinstance(data, list):
+        return Trace(load_events(data, raw))
+
+    trace_data = data.get(Trace.other_data_field.name)
+    return Trace(
+        load_events(data.get(Trace.events_field.name) or [], raw),
+        dict(trace_data) if trace_data else {})
+
+
+def load_trace(file_path: str, raw: bool = False) -> Trace:
+    """
+    Loads a trace file, decompressing it when the extension is a compression format. Events are
+    converted with a dispatch on their type rather than a hook for every json object, and with `raw`
+    are kept in a `ColumnarEvents` store rather than as event objects
+    """
+    with open_trace_file(file_path) as file, gc_paused():
+        return trace_from_dict(load(file), raw)
+
+
+__all__ = [load_event, load_events, load_trace, trace_from_dict]
@@ -0,0 +1,166 @@
+from json import loads
+from os import SEEK_END
+import typing as t
+
+from .files import is_compressed, is_perfetto_file, open_trace_file
+from .stream import TraceEventReader
+from .writer import TraceWriter, _line_ends
+
+
+_OTHER_DATA_LINE = b'"otherData": '
+
+
+def _tail_trace_data(file_path: str) -> dict | None:
+    """ Reads `otherData` from the last line of a file written by `TraceWriter`, without reading the events """
+    with open(file_path, 'rb') as file:
+        size = file.seek(0, SEEK_END)
+        offsets = _line_ends(file, size, 2)
+        if len(offsets) < 2 or offsets[0] != size:
+            return None
+
+        file.seek(offsets[1])
+        line = file.read(offsets[0] - offsets[1]).rstrip()
+
+    if not line.startswith(_OTHER_DATA_LINE) or not line.endswith(b'}'):
+        return None
+    try:
+        return loads(line[len(_OTHER_DATA_LINE):-1])
+    except ValueError:
+        return None
+
+
+def read_trace_data(file_path: str) -> dict:
+    """
+    Returns the `otherData` of a json trace file. It is read from the end of uncompressed files written
+    by `TraceWriter`, other files are parsed through in constant memory
+    """
+    if not is_compressed(file_path):
+        data = _tail_trace_data(file_path)
+        if data is not None:
+            return data
+
+    with open_trace_file(file_path) as file:
+        reader = TraceEventReader(file)
+        for _ in reader:
+            pass
+    return reader.data.get('otherData') or {}
+
+
+# Drift between the trace clock and the merge clock beyond this is taken for a clock step, e.g. the
+# realtime clock set by hand, rather than a rate difference
+_MAX_CLOCK_DRIFT = 1e-3
+# Anchors closer than this leave too little time for their uncertainty to measure a drift
+_MIN_DRIFT_INTERVAL_NS = 1_000_000_000
+
+
+def _anchors(data: dict) -> t.Tuple[dict, dict | None] | None:
+    """ Start and save anchors of a trace, `None` for traces recorded without them """
+    anchor = data.get('clock_anchor')
+    if not isinstance(anchor, dict) or 'clock_ns' not in anchor or 'start_ns' not in data:
+        return None
+    save_anchor = data.get('save_anchor')
+    return anchor, save_anchor if isinstance(save_anchor, dict) and 'clock_ns' in save_anchor else None
+
+
+def merge_clock(datas: t.Sequence[dict]) -> str:
+    """
+    Picks the clock traces are aligned in: monotonic when every anchored trace was recorded during the
+    same boot of the same host, as it never steps, otherwise realtime
+    """
+    hosts = set()
+    for data in datas:
+        anchors = _anchors(data)
+        if anchors is not None:
+            anchor, _ = anchors
+            hosts.add((anchor.get('host'), anchor.get('boot_id'), 'monotonic_ns' in anchor))
+    if len(hosts) == 1:
+        host, boot_id, has_monotonic = next(iter(hosts))
+        if host is not None and boot_id is not None and has_monotonic:
+            return 'monotonic'
+    return 'realtime'
+
+
+def trace_zero(data: dict, clock: str) -> t.Tuple[int, float] | None:
+    """
+    Maps the start of a trace into another clock, returning the time in nanoseconds of its zero
+    timestamp in `clock` and the rate of `clock` over the trace clock. The rate comes from the anchors
+    read when the trace started and when it was saved, and is 1 without a save anchor
+    """
+    anchors = _anchors(data)
+    if anchors is None:
+        return None
+    anchor, save_anchor = anchors
+    key = f'{clock}_ns'
+    if key not in anchor:
+        return None
+
+    scale = 1.0
+    if save_anchor is not None and key in save_anchor:
+        elapsed = save_anchor['clock_ns'] - anchor['clock_ns']
+        if elapsed >= _MIN_DRIFT_INTERVAL_NS:
+            rate = (save_anchor[key] - anchor[key]) / elapsed
+            if abs(rate - 1.0) < _MAX_CLOCK_DRIFT:
+                scale = rate
+
+    zero = anchor[key] + round((data['start_ns'] - anchor['clock_ns']) * scale)
+    return zero, scale
+
+
+def merge_traces(
+        file_paths: t.Sequence[str], output_path: str, compact: bool = False,
+        batch_size: int = 1000) -> dict:
+    """
+    Merges json trace files, e.g. one per worker process, into a single trace on one timeline and
+    returns its `otherData`
+
+    A first pass reads only the `otherData` of each file for its clock anchors, which map the trace
+    timestamps into a clock shared by all traces, see `merge_clock`. The earliest trace start becomes
+    the start of the merged timeline and every other trace is shifted by the difference, and scaled by
+    the drift of its clock. A second pass streams the events of each file in turn, so only one file is
+    open and only one event is held at a time whatever the number of files. Traces without clock
+    anchors are left as they are
+
+    :param file_paths: Json trace files, optionally compressed
+    :param output_path: Merged trace file, compressed according to its extension
+    :param compact: Removes the whitespace from the merged json
+    :param batch_size: Number of events buffered before writing
+    """
+    for file_path in (*file_paths, output_path):
+        if is_perfetto_file(file_path):
+            raise ValueError(f'Only json traces can be merged: \'{file_path}\'')
+
+    inputs = [(file_path, read_trace_data(file_path)) for file_path in file_paths]
+    clock = merge_clock([data for _, data in inputs])
+    zeros = [trace_zero(data, clock) for _, data in inputs]
+    known_zeros = [(zero, data) for zero, (_, data) in zip(zeros, inputs) if zero is not None]
+    start, first = min(known_zeros, key=lambda known: known[0][0]) if known_zeros else (None, None)
+
+    merged = []
+    with open_trace_file(output_path, 'w') as output:
+        writer = TraceWriter(output, batch_size, compact)
+
+        for (file_path, data), zero in zip(inputs, zeros):
+            offset, scale = ((zero[0] - start[0]) / 1000, zero[1]) if zero is not None else (0.0, 1.0)
+            merged.append(dict(file=file_path, offset=offset, scale=scale, data=data))
+
+            with open_trace_file(file_path) as file:
+                for event in TraceEventReader(file):
+                    timestamp = event.get('ts')
+                    if timestamp is not None and (offset or scale != 1.0):
+                        event['ts'] = timestamp * scale + offset
+                        duration = event.get('dur')
+                        if duration is not None and scale != 1.0:
+                            event['dur'] = duration * scale
+                    writer.write_event(event)
+
+        data = dict(merged=merged, merge_clock=clock)
+        if first is not None:
+            # The merged timeline starts with the earliest trace, so its anchor carries over and the
+            # merged trace can itself be merged
+            data.update(start_ns=first['start_ns'], clock=first.get('clock'), clock_anchor=first['clock_anchor'])
+        writer.close(data)
+
+    return data
+
+
+__all__ = [merge_clock, merge_traces, read_trace_data, trace_zero]
@@ -0,0 +1,518 @@
+from hashlib import blake2b
+from json import dumps
+from struct import Struct
+import typing as t
+
+from .events import AnyEvent, CompleteEvent, CounterEvent
+
+
+# Protobuf wire types
+_VARINT = 0
+_FIXED64 = 1
+_LENGTH_DELIMITED = 2
+
+# Field numbers from perfetto/protos/perfetto/trace/*.proto
+_TRACE_PACKET = 1
+
+_PACKET_TIMESTAMP = 8
+_PACKET_SEQUENCE_ID = 10
+_PACKET_TRACK_EVENT = 11
+_PACKET_INTERNED_DATA = 12
+_PACKET_SEQUENCE_FLAGS = 13
+_PACKET_TRACK_DESCRIPTOR = 60
+
+_EVENT_CATEGORY_IIDS = 3
+_EVENT_DEBUG_ANNOTATIONS = 4
+_EVENT_TYPE = 9
+_EVENT_NAME_IID = 10
+_EVENT_TRACK_UUID = 11
+_EVENT_CATEGORIES = 22
+_EVENT_NAME = 23
+_EVENT_COUNTER_VALUE = 30
+_EVENT_DOUBLE_COUNTER_VALUE = 44
+
+_TRACK_UUID = 1
+_TRACK_NAME = 2
+_TRACK_PROCESS = 3
+_TRACK_THREAD = 4
+_TRACK_PARENT_UUID = 5
+_TRACK_COUNTER = 8
+
+_PROCESS_PID = 1
+_PROCESS_NAME = 6
+
+_THREAD_PID = 1
+_THREAD_TID = 2
+_THREAD_NAME = 5
+
+_INTERNED_EVENT_CATEGORIES = 1
+_INTERNED_EVENT_NAMES = 2
+_INTERNED_IID = 1
+_INTERNED_NAME = 2
+
+_ANNOTATION_BOOL_VALUE = 2
+_ANNOTATION_INT_VALUE = 4
+_ANNOTATION_DOUBLE_VALUE = 5
+_ANNOTATION_STRING_VALUE = 6
+_ANNOTATION_NAME = 10
+
+# TracePacket.SequenceFlags
+SEQ_INCREMENTAL_STATE_CLEARED = 1
+SEQ_NEEDS_INCREMENTAL_STATE = 2
+
+# TrackEvent.Type
+TYPE_SLICE_BEGIN = 1
+TYPE_SLICE_END = 2
+TYPE_INSTANT = 3
+TYPE_COUNTER = 4
+
+_double = Struct('<d')
+_UINT64_MASK = (1 << 64) - 1
+
+
+_SMALL_VARINTS = [bytes((value,)) for value in range(0x80)]
+
+
+def encode_varint(value: int) -> bytes:
+    """ Encodes an integer as a protobuf varint, negative values as their 64 bit two's complement """
+    if 0 <= value < 0x80:
+        return _SMALL_VARINTS[value]
+
+    value &= _UINT64_MASK
+    encoded = bytearray()
+    while value >= 0x80:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+_keys: t.Dict[tuple, bytes] = dict()
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    try:
+        return _keys[field, wire_type]
+    except KeyError:
+        key = _keys[field, wire_type] = encode_varint(field << 3 | wire_type)
+        return key
+
+
+def varint_field(field: int, value: int) -> bytes:
+    """ Encodes an integer, enum or bool field """
+    return _key(field, _VARINT) + encode_varint(value)
+
+
+def double_field(field: int, value: float) -> bytes:
+    """ Encodes a double field """
+    return _key(field, _FIXED64) + _double.pack(value)
+
+
+def bytes_field(field: int, value: bytes) -> bytes:
+    """ Encodes a length delimited field, i.e. an embedded message, string or bytes """
+    return _key(field, _LENGTH_DELIMITED) + encode_varint(len(value)) + value
+
+
+def string_field(field: int, value: str) -> bytes:
+    """ Encodes a string field """
+    return bytes_field(field, value.encode('utf-8'))
+
+
+def _debug_annotation(name: str, value) -> bytes:
+    if isinstance(value, bool):
+        encoded = varint_field(_ANNOTATION_BOOL_VALUE, value)
+    elif isinstance(value, int):
+        encoded = varint_field(_ANNOTATION_INT_VALUE, value)
+    elif isinstance(value, float):
+        encoded = double_field(_ANNOTATION_DOUBLE_VALUE, value)
+    elif isinstance(value, str):
+        encoded = string_field(_ANNOTATION_STRING_VALUE, value)
+    else:
+        encoded = string_field(_ANNOTATION_STRING_VALUE, dumps(value, default=str))
+    return bytes_field(_EVENT_DEBUG_ANNOTATIONS, string_field(_ANNOTATION_NAME, name) + encoded)
+
+
+_NEEDS_STATE_FIELD = varint_field(_PACKET_SEQUENCE_FLAGS, SEQ_NEEDS_INCREMENTAL_STATE)
+_CLEARED_STATE_FIELD = varint_field(
+    _PACKET_SEQUENCE_FLAGS, SEQ_INCREMENTAL_STATE_CLEARED | SEQ_NEEDS_INCREMENTAL_STATE)
+
+
+def stable_uuid(key: tuple) -> int:
+    """
+    Derives a track uuid from a key of strings and integers, the same in every process. 40 bits keep
+    the varint in every event to 6 bytes, collisions are still unlikely for thousands of tracks
+    """
+    digest = blake2b(repr(key).encode('utf-8'), digest_size=5).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _debug_annotations(args: dict | None) -> bytes:
+    if not args:
+        return b''
+    return b''.join(_debug_annotation(str(key), value) for key, value in args.items())
+
+
+def _thread_id(data: dict) -> int:
+    """ The thread id of a json event, written as `tis` by this package """
+    thread_id = data.get('tid')
+    return thread_id if thread_id is not None else data.get('tis', 0)
+
+
+_CATEGORY = CompleteEvent.category_field.default
+
+
+def _interned_string(field: int, iid: int, value: str) -> bytes:
+    """ Encodes an `EventName` or `EventCategory` entry of `InternedData` """
+    return bytes_field(field, varint_field(_INTERNED_IID, iid) + string_field(_INTERNED_NAME, value))
+
+
+class PerfettoWriter:
+    """
+    Writes the Perfetto protobuf trace format incrementally, without depending on the generated
+    protobuf modules. Each event is written as soon as it is received as one or more length
+    delimited `TracePacket` records, the concatenation of which is a valid `Trace` message
+
+    Complete events become a slice begin and end on their thread track, and each counter series gets
+    its own counter track. Track descriptors are written the first time a process, thread or counter
+    is seen, and again when a metadata event names them. Trace `otherData` has no equivalent in the
+    format and is not written
+
+    Event names and categories are interned: each is sent once per sequence in the `InternedData`
+    of the first packet using it, later events only refer to it by iid. The encoded fields that
+    repeat between events are cached, so each event mostly costs encoding its timestamps
+    """
+
+    _file: t.BinaryIO
+    _batch_size: int
+    _sequence_field: bytes
+    _packets: t.List[bytes]
+    _tracks: t.Dict[tuple, int]
+    _slices: t.Dict[tuple, t.Tuple[bytes, bytes]]
+    _names: t.Dict[tuple, bytes]
+    _event_names: t.Dict[str, int]
+    _categories: t.Dict[str, int]
+    _flags_field: bytes
+    _time_offset: float
+    _stable_uuids: bool
+    _count: int
+    _closed: bool
+
+    def __init__(
+            self, file: t.BinaryIO, batch_size: int = 1000, sequence_id: int = 1,
+            time_offset: float = 0.0, stable_uuids: bool = False):
+        """
+        :param file: Binary file to write to
+        :param batch_size: Number of events encoded before packets are written to the file
+        :param sequence_id: Trusted packet sequence id of the written packets
+        :param time_offset: Microseconds added to event timestamps, which must not end up negative
+        :param stable_uuids: Flag to derive track uuids from process and thread ids rather than number
+            them in order, so separately written parts of a trace agree on them
+        """
+        self._file = file
+        self._batch_size = batch_size
+        self._sequence_field = varint_field(_PACKET_SEQUENCE_ID, sequence_id)
+        self._packets = []
+        self._tracks = dict()
+        self._slices = dict()
+        self._names = dict()
+        self._event_names = dict()
+        self._categories = dict()
+        # The first packet referring to interned data also tells the reader the sequence starts empty
+        self._flags_field = _CLEARED_STATE_FIELD
+        self._time_offset = time_offset
+        self._stable_uuids = stable_uuids
+        self._count = 0
+        self._closed = False
+
+    @property
+    def count(self) -> int:
+        """ Number of events written """
+        return self._count
+
+    def _write_packet(self, packet: bytes):
+        self._packets.append(bytes_field(_TRACE_PACKET, packet))
+
+    def _write_track(self, uuid: int, descriptor: bytes):
+        self._write_packet(bytes_field(
+            _PACKET_TRACK_DESCRIPTOR, varint_field(_TRACK_UUID, uuid) + descriptor))
+
+    def _new_uuid(self, key: tuple) -> int:
+        if self._stable_uuids:
+            return stable_uuid(key)
+        # Small uuids keep the track reference in every event down to a byte or two
+        return len(self._tracks) + 1
+
+    def _track_uuid(self, key: tuple) -> int:
+        """ Returns the uuid of a track, without writing its descriptor when it is new """
+        uuid = self._tracks.get(key)
+        if uuid is None:
+            uuid = self._tracks[key] = self._new_uuid(key)
+        return uuid
+
+    def _write_process_track(self, uuid: int, process_id: int, name: str | None = None):
+        process = varint_field(_PROCESS_PID, process_id)
+        if name is not None:
+            process += string_field(_PROCESS_NAME, name)
+        self._write_track(uuid, bytes_field(_TRACK_PROCESS, process))
+
+    def _write_thread_track(self, uuid: int, process_id: int, thread_id: int, name: str | None = None):
+        thread = varint_field(_THREAD_PID, process_id) + varint_field(_THREAD_TID, thread_id)
+        if name is not None:
+            thread += string_field(_THREAD_NAME, name)
+        self._write_track(
+            uuid,
+            varint_field(_TRACK_PARENT_UUID, self._process_track(process_id)) +
+            bytes_field(_TRACK_THREAD, thread))
+
+    def _process_track(self, process_id: int) -> int:
+        key = ('process', process_id)
+        uuid = self._tracks.get(key)
+        if uuid is None:
+            uuid = self._tracks[key] = self._new_uuid(key)
+            self._write_process_track(uuid, process_id)
+        return uuid
+
+    def _thread_track(self, process_id: int, thread_id: int) -> int:
+        key = ('thread', process_id, thread_id)
+        uuid = self._tracks.get(key)
+        if uuid is None:
+            uuid = self._tracks[key] = self._new_uuid(key)
+            self._write_thread_track(uuid, process_id, thread_id)
+        return uuid
+
+    def _global_track(self) -> int:
+        key = ('global',)
+        uuid = self._tracks.get(key)
+        if uuid is None:
+            uuid = self._tracks[key] = self._new_uuid(key)
+            self._write_track(uuid, string_field(_TRACK_NAME, 'Global'))
+        return uuid
+
+    def _counter_track(self, process_id: int, name: str) -> int:
+        key = ('counter', process_id, name)
+        uuid = self._tracks.get(key)
+        if uuid is None:
+            parent_uuid = self._process_track(process_id)
+            uuid = self._tracks[key] = self._new_uuid(key)
+            self._write_track(
+                uuid,
+                varint_field(_TRACK_PARENT_UUID, parent_uuid) +
+                string_field(_TRACK_NAME, name) +
+                bytes_field(_TRACK_COUNTER, b''))
+        return uuid
+
+    def _timestamp_field(self, timestamp: float) -> bytes:
+        """ Encodes a timestamp in microseconds as the packet timestamp in nanoseconds """
+        nanoseconds = int(round((timestamp + self._time_offset) * 1e3))
+        if nanoseconds < 0:
+            raise ValueError(
+                f'Perfetto timestamps cannot be negative, {timestamp}us needs a larger time offset')
+        return varint_field(_PACKET_TIMESTAMP, nanoseconds)
+
+    def _track_event(self, timestamp: float, track_event: bytes):
+        self._write_packet(
+            self._timestamp_field(timestamp) + self._sequence_field +
+            bytes_field(_PACKET_TRACK_EVENT, track_event))
+
+    def _slice_fields(self, process_id: int, thread_id: int) -> t.Tuple[bytes, bytes]:
+        """ Returns the begin event prefix and the whole end event field for a thread track """
+        key = (process_id, thread_id)
+        fields = self._slices.get(key)
+        if fields is None:
+            track = varint_field(_EVENT_TRACK_UUID, self._thread_track(process_id, thread_id))
+            fields = self._slices[key] = (
+                varint_field(_EVENT_TYPE, TYPE_SLICE_BEGIN) + track,
+                bytes_field(_PACKET_TRACK_EVENT, varint_field(_EVENT_TYPE, TYPE_SLICE_END) + track))
+        return fields
+
+    def _intern(self, table: t.Dict[str, int], field: int, value: str) -> t.Tuple[int, bytes]:
+        """ Returns the iid of a string, and its interned data entry when it is new to the sequence """
+        iid = table.get(value)
+        if iid is not None:
+            return iid, b''
+
+        iid = table[value] = len(table) + 1
+        return iid, _interned_string(field, iid, value)
+
+    def _name_fields(self, name: str, category: str) -> t.Tuple[bytes, bytes]:
+        """ Returns the name and category iid fields, and the interned data needed to resolve them """
+        key = (name, category)
+        fields = self._names.get(key)
+        if fields is not None:
+            return fields, b''
+
+        category_iid, interned_category = self._intern(
+            self._categories, _INTERNED_EVENT_CATEGORIES, category)
+        name_iid, interned_name = self._intern(self._event_names, _INTERNED_EVENT_NAMES, name)
+        fields = self._names[key] = (
+            varint_field(_EVENT_CATEGORY_IIDS, category_iid) + varint_field(_EVENT_NAME_IID, name_iid))
+        # InternedData lists categories (field 1) before names (field 2)
+        return fields, interned_category + interned_name
+
+    def _write_interned_event(self, timestamp: float, track_event: bytes, interned: bytes):
+        """ Writes a track event referring to interned strings, with any newly interned data """
+        packet = (
+            self._timestamp_field(timestamp) + self._sequence_field + self._flags_field +
+            bytes_field(_PACKET_TRACK_EVENT, track_event))
+        if interned:
+            packet += bytes_field(_PACKET_INTERNED_DATA, interned)
+        self._write_packet(packet)
+        self._flags_field = _NEEDS_STATE_FIELD
+
+    def _write_begin(
+            self, process_id: int, thread_id: int, name: str, category: str, timestamp: float,
+            args: dict | None):
+        begin_prefix = self._slice_fields(process_id, thread_id)[0]
+        name_fields, interned = self._name_fields(name, category)
+        self._write_interned_event(
+            timestamp, begin_prefix + name_fields + _debug_annotations(args), interned)
+
+    def _write_end(self, process_id: int, thread_id: int, timestamp: float):
+        end_field = self._slice_fields(process_id, thread_id)[1]
+        self._write_packet(self._timestamp_field(timestamp) + self._sequence_field + end_field)
+
+    def _write_slice(
+            self, process_id: int, thread_id: int, name: str, category: str, start_time: float,
+            duration: float, args: dict | None):
+        self._write_begin(process_id, thread_id, name, category, start_time, args)
+        self._write_end(process_id, thread_id, start_time + duration)
+
+    def _write_instant(
+            self, track: int, name: str, category: str, timestamp: float, args: dict | None):
+        name_fields, interned = self._name_fields(name, category)
+        self._write_interned_event(
+            timestamp,
+            varint_field(_EVENT_TYPE, TYPE_INSTANT) + varint_field(_EVENT_TRACK_UUID, track) +
+            name_fields + _debug_annotations(args),
+            interned)
+
+    def _write_counter(self, process_id: int, name: str, timestamp: float, args: dict | None):
+        for key, value in (args or {}).items():
+            if isinstance(value, int):
+                value_field = varint_field(_EVENT_COUNTER_VALUE, value)
+            elif isinstance(value, float):
+                value_field = double_field(_EVENT_DOUBLE_COUNTER_VALUE, value)
+            else:
+                continue
+
+            # Counters named after their only series, as recorded by the profiler, keep that name
+            track = self._counter_track(process_id, name if key == name else f'{name} {key}')
+            self._track_event(
+                timestamp,
+                varint_field(_EVENT_TYPE, TYPE_COUNTER) +
+                varint_field(_EVENT_TRACK_UUID, track) +
+                value_field)
+
+    def _written(self):
+        self._count += 1
+        if self._count % self._batch_size == 0:
+            self.flush()
+
+    def write_event(self, event: AnyEvent):
+        """ Encodes one event, writing the batch once it is full """
+        if isinstance(event, CompleteEvent):
+            self._write_slice(
+                event.process_id, event.thread_id, event.name, event.category, event.start_time,
+                event.duration, event.args)
+        elif isinstance(event, CounterEvent):
+            self._write_counter(event.process_id, event.name, event.timestamp, event.args)
+        else:
+            raise TypeError(f'Unable to write event of type {type(event).__name__} as perfetto')
+
+        self._written()
+
+    def _json_complete(self, data: dict):
+        self._write_slice(
+            data.get('pid', 0), _thread_id(data), data.get('name', ''), data.get('cat', _CATEGORY),
+            data['ts'], data.get('dur', 0), data.get('args'))
+
+    def _json_begin(self, data: dict):
+        self._write_begin(
+            data.get('pid', 0), _thread_id(data), data.get('name', ''), data.get('cat', _CATEGORY),
+            data['ts'], data.get('args'))
+
+    def _json_end(self, data: dict):
+        self._write_end(data.get('pid', 0), _thread_id(data), data['ts'])
+
+    def _json_counter(self, data: dict):
+        name = data.get('name', '')
+        if 'id' in data:
+            name = f'{name} {data["id"]}'
+        self._write_counter(data.get('pid', 0), name, data['ts'], data.get('args'))
+
+    def _json_instant(self, data: dict):
+        scope = data.get('s', 't')
+        if scope == 'g':
+            track = self._global_track()
+        elif scope == 'p':
+            track = self._process_track(data.get('pid', 0))
+        else:
+            track = self._thread_track(data.get('pid', 0), _thread_id(data))
+
+        self._write_instant(
+            track, data.get('name', ''), data.get('cat', _CATEGORY), data['ts'], data.get('args'))
+
+    def _json_metadata(self, data: dict):
+        name = data.get('name')
+        value = (data.get('args') or {}).get('name')
+        if value is None:
+            # Sort indices and labels have no equivalent
+            return
+
+        process_id = data.get('pid', 0)
+        if name == 'process_name':
+            uuid = self._track_uuid(('process', process_id))
+            self._write_process_track(uuid, process_id, str(value))
+        elif name == 'thread_name':
+            thread_id = _thread_id(data)
+            uuid = self._track_uuid(('thread', process_id, thread_id))
+            self._write_thread_track(uuid, process_id, thread_id, str(value))
+
+    _json_writers = {
+        'X': _json_complete,
+        'B': _json_begin,
+        'E': _json_end,
+        'C': _json_counter,
+        'i': _json_instant,
+        'I': _json_instant,
+        'M': _json_metadata,
+    }
+
+    def write_json_event(self, data: dict):
+        """
+        Encodes one event from its json representation, as read from a trace file, without building
+        an event object. The thread id is read from `tid`, or from `tis` as written by this package
+
+        Besides complete and counter events, duration begin/end (`B`/`E`) events become slices,
+        instant events (`i`/`I`) are placed on the thread, process or global track given by their
+        scope, and `process_name`/`thread_name` metadata events name their tracks
+        """
+        writer = self._json_writers.get(data.get('ph'))
+        if writer is None:
+            raise TypeError(f'Unable to write event with \'ph\': \'{data.get("ph")}\' as perfetto')
+
+        writer(self, data)
+        self._written()
+
+    def write_events(self, events: t.Iterable[AnyEvent]):
+        """ Writes events in batches """
+        for event in events:
+            self.write_event(event)
+
+    def flush(self):
+        """ Writes the encoded packets to the file """
+        if self._packets:
+            self._file.write(b''.join(self._packets))
+            self._packets = []
+        self._file.flush()
+
+    def close(self, data: dict | None = None):
+        """ Writes any buffered packets, `data` is accepted for compatibility with `TraceWriter` """
+        if self._closed:
+            return
+
+        self.flush()
+        self._closed = True
+
+
+__all__ = [PerfettoWriter]
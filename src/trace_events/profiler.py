@@ -1,186 +1,768 @@
 from datetime import datetime
 from functools import wraps
-from json import dump, dumps
+from json import dumps
 from logging import Logger
-from os import path, makedirs
+from os import getpid, path, makedirs
+from threading import Lock, current_thread, local
 import typing as t
+from weakref import WeakSet
 
-from .context import global_context
+from .clocks import ClockFunction, clock_anchor, clock_source
+from .context import global_context, trace_switch as _switch
 from .events import CompleteEvent, CounterEvent
+from .files import is_perfetto_file, open_trace_file, split_trace_extension
 from .json import TraceJsonEncoder
+from .perfetto import PerfettoWriter
+from .sampling import Sampler
+from .stats import LatencyHistogram
+from .storage import AnyEventStore, ColumnarEvents, EventList, EventRing, StringTable
 from .trace import Trace
-from .utils import fixup_name, perf_time
+from .utils import fixup_name, qualified_name
+from .writer import TraceWriter
+
+try:
+    from os import register_at_fork
+except ImportError:
+    # Not available on Windows, which does not fork
+    register_at_fork = None
+
+
+AnyTraceWriter = t.Union[TraceWriter, PerfettoWriter]
+
+# Capacity of the flight recorder ring of each thread when only `max_age` bounds it
+DEFAULT_RING_EVENTS = 100_000
 
 
 class Topics:
-    """ Maintains counters """
+    """
+    Maintains counters, sharded per thread so increments never contend. Each thread only writes its
+    own shard; totals are summed over the shards when read
+    """
 
-    _counters: t.Dict[str, int]
+    _local: local
+    _shards: t.List[t.Dict[str, int]]
+    _lock: Lock
 
     def __init__(self):
-        self._counters = dict()
+        self._local = local()
+        self._shards = []
+        self._lock = Lock()
+
+    def _shard(self) -> t.Dict[str, int]:
+        """ Return the counters owned by the calling thread """
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = dict()
+            with self._lock:
+                self._shards.append(shard)
+            return shard
 
     def increment(self, topic: str):
         """ Increment the count for the given topic """
-        # ToDo: maybe make this atomic with a lock?
-        if topic in self._counters:
-            self._counters[topic] += 1
-        else:
-            self._counters[topic] = 1
+        shard = self._shard()
+        shard[topic] = shard.get(topic, 0) + 1
+
+    def count(self, topic: str) -> int:
+        """ Return the current count for the given topic, summed over all threads """
+        return sum(shard.get(topic, 0) for shard in self._shards)
 
     def counters(self) -> dict:
-        """ Return a copy of the current counters """
-        return self._counters.copy()
+        """ Return a copy of the current counters, summed over all threads """
+        totals = dict()
+        for shard in list(self._shards):
+            for topic, count in shard.copy().items():
+                totals[topic] = totals.get(topic, 0) + count
+        return totals
+
+
+class _ThreadBuffer:
+    """
+    Events recorded by a single thread, only ever appended to by that thread. `lock` is held while
+    appending or measuring and while the events or histograms are read by another thread, so it never
+    sees a store or histogram the owner is still updating
+    """
+
+    __slots__ = ('process_id', 'thread_id', 'lock', 'events', 'dropped', 'statistics')
+
+    process_id: int
+    thread_id: int
+    lock: Lock
+    events: AnyEventStore
+    dropped: t.Dict[str, t.List[float]]
+    statistics: t.Dict[str, LatencyHistogram]
+
+    def __init__(self, process_id: int, thread_id: int, events: AnyEventStore):
+        self.process_id = process_id
+        self.thread_id = thread_id
+        self.lock = Lock()
+        self.events = events
+        self.dropped = dict()
+        self.statistics = dict()
+
+    def measure(self, name: str, duration: float):
+        """ Adds a span duration to the latency histogram for its name """
+        histogram = self.statistics.get(name)
+        if histogram is None:
+            histogram = self.statistics[name] = LatencyHistogram()
+        histogram.add(duration)
+
+    def drop(self, name: str, duration: float):
+        """ Folds a span too short to store into the [count, total, max] aggregate for its name """
+        aggregate = self.dropped.get(name)
+        if aggregate is None:
+            self.dropped[name] = [1, duration, duration]
+            return
+
+        aggregate[0] += 1
+        aggregate[1] += duration
+        if duration > aggregate[2]:
+            aggregate[2] = duration
 
 
 class Profiler:
-    _trace: Trace
+    """
+    Records trace events. Each thread appends into its own buffer, under a lock of that buffer which
+    is only contended while another thread takes the events out; buffers are merged into a single
+    `Trace` when the trace is saved or dumped
+
+    With `columnar` enabled events are stored in typed array columns instead of event objects,
+    reducing memory per event to tens of bytes
+
+    Setting `max_events` and/or `max_age` enables flight recorder mode: each thread keeps only its
+    most recent events in a ring buffer, so tracing can be left on in long running processes and the
+    window saved on demand. The ring holds `max_events`, or `DEFAULT_RING_EVENTS` when only
+    `max_age` is set, so memory stays bounded however busy a thread gets. Events older than `max_age`
+    are also dropped when the trace is taken, including those of threads which stopped recording
+
+    Spans shorter than `min_duration` are not stored, they are folded into per-name aggregates
+    (count, total and max duration) saved in the trace `otherData` under `dropped_spans`
+
+    With `statistics` enabled spans are not stored at all, instead each name keeps a streaming latency
+    histogram in constant memory. Counter events are still recorded. The histograms are available
+    live from `statistics()` and saved in the trace `otherData` under `statistics`
+
+    With `stream` enabled each thread writes its events to the trace file once it has `batch_size`
+    of them, and drops them from memory. `save_trace` writes the remaining events and completes the
+    file
+
+    Trace files are compressed when their name ends with `.gz`, `.bz2`, `.xz` or `.zst`. `compact`
+    and `timestamp_precision` further reduce the size of the written json. Files named `.pftrace` or
+    `.perfetto-trace` are written in the perfetto protobuf format instead, `otherData` is not saved
+    in that format
+
+    Timestamps are read from `clock` in integer nanoseconds, and only converted to microseconds since
+    the start of the trace when an event is stored. The trace `otherData` records the `clock_anchor`
+    read when the trace starts and the `save_anchor` read when it is saved, pairing the clock with the
+    monotonic, boottime and realtime clocks. `merge_traces` uses them to put the traces of separate
+    processes and hosts on one timeline
+
+    A process forked from one with a profiler starts a new trace, its own shard: the events of the
+    parent are dropped and a stream opened by the parent is left to it. Trace files of a shard are
+    named after its process id, e.g. `trace.1234.json`, see `merge_traces` to combine them
+    """
+
+    _data: dict
+    _local: local
+    _buffers: t.List[_ThreadBuffer]
+    _buffers_lock: Lock
     _topics: Topics
-    _start_time: float
+    _strings: StringTable | None
+    _samplers: t.Dict[str, Sampler]
+    _columnar: bool
+    _max_events: int | None
+    _max_age: float | None
+    _min_duration: float
+    _statistics: bool
+    _stream: bool
+    _flush_size: float
+    _batch_size: int
+    _compact: bool
+    _timestamp_precision: int | None
+    _stream_lock: Lock
+    _writer: AnyTraceWriter | None
+    _stream_file: t.IO | None
+    _stream_path: str | None
+    _shard_id: int | None
+    _clock_name: str
+    _clock: ClockFunction
+    _start_ns: int
     _file_name: str | None
     _logger: Logger
 
-    def __init__(self, file_name: str | None = None, logger: Logger = None):
-        self._trace = Trace()
-        self._topics = Topics()
-        self._start_time = perf_time()
+    def __init__(
+            self, file_name: str | None = None, logger: Logger = None, columnar: bool = False,
+            max_events: int | None = None, max_age: float | None = None,
+            min_duration: float | None = None, statistics: bool = False, stream: bool = False,
+            batch_size: int = 1000, compact: bool = False, timestamp_precision: int | None = None,
+            clock: str = 'perf'):
+        """
+        :param file_name: Default name of the trace file
+        :param logger: Optional logger
+        :param columnar: Flag to store events in typed array columns
+        :param max_events: Maximum number of events retained per thread in flight recorder mode
+        :param max_age: Maximum age in seconds of events retained in flight recorder mode, at most
+            `DEFAULT_RING_EVENTS` per thread are retained without `max_events`
+        :param min_duration: Minimum duration in seconds of spans stored individually
+        :param statistics: Flag to record per-name latency histograms instead of spans
+        :param stream: Flag to write events to the trace file in batches as they are recorded
+        :param batch_size: Number of events written at a time when saving or streaming
+        :param compact: Flag to write json without whitespace between event fields
+        :param timestamp_precision: Number of decimal places of a microsecond kept in timestamps
+        :param clock: Clock timestamps are read from, one of `perf`, `monotonic`, `boottime` or `realtime`
+        """
+        self._buffers_lock = Lock()
+        self._stream_lock = Lock()
+        self._writer = None
+        self._stream_file = None
+        self._stream_path = None
+        self._samplers = dict()
+        self._shard_id = None
+        _profilers.add(self)
+        self.configure(
+            file_name, logger, columnar, max_events, max_age, min_duration, statistics, stream,
+            batch_size, compact, timestamp_precision, clock)
+
+    def configure(
+            self, file_name: str | None = None, logger: Logger = None, columnar: bool = False,
+            max_events: int | None = None, max_age: float | None = None,
+            min_duration: float | None = None, statistics: bool = False, stream: bool = False,
+            batch_size: int = 1000, compact: bool = False, timestamp_precision: int | None = None,
+            clock: str = 'perf'):
+        """
+        Replaces the configuration and resets the profiler. Functions already decorated with this
+        profiler keep recording into it
+        """
+        flight_recorder = max_events is not None or max_age is not None
+        if columnar and flight_recorder:
+            raise ValueError('Flight recorder mode does not support columnar storage')
+        if stream and flight_recorder:
+            raise ValueError('Flight recorder mode does not support streaming')
+
+        clock_function = clock_source(clock)
+
         self._file_name = file_name
         self._logger = logger
+        self._columnar = columnar
+        self._max_events = max_events
+        self._max_age = max_age
+        # Event timestamps are in microseconds
+        self._min_duration = (min_duration or 0.0) * 1e6
+        self._statistics = statistics
+        self._stream = stream
+        self._batch_size = batch_size
+        self._flush_size = batch_size if stream else float('inf')
+        self._compact = compact
+        self._timestamp_precision = timestamp_precision
+        self._clock_name = clock
+        self._clock = clock_function
+        self.reset()
+
+    @property
+    def start_time(self) -> float:
+        """ Clock time the trace timestamps start from, in microseconds """
+        return self._start_ns / 1000
+
+    @property
+    def start_ns(self) -> int:
+        """ Clock time the trace timestamps start from, in nanoseconds """
+        return self._start_ns
 
-        self._trace.add_data({
-            "start_time": self._start_time,
-            "timestamp": datetime.now().isoformat()
-        })
+    @property
+    def shard_id(self) -> int | None:
+        """ Process id the trace files are named after, `None` unless recording a shard """
+        return self._shard_id
+
+    def _start_shard(self):
+        """ Records the trace of this process as one shard of a multi process trace """
+        self._shard_id = getpid()
+
+    def _after_fork(self):
+        """ Starts the trace of a forked child as a new shard, the inherited state belongs to the parent """
+        # The locks may have been held by another thread of the parent when it forked
+        self._buffers_lock = Lock()
+        self._stream_lock = Lock()
+        # Closing the inherited stream would write out the parent's buffered output a second time
+        self._stream_file = None
+        self._writer = None
+        self._stream_path = None
+        self._start_shard()
+        self.reset()
 
     @property
-    def start_time(self):
-        return self._start_time
-
-    def _add_complete_event(self, name: str, start_time: float, end_time: float, category: str = None, args: dict = None):
-        self._trace.events.append(CompleteEvent(
-            name,
-            start_time - self._start_time,
-            end_time - start_time,
-            category,
-            args))
-
-    def _add_counter_event(self, name: str, topic: str, timestamp: float = None, category: str = None):
-        self._topics.increment(topic)
-        timestamp = (timestamp or perf_time()) - self._start_time
-        self._trace.events.append(CounterEvent(
-            name, timestamp, category=category, args=self._topics.counters()))
+    def clock(self) -> ClockFunction:
+        """ Reads the clock of this profiler, in integer nanoseconds """
+        return self._clock
+
+    def _buffer(self) -> _ThreadBuffer:
+        """ Return the event buffer owned by the calling thread, registering it on first use """
+        try:
+            return self._local.buffer
+        except AttributeError:
+            buffer = self._local.buffer = _ThreadBuffer(
+                getpid(), current_thread().native_id, self._new_store())
+            with self._buffers_lock:
+                self._buffers.append(buffer)
+            return buffer
+
+    def _new_store(self) -> AnyEventStore:
+        if self._columnar:
+            return ColumnarEvents(self._strings)
+
+        if self._max_events is not None or self._max_age is not None:
+            # Event timestamps are in microseconds
+            max_age = self._max_age * 1e6 if self._max_age is not None else None
+            max_events = self._max_events if self._max_events is not None else DEFAULT_RING_EVENTS
+            return EventRing(max_events, max_age)
+
+        return EventList()
+
+    def _add_complete_event(self, name: str, start_time: int, end_time: int, category: str = None, args: dict = None):
+        """ Records a span between two readings of the profiler clock, in nanoseconds """
+        buffer = self._buffer()
+        # Stored in microseconds, subtracting in integer nanoseconds first keeps full precision
+        duration = (end_time - start_time) / 1000
+        if self._statistics:
+            with buffer.lock:
+                buffer.measure(name, duration)
+            return
+
+        if duration < self._min_duration:
+            buffer.drop(name, duration)
+            return
+
+        with buffer.lock:
+            events = buffer.events
+            events.add_complete_event(
+                name,
+                (start_time - self._start_ns) / 1000,
+                duration,
+                category,
+                args,
+                buffer.process_id,
+                buffer.thread_id)
+            full = len(events) >= self._flush_size
+
+        if full:
+            self._flush(buffer)
+
+    def _add_counter_event(self, name: str, topic: str, timestamp: int = None, category: str = None):
+        """
+        Increments the topic and records its new total. Each topic is its own counter track, so the
+        event is named after the topic and only carries that topic's value; `name` is the source
+        of the increment and is not recorded
+        """
+        topics = self._topics
+        topics.increment(topic)
+        timestamp = ((timestamp or self._clock()) - self._start_ns) / 1000
+        buffer = self._buffer()
+        with buffer.lock:
+            events = buffer.events
+            events.add_counter_event(
+                topic, timestamp, category, {topic: topics.count(topic)}, buffer.process_id,
+                buffer.thread_id)
+            full = len(events) >= self._flush_size
+
+        if full:
+            self._flush(buffer)
+
+    def _flush(self, buffer: _ThreadBuffer):
+        """
+        Swaps out the events of a buffer and writes them to the streamed trace file. Any thread may
+        flush any buffer: the swap is made under the buffer lock, and under the stream lock so batches
+        are written in the order they were taken
+        """
+        with self._stream_lock:
+            with buffer.lock:
+                events = buffer.events
+                buffer.events = self._new_store()
+
+            if self._writer is None:
+                self._open_stream()
+            self._writer.write_events(events)
+            self._writer.flush()
+
+    def _open_stream(self, file_name: str | None = None):
+        self._stream_path = self._file_path(file_name)
+        self._make_dirs(self._stream_path)
+
+        if self._logger:
+            self._logger.info(f'streaming trace file to: {self._stream_path}')
+
+        self._stream_file, self._writer = self._open_writer(self._stream_path)
+
+    def _open_writer(self, file_path: str) -> t.Tuple[t.IO, AnyTraceWriter]:
+        """ Opens a trace file with the writer selected by its extension """
+        if is_perfetto_file(file_path):
+            file = open_trace_file(file_path, 'wb')
+            return file, PerfettoWriter(file, self._batch_size)
+
+        file = open_trace_file(file_path, 'w')
+        return file, TraceWriter(file, self._batch_size, self._compact, self._timestamp_precision)
+
+    def _finish_stream(self) -> str | None:
+        """ Writes the events left in every buffer to the streamed file and completes it """
+        with self._buffers_lock:
+            buffers = list(self._buffers)
+        for buffer in buffers:
+            self._flush(buffer)
+        return self._close_stream(self._trace_data(buffers))
+
+    def _close_stream(self, data: dict) -> str | None:
+        """ Completes the streamed trace file, returning its path """
+        with self._stream_lock:
+            writer, self._writer = self._writer, None
+            if writer is None:
+                return None
+
+            writer.close(data)
+            self._stream_file.close()
+            self._stream_file = None
+            return self._stream_path
 
     def _file_path(self, file_name: str | None) -> str:
         context = global_context()
         file_name = file_name or self._file_name or 'trace.json'
         file_path = context.trace_file_path(file_name)
 
+        if self._shard_id is not None:
+            base_path, extension = split_trace_extension(file_path)
+            file_path = f'{base_path}.{self._shard_id}{extension}'
+
         if context.overwrite_trace_files:
-            return file_name
+            return file_path
 
-        base_name = path.splitext(path.basename(file_path))[0]
+        base_path, extension = split_trace_extension(file_path)
         index = 0
 
         while path.exists(file_path):
-            file_name = f'{base_name}-{index}.json'
-            file_path = context.trace_file_path(file_name)
+            file_path = f'{base_path}-{index}{extension}'
             index += 1
 
         return file_path
 
+    @staticmethod
+    def _make_dirs(file_path: str):
+        dir_path = path.dirname(file_path)
+        if dir_path and not path.exists(dir_path):
+            makedirs(dir_path)
+
     def reset(self):
-        self._trace = Trace()
+        """ Discard all recorded events and restart the trace clock. A streamed file is completed """
+        if self._writer is not None:
+            self._finish_stream()
+
+        with self._buffers_lock:
+            self._local = local()
+            self._buffers = []
+            self._strings = StringTable() if self._columnar else None
         self._topics = Topics()
-        self._start_time = perf_time()
+        self._start_ns = self._clock()
+        anchor = clock_anchor(self._clock_name)
+        # The realtime clock when the trace starts, rather than a separate reading of it
+        start_realtime_ns = anchor['realtime_ns'] - (anchor['clock_ns'] - self._start_ns)
+        self._data = {
+            "start_time": self.start_time,
+            "start_ns": self._start_ns,
+            "clock": self._clock_name,
+            "timestamp": datetime.fromtimestamp(start_realtime_ns / 1e9).isoformat(),
+            "clock_anchor": anchor,
+        }
 
-    def save_trace(self, file_name: str | None = None):
-        """ Saves the trace events into the specified file """
-        file_path = self._file_path(file_name)
-        dir_path = path.dirname(file_path)
+    @property
+    def has_events(self) -> bool:
+        """ Flag indicating whether any thread has recorded into this profiler since the last reset """
+        return bool(self._buffers)
+
+    def statistics(self) -> t.Dict[str, dict]:
+        """
+        Returns the latency statistics recorded so far for each name: count, sum, min, max and the
+        p50, p90, p99 and p999 quantiles, in microseconds
+        """
+        with self._buffers_lock:
+            buffers = list(self._buffers)
+
+        return {name: histogram.to_json() for name, histogram in _merge_statistics(buffers).items()}
+
+    def trace(self) -> Trace:
+        """ Merges the per-thread buffers into a single trace """
+        with self._buffers_lock:
+            buffers = list(self._buffers)
+
+        events = ColumnarEvents(self._strings) if self._columnar else []
+        # Threads which stopped recording have not expired their old events
+        now = (self._clock() - self._start_ns) / 1000 if self._max_age is not None else None
+        for buffer in buffers:
+            with buffer.lock:
+                if now is not None:
+                    buffer.events.expire(now)
+                snapshot = buffer.events.snapshot()
+            events.extend(snapshot)
+
+        return Trace(events=events, data=self._trace_data(buffers))
+
+    def _trace_data(self, buffers: t.List[_ThreadBuffer]) -> dict:
+        """ The trace `otherData`, including aggregates merged from the given buffers """
+        data = dict(self._data)
+        data['save_anchor'] = clock_anchor(self._clock_name)
+
+        dropped = _merge_dropped(buffers)
+        if dropped:
+            data['dropped_spans'] = dropped
+
+        if self._statistics:
+            data['statistics'] = {
+                name: histogram.to_json() for name, histogram in _merge_statistics(buffers).items()}
+
+        if self._samplers:
+            data['sampling'] = {
+                name: sampler.to_json() for name, sampler in list(self._samplers.items())}
+
+        return data
+
+    def save_trace(self, file_name: str | None = None) -> str:
+        """
+        Saves the trace events into the specified file, returning its path. Events are serialized a
+        batch at a time rather than building the whole json document in memory
+
+        When streaming, the remaining events are written to the streamed file which is then
+        completed, `file_name` is only used when nothing has been streamed yet
+        """
+        if self._stream or self._writer is not None:
+            with self._stream_lock:
+                if self._writer is None:
+                    self._open_stream(file_name)
+
+            return self._finish_stream()
 
-        if not path.exists(dir_path):
-            makedirs(dir_path)
+        file_path = self._file_path(file_name)
+        self._make_dirs(file_path)
 
         if self._logger:
             self._logger.info(f'writing trace file to: {file_path}')
 
-        with open(file_path, 'w') as file:
-            dump(self._trace, file, cls=TraceJsonEncoder, indent=2)
+        trace = self.trace()
+        file, writer = self._open_writer(file_path)
+        with file:
+            writer.write_events(trace.events)
+            writer.close(trace.data)
+
+        return file_path
 
     def dump_trace(self):
-        return dumps(self._trace, cls=TraceJsonEncoder, indent=2, default=str)
+        return dumps(self.trace(), cls=TraceJsonEncoder, indent=2, default=str)
+
+    def counter(self, topic: str, category: str = None, sampler: Sampler = None):
+        """
+        Adds a counter trace to the decorated function
+
+        With a `sampler` every call is counted but only sampled calls add a counter event
+        """
+        category = category or CounterEvent.category_field.default
+        add_counter_event = self._add_counter_event
 
-    def counter(self, topic: str, category: str = None):
         def decorator(func):
+            name = qualified_name(func)
+
             @wraps(func)
             def wrapper(*args, **kwargs):
-                self._add_counter_event(func, topic, category=category)
+                if _switch.enabled:
+                    add_counter_event(name, topic, category=category)
                 return func(*args, **kwargs)
-            return wrapper
+
+            @wraps(func)
+            def count_only(*args, **kwargs):
+                self._topics.increment(topic)
+                return func(*args, **kwargs)
+
+            return _sampled(func, wrapper, count_only, self._register_sampler(name, sampler))
         return decorator
 
-    def exit_counter(self, topic: str, category: str = None):
+    def exit_counter(self, topic: str, category: str = None, sampler: Sampler = None):
+        """
+        Adds an exit counter trace to the decorated function
+
+        With a `sampler` every call is counted but only sampled calls add a counter event
+        """
+        category = category or CounterEvent.category_field.default
+        add_counter_event = self._add_counter_event
+
         def decorator(func):
+            name = qualified_name(func)
+
             @wraps(func)
             def wrapper(*args, **kwargs):
+                if not _switch.enabled:
+                    return func(*args, **kwargs)
+
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    add_counter_event(name, topic, category=category)
+
+            @wraps(func)
+            def count_only(*args, **kwargs):
                 try:
                     return func(*args, **kwargs)
                 finally:
-                    self._add_counter_event(func, topic, category=category)
-            return wrapper
+                    self._topics.increment(topic)
+
+            return _sampled(func, wrapper, count_only, self._register_sampler(name, sampler))
         return decorator
 
-    def profile(self, _func=None, *, category: str = None, event_args: dict = None, **event_kwargs):
+    def profile(
+            self, _func=None, *, category: str = None, event_args: dict = None, sampler: Sampler = None,
+            **event_kwargs):
+        """
+        Adds method call trace to the decorated function. The event name, category and target
+        profiler are resolved once when decorating, so each call only reads the clock twice and
+        appends one event
+
+        With a `sampler`, or a global sampler given to `init_trace`, only sampled calls are recorded
+        and the sampling rates are saved in the trace `otherData` under `sampling`
+        """
         if event_kwargs:
             event_args = event_args or dict()
             event_args.update(event_kwargs)
 
+        category = category or CompleteEvent.category_field.default
+        add_complete_event = self._add_complete_event
+
         def decorator(func):
+            name = qualified_name(func)
+
             @wraps(func)
             def wrapper(*args, **kwargs):
-                start_time = perf_time()
+                if not _switch.enabled:
+                    return func(*args, **kwargs)
+
+                # Looked up per call, as the profiler may be configured with another clock
+                clock = self._clock
+                start_time = clock()
 
                 try:
                     return func(*args, **kwargs)
                 finally:
-                    stop_time = perf_time()
-                    self._add_complete_event(
-                        fixup_name(func), start_time, stop_time, category, event_args)
-            return wrapper
+                    add_complete_event(name, start_time, clock(), category, event_args)
+
+            return _sampled(func, wrapper, func, self._register_sampler(name, sampler))
 
         if _func is None:
             return decorator
 
         return decorator(_func)
 
+    def _register_sampler(self, name: str, sampler: Sampler | None) -> Sampler | None:
+        """ Resolves the sampler for a decorated function and records it for the trace otherData """
+        sampler = _resolve_sampler(sampler)
+        if sampler is not None:
+            self._samplers[name] = sampler
+        return sampler
+
+
+_profilers: 'WeakSet[Profiler]' = WeakSet()
+
+
+def _reset_after_fork():
+    for profiler in list(_profilers):
+        profiler._after_fork()
+
+
+if register_at_fork is not None:
+    register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _merge_dropped(buffers: t.List[_ThreadBuffer]) -> dict:
+    """ Combines the dropped span aggregates of all threads """
+    merged = dict()
+    for buffer in buffers:
+        for name, (count, total, maximum) in buffer.dropped.copy().items():
+            aggregate = merged.get(name)
+            if aggregate is None:
+                merged[name] = dict(count=count, total=total, max=maximum)
+            else:
+                aggregate['count'] += count
+                aggregate['total'] += total
+                aggregate['max'] = max(aggregate['max'], maximum)
+    return merged
+
+
+def _merge_statistics(buffers: t.List[_ThreadBuffer]) -> t.Dict[str, LatencyHistogram]:
+    """ Combines the latency histograms of all threads """
+    merged = dict()
+    for buffer in buffers:
+        with buffer.lock:
+            for name, histogram in buffer.statistics.items():
+                if name not in merged:
+                    merged[name] = LatencyHistogram()
+                merged[name].merge(histogram)
+    return merged
+
+
+def _resolve_sampler(sampler: Sampler | None) -> Sampler | None:
+    """ Returns a fresh sampler for a decorated function, falling back on the global sampler """
+    sampler = sampler if sampler is not None else global_context().sampler
+    return sampler.clone() if sampler is not None else None
+
+
+def _sampled(func, recorded, unrecorded, sampler: Sampler | None):
+    """
+    Calls `recorded` for sampled calls and `unrecorded` otherwise. While tracing is disabled `func` is
+    called directly without sampling
+    """
+    if sampler is None:
+        return recorded
+
+    sample = sampler.sample
+
+    @wraps(recorded)
+    def wrapper(*args, **kwargs):
+        if not _switch.enabled:
+            return func(*args, **kwargs)
+        if sample():
+            return recorded(*args, **kwargs)
+        return unrecorded(*args, **kwargs)
+
+    return wrapper
+
 
 _global_profiler: Profiler = None
 
 
-def _init_global_profiler():
-    """ Initialize the global profiler """
+def configure_global_profiler():
+    """ Creates the global profiler, or applies the global context configuration to the existing one """
     context = global_context()
+    options = dict(
+        file_name=context.global_trace_file_name,
+        logger=context.logger,
+        columnar=context.columnar_storage,
+        max_events=context.max_events,
+        max_age=context.max_age,
+        min_duration=context.min_duration,
+        statistics=context.statistics,
+        stream=context.stream,
+        compact=context.compact,
+        timestamp_precision=context.timestamp_precision,
+        clock=context.clock)
 
     global _global_profiler
-    _global_profiler = Profiler(context.global_trace_file_name)
+    if _global_profiler is None:
+        _global_profiler = Profiler(**options)
+    else:
+        _global_profiler.configure(**options)
 
 
 def global_profiler() -> Profiler:
     """ Access the global profiler """
     global _global_profiler
     if not _global_profiler:
-        _init_global_profiler()
+        configure_global_profiler()
     return _global_profiler
 
 
-def _passthrough(func):
-    """ Non-decorator to remove extra stack calls when profiler not enabled """
-    return func
-
-
 def add_count(name: str, topic: str, category: str = None):
     """ Manually increment the count for a topic. Traces are added to the global profiler """
-    if not global_context().enabled:
+    if not _switch.enabled:
         return
 
     profiler = global_profiler()
@@ -190,64 +772,30 @@ def add_count(name: str, topic: str, category: str = None):
     profiler._add_counter_event(fixup_name(name), topic, category=category)
 
 
-def counter(topic: str, category: str = None):
-    """ Adds a counter trace to the decorated function. Traces are added to the global profiler """
-    if not global_context().enabled:
-        return _passthrough
-
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            global_profiler()._add_counter_event(
-                fixup_name(func), topic, category=category)
-            return func(*args, **kwargs)
-        return wrapper
-    return decorator
+def counter(topic: str, category: str = None, sampler: Sampler = None):
+    """
+    Adds a counter trace to the decorated function. Traces are added to the global profiler
 
+    With a `sampler` every call is counted but only sampled calls add a counter event
+    """
+    return global_profiler().counter(topic, category=category, sampler=sampler)
 
-def exit_counter(topic: str, category: str = None):
-    """ Adds an exit counter trace to the decorated function. Traces added added to the global profiler """
-    if not global_context().enabled:
-        return _passthrough
 
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            try:
-                return func(*args, **kwargs)
-            finally:
-                global_profiler()._add_counter_event(
-                    fixup_name(func), topic, category=category)
-        return wrapper
-    return decorator
+def exit_counter(topic: str, category: str = None, sampler: Sampler = None):
+    """
+    Adds an exit counter trace to the decorated function. Traces added added to the global profiler
 
+    With a `sampler` every call is counted but only sampled calls add a counter event
+    """
+    return global_profiler().exit_counter(topic, category=category, sampler=sampler)
 
-def profile(_func=None, *, category: str = None, args: dict = None, **event_kwargs):
-    """ Adds method call trace to the decorated function.Traces added added to the global profiler """
-    if not global_context().enabled:
-        if _func is None:
-            return _passthrough
-        return _passthrough(_func)
-
-    if event_kwargs:
-        args = args or dict()
-        args.update(event_kwargs)
 
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*call_args, **call_kwargs):
-            start_time = perf_time()
-
-            try:
-                return func(*call_args, **call_kwargs)
-            finally:
-                stop_time = perf_time()
-                global_profiler()._add_complete_event(
-                    fixup_name(func), start_time, stop_time, category, args)
-
-        return wrapper
-
-    if _func is None:
-        return decorator
+def profile(_func=None, *, category: str = None, args: dict = None, sampler: Sampler = None, **event_kwargs):
+    """
+    Adds method call trace to the decorated function.Traces added added to the global profiler
 
-    return decorator(_func)
+    With a `sampler`, or a global sampler given to `init_trace`, only sampled calls are recorded and
+    the sampling rates are saved in the trace `otherData` under `sampling`
+    """
+    return global_profiler().profile(
+        _func, category=category, event_args=args, sampler=sampler, **event_kwargs)
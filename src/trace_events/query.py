@@ -0,0 +1,213 @@
+from array import array
+import heapq
+from itertools import islice
+import typing as t
+
+from .events import AnyEvent, CompleteEvent
+from .index import IntervalIndex
+
+
+_KEY_FIELDS = ('name', 'category', 'thread_id')
+
+# A field and value events are indexed by, `None` for all events
+_Key = t.Tuple[str, t.Any] | None
+
+
+class TraceQuery:
+    """
+    Answers questions about a list of events without scanning all of them. Indexes are built on
+    first use: the events by name, category and thread, an `IntervalIndex` over their times for each
+    of those and for all events, and their order by duration
+
+    A query starts from the most selective index that applies and only checks the remaining filters
+    on the events it yields. Complete events cover `[start_time, start_time + duration]`, other events
+    only their timestamp. The events should not change while they are queried
+
+    .. code-block:: python
+        query = trace.query()
+        spans = query.select(name='foo', thread_id=1234, start=1000.0, end=2000.0)
+        slowest = query.slowest(10, category='function')
+    """
+
+    events: t.Sequence[AnyEvent]
+    count: int
+
+    _columns: t.Dict[str, t.List] | None
+    _starts: array
+    _ends: array
+    _durations: array
+    _key_rows: t.Dict[str, t.Dict[t.Any, array]]
+    _intervals: t.Dict[_Key, IntervalIndex]
+    _duration_orders: t.Dict[_Key, array]
+
+    def __init__(self, events: t.Sequence[AnyEvent]):
+        self.events = events
+        self.count = len(events)
+        self._columns = None
+        self._key_rows = dict()
+        self._intervals = dict()
+        self._duration_orders = dict()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _load(self):
+        """ Copies the indexed fields of every event into columns, once """
+        if self._columns is not None:
+            return
+
+        names = []
+        categories = []
+        thread_ids = []
+        self._starts = array('d')
+        self._ends = array('d')
+        # Negative for events without a duration, which are left out of the slowest events
+        self._durations = array('d')
+
+        for event in islice(self.events, self.count):
+            names.append(event.name)
+            categories.append(event.category)
+            thread_ids.append(event.thread_id)
+            if isinstance(event, CompleteEvent):
+                self._starts.append(event.start_time)
+                self._ends.append(event.start_time + event.duration)
+                self._durations.append(event.duration)
+            else:
+                self._starts.append(event.timestamp)
+                self._ends.append(event.timestamp)
+                self._durations.append(-1.0)
+
+        self._columns = dict(name=names, category=categories, thread_id=thread_ids)
+
+    def _field_index(self, field: str) -> t.Dict[t.Any, array]:
+        if field not in _KEY_FIELDS:
+            raise ValueError(f'Events are not indexed by \'{field}\', expected one of {_KEY_FIELDS}')
+
+        key_rows = self._key_rows.get(field)
+        if key_rows is None:
+            self._load()
+            key_rows = self._key_rows[field] = dict()
+            for row, value in enumerate(self._columns[field]):
+                rows = key_rows.get(value)
+                if rows is None:
+                    rows = key_rows[value] = array('q')
+                rows.append(row)
+        return key_rows
+
+    def rows_by(self, field: str, value: t.Any) -> t.Sequence[int]:
+        """ Returns the positions of the events whose `name`, `category` or `thread_id` equals `value` """
+        return self._field_index(field).get(value, ())
+
+    def values(self, field: str) -> t.List:
+        """ Returns the distinct values of `name`, `category` or `thread_id` """
+        return list(self._field_index(field))
+
+    def _interval_index(self, key: _Key) -> IntervalIndex:
+        """ Interval index over all events, or over those of one key with rows relative to `rows_by` """
+        index = self._intervals.get(key)
+        if index is None:
+            self._load()
+            if key is None:
+                index = IntervalIndex(self._starts, self._ends)
+            else:
+                rows = self.rows_by(*key)
+                index = IntervalIndex([self._starts[row] for row in rows], [self._ends[row] for row in rows])
+            self._intervals[key] = index
+        return index
+
+    def _duration_order(self, key: _Key) -> array:
+        """ Positions of the events with a duration, longest first """
+        order = self._duration_orders.get(key)
+        if order is None:
+            self._load()
+            durations = self._durations
+            rows = range(len(durations)) if key is None else self.rows_by(*key)
+            order = array('q', sorted(
+                (row for row in rows if durations[row] >= 0.0), key=durations.__getitem__, reverse=True))
+            self._duration_orders[key] = order
+        return order
+
+    def _plan(self, filters: t.Dict[str, t.Any]) -> t.Tuple[_Key, t.List[t.Tuple[str, t.Any]]]:
+        """ Picks the key matching the fewest events to start from, the other keys are checked per event """
+        keys = [(field, value) for field, value in filters.items() if value is not None]
+        if not keys:
+            return None, []
+        keys.sort(key=lambda key: len(self.rows_by(*key)))
+        return keys[0], keys[1:]
+
+    def _matches(self, row: int, checks: t.List[t.Tuple[str, t.Any]]) -> bool:
+        columns = self._columns
+        for field, value in checks:
+            if columns[field][row] != value:
+                return False
+        return True
+
+    def rows(
+            self, name: str | None = None, category: str | None = None, thread_id: int | None = None,
+            start: float | None = None, end: float | None = None) -> t.Iterator[int]:
+        """ Yields the positions of the events selected by `select`, in order of their start """
+        key, checks = self._plan(dict(name=name, category=category, thread_id=thread_id))
+        if key is not None and not self.rows_by(*key):
+            return
+
+        overlapping = self._interval_index(key).overlapping(start, end)
+        if key is not None:
+            key_rows = self.rows_by(*key)
+            overlapping = (key_rows[row] for row in overlapping)
+
+        for row in overlapping:
+            if not checks or self._matches(row, checks):
+                yield row
+
+    def select(
+            self, name: str | None = None, category: str | None = None, thread_id: int | None = None,
+            start: float | None = None, end: float | None = None) -> t.List[AnyEvent]:
+        """
+        Returns the events matching every given filter, in order of their start
+
+        :param name: Only events with this name
+        :param category: Only events of this category
+        :param thread_id: Only events of this thread
+        :param start: Only events overlapping from this time on
+        :param end: Only events overlapping up to this time
+        """
+        events = self.events
+        return [events[row] for row in self.rows(name, category, thread_id, start, end)]
+
+    def overlapping(self, start: float, end: float, **filters) -> t.List[AnyEvent]:
+        """ Returns the events overlapping `[start, end]`, see `select` for the other filters """
+        return self.select(start=start, end=end, **filters)
+
+    def slowest(
+            self, count: int, name: str | None = None, category: str | None = None,
+            thread_id: int | None = None, start: float | None = None,
+            end: float | None = None) -> t.List[CompleteEvent]:
+        """
+        Returns the `count` complete events with the longest durations, longest first, out of those
+        matching the filters of `select`
+        """
+        if count <= 0:
+            return []
+
+        self._load()
+        key, checks = self._plan(dict(name=name, category=category, thread_id=thread_id))
+        events = self.events
+
+        if start is not None or end is not None:
+            # A window usually selects far fewer events than a duration ordered scan would visit
+            durations = self._durations
+            rows = self.rows(name, category, thread_id, start, end)
+            slowest = heapq.nlargest(
+                count, (row for row in rows if durations[row] >= 0.0), key=durations.__getitem__)
+            return [events[row] for row in slowest]
+
+        slowest = []
+        for row in self._duration_order(key):
+            if not checks or self._matches(row, checks):
+                slowest.append(events[row])
+                if len(slowest) >= count:
+                    break
+        return slowest
+
+
+__all__ = [TraceQuery]
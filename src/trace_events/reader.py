@@ -0,0 +1,316 @@
+from array import array
+from json import dumps, loads
+import mmap
+from os import replace, stat
+import sys
+import typing as t
+
+from .events import AnyEvent
+from .files import is_compressed, is_perfetto_file
+from .index import IntervalIndex
+from .loader import load_event
+from .utils import gc_paused
+
+
+_INDEX_VERSION = 1
+_INDEX_EXTENSION = '.idx'
+# Header line of traces written by `TraceWriter`, the other lines not holding an event start with `]`
+_TRACE_HEADER = b'{"traceEvents": ['
+# Number of event lines parsed at a time while indexing
+_INDEX_BATCH_SIZE = 10_000
+
+# Columns of the index file after its header, in order. Interval columns are sorted by start time, the
+# others are in file order
+_COLUMNS = (
+    ('rows', 'q'),
+    ('starts', 'd'),
+    ('ends', 'd'),
+    ('max_ends', 'd'),
+    ('offsets', 'q'),
+    ('lengths', 'q'),
+    ('thread_ids', 'q'),
+    ('name_ids', 'q'),
+)
+
+
+def index_file_path(file_path: str) -> str:
+    """ Path of the index built for a trace file, next to the trace """
+    return f'{file_path}{_INDEX_EXTENSION}'
+
+
+def _event_span(line: bytes) -> t.Tuple[int, int] | None:
+    """ Returns where the json object of an event line starts and ends, `None` for the other lines """
+    # The lines written by `TraceWriter`
+    if line.endswith(b'}\n'):
+        if line.startswith(b',{'):
+            return 1, len(line) - 1
+        if line.startswith(b'{"name"'):
+            return 0, len(line) - 1
+
+    stripped = line.strip()
+    if stripped.startswith(b','):
+        stripped = stripped[1:].lstrip()
+    if stripped.endswith(b','):
+        stripped = stripped[:-1].rstrip()
+    if not stripped.startswith(b'{') or stripped.startswith(_TRACE_HEADER):
+        return None
+
+    start = line.find(stripped)
+    return start, start + len(stripped)
+
+
+class IndexedTraceReader:
+    """
+    Reads events out of a large trace file without loading all of it. The file is memory mapped and
+    indexed by time, thread and name, and only the events selected by a query are parsed
+
+    The trace must hold one event per line: traces written by `TraceWriter`, or json lines. The index is
+    built on first use and saved next to the trace, it is rebuilt when the trace changes
+
+    .. code-block:: python
+        with IndexedTraceReader('trace.json') as reader:
+            for event in reader.events(start=1000.0, end=2000.0, thread_id=1234):
+                ...
+    """
+
+    file_path: str
+    names: t.List[str]
+
+    _file: t.BinaryIO
+    _map: mmap.mmap | None
+    _index_file: t.BinaryIO | None
+    _index_map: mmap.mmap | None
+    _views: t.List[memoryview]
+    _name_ids_by_name: t.Dict[str, int]
+    _intervals: IntervalIndex
+    _offsets: t.Sequence[int]
+    _lengths: t.Sequence[int]
+    _thread_ids: t.Sequence[int]
+    _name_ids: t.Sequence[int]
+
+    def __init__(self, file_path: str, index_path: str | None = None, save_index: bool = True):
+        """
+        :param file_path: Trace file with one event per line
+        :param index_path: Index file, defaults to the trace path with an `.idx` suffix
+        :param save_index: Saves a newly built index for later readers
+        """
+        if is_compressed(file_path) or is_perfetto_file(file_path):
+            raise ValueError(f'Only uncompressed json trace files can be memory mapped: \'{file_path}\'')
+
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        self._map = None
+        self._index_file = None
+        self._index_map = None
+        self._views = []
+
+        try:
+            size = stat(file_path).st_size
+            if size:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            index_path = index_path or index_file_path(file_path)
+            if not self._open_index(index_path):
+                with gc_paused():
+                    self._build_index()
+                if save_index:
+                    self._save_index(index_path)
+        except BaseException:
+            self.close()
+            raise
+
+    def _source_stamp(self) -> dict:
+        status = stat(self._file.fileno())
+        return dict(size=status.st_size, mtime_ns=status.st_mtime_ns)
+
+    def _build_index(self):
+        """ Scans every line of the trace once, parsing the events to index their fields """
+        self.names = []
+        self._name_ids_by_name = dict()
+        offsets = array('q')
+        lengths = array('q')
+        starts = array('d')
+        ends = array('d')
+        thread_ids = array('q')
+        name_ids = array('q')
+
+        def add_events(lines: t.List[bytes]):
+            # Parsed as one json array, as the per call overhead of loads is more than the parsing
+            try:
+                events = loads(b'[' + b','.join(lines) + b']')
+            except ValueError:
+                raise ValueError(
+                    f'Unable to index \'{self.file_path}\', traces should hold one event per line') from None
+
+            for event in events:
+                start = event.get('ts', 0.0)
+                starts.append(start)
+                ends.append(start + event.get('dur', 0.0))
+                thread_ids.append(event.get('tis', event.get('tid', 0)))
+                name_ids.append(self._name_id(event.get('name', '')))
+
+        if self._map is not None:
+            lines = []
+            position = 0
+            for line in iter(self._map.readline, b''):
+                span = _event_span(line)
+                if span is not None:
+                    start, end = span
+                    offsets.append(position + start)
+                    lengths.append(end - start)
+                    lines.append(line[start:end])
+                    if len(lines) >= _INDEX_BATCH_SIZE:
+                        add_events(lines)
+                        lines = []
+                position += len(line)
+
+            if lines:
+                add_events(lines)
+
+        self._intervals = IntervalIndex(starts, ends)
+        self._offsets = offsets
+        self._lengths = lengths
+        self._thread_ids = thread_ids
+        self._name_ids = name_ids
+
+    def _name_id(self, name: str) -> int:
+        name_id = self._name_ids_by_name.get(name)
+        if name_id is None:
+            name_id = self._name_ids_by_name[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def _save_index(self, index_path: str):
+        """ Writes the index to a temporary file then moves it into place, so readers never see half of it """
+        columns = dict(
+            rows=self._intervals.rows, starts=self._intervals.starts, ends=self._intervals.ends,
+            max_ends=self._intervals.max_ends, offsets=self._offsets, lengths=self._lengths,
+            thread_ids=self._thread_ids, name_ids=self._name_ids)
+
+        header = dumps(dict(
+            version=_INDEX_VERSION, byteorder=sys.byteorder, count=len(self._offsets),
+            names=self.names,
+            **self._source_stamp())).encode()
+        # Padded so the columns are aligned for memory mapping
+        header += b' ' * (-(len(header) + 1) % 8) + b'\n'
+
+        temporary_path = f'{index_path}.tmp'
+        try:
+            with open(temporary_path, 'wb') as file:
+                file.write(header)
+                for name, _ in _COLUMNS:
+                    columns[name].tofile(file)
+            replace(temporary_path, index_path)
+        except OSError:
+            # e.g. a read only directory, the index is then only kept in memory
+            pass
+
+    def _open_index(self, index_path: str) -> bool:
+        """ Maps a saved index, returning `False` when it is missing or out of date """
+        try:
+            index_file = open(index_path, 'rb')
+        except OSError:
+            return False
+
+        try:
+            header = loads(index_file.readline())
+        except ValueError:
+            header = dict()
+        if header.get('version') != _INDEX_VERSION or header.get('byteorder') != sys.byteorder \
+                or dict(size=header.get('size'), mtime_ns=header.get('mtime_ns')) != self._source_stamp():
+            index_file.close()
+            return False
+
+        count = header['count']
+        position = index_file.tell()
+        index_map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) if count else None
+        columns = dict()
+        for name, typecode in _COLUMNS:
+            end = position + count * array(typecode).itemsize
+            if count:
+                columns[name] = memoryview(index_map)[position:end].cast(typecode)
+                self._views.append(columns[name])
+            else:
+                columns[name] = array(typecode)
+            position = end
+
+        self._index_file = index_file
+        self._index_map = index_map
+        self.names = header['names']
+        self._name_ids_by_name = {name: name_id for name_id, name in enumerate(self.names)}
+        self._intervals = IntervalIndex.from_columns(
+            columns['rows'], columns['starts'], columns['ends'], columns['max_ends'])
+        self._offsets = columns['offsets']
+        self._lengths = columns['lengths']
+        self._thread_ids = columns['thread_ids']
+        self._name_ids = columns['name_ids']
+        return True
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    @property
+    def thread_ids(self) -> t.Set[int]:
+        """ Ids of the threads with events in the trace """
+        return set(self._thread_ids)
+
+    def rows(
+            self, start: float | None = None, end: float | None = None, thread_id: int | None = None,
+            name: str | None = None) -> t.Iterator[int]:
+        """ Yields the line order of the selected events by start time, see `events` """
+        name_id = None
+        if name is not None:
+            name_id = self._name_ids_by_name.get(name)
+            if name_id is None:
+                return
+
+        thread_ids = self._thread_ids
+        name_ids = self._name_ids
+        for row in self._intervals.overlapping(start, end):
+            if thread_id is not None and thread_ids[row] != thread_id:
+                continue
+            if name_id is not None and name_ids[row] != name_id:
+                continue
+            yield row
+
+    def event_data(self, row: int) -> dict:
+        """ Parses the json dictionary of one event """
+        offset = self._offsets[row]
+        return loads(self._map[offset:offset + self._lengths[row]])
+
+    def events(
+            self, start: float | None = None, end: float | None = None, thread_id: int | None = None,
+            name: str | None = None, raw: bool = False) -> t.Iterator[AnyEvent | dict]:
+        """
+        Yields the events overlapping `[start, end]` in microseconds, in order of their start time.
+        Complete events cover their duration, other events only their timestamp
+
+        :param start: Start of the time range, by default from the first event
+        :param end: End of the time range, by default to the last event
+        :param thread_id: Only events of this thread
+        :param name: Only events with this name
+        :param raw: Yields json dictionaries rather than event objects
+        """
+        for row in self.rows(start, end, thread_id, name):
+            data = self.event_data(row)
+            yield data if raw else load_event(data)
+
+    def close(self):
+        # Views of the mapped index have to be released before the map can be closed
+        for view in self._views:
+            view.release()
+        self._views = []
+
+        for resource in (self._index_map, self._index_file, self._map, self._file):
+            if resource is not None:
+                resource.close()
+        self._index_map = self._index_file = self._map = None
+
+    def __enter__(self) -> 'IndexedTraceReader':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+__all__ = [IndexedTraceReader, index_file_path]
@@ -0,0 +1,142 @@
+from abc import ABC, abstractmethod
+from random import random
+from time import monotonic
+
+
+class Sampler(ABC):
+    """
+    Decides which calls of a decorated function are recorded. Each decorated function gets its own
+    `clone()` of the configured sampler
+
+    Counters are updated without a lock, so under heavy contention rates are approximate
+    """
+
+    @abstractmethod
+    def sample(self) -> bool:
+        """ Returns `True` when the current call should be recorded """
+
+    @abstractmethod
+    def clone(self) -> 'Sampler':
+        """ Returns a new sampler with the same configuration and no state """
+
+    @abstractmethod
+    def to_json(self) -> dict:
+        """ Convert to json, `rate` is the fraction of calls recorded """
+
+
+class ProbabilitySampler(Sampler):
+    """ Records each call with a fixed probability """
+
+    _probability: float
+
+    def __init__(self, probability: float):
+        assert 0.0 < probability <= 1.0, f'probability should be in (0, 1], but is {probability}'
+        self._probability = probability
+
+    def sample(self) -> bool:
+        return random() < self._probability
+
+    def clone(self) -> 'ProbabilitySampler':
+        return ProbabilitySampler(self._probability)
+
+    def to_json(self) -> dict:
+        return dict(mode='probability', rate=self._probability)
+
+
+class CountSampler(Sampler):
+    """ Records one in every `interval` calls """
+
+    _interval: int
+    _count: int
+
+    def __init__(self, interval: int):
+        assert interval >= 1, f'interval should be at least 1, but is {interval}'
+        self._interval = interval
+        self._count = 0
+
+    def sample(self) -> bool:
+        self._count += 1
+        if self._count < self._interval:
+            return False
+        self._count = 0
+        return True
+
+    def clone(self) -> 'CountSampler':
+        return CountSampler(self._interval)
+
+    def to_json(self) -> dict:
+        return dict(mode='count', interval=self._interval, rate=1.0 / self._interval)
+
+
+class AdaptiveSampler(Sampler):
+    """
+    Adjusts the recording probability to keep recorded events under `max_rate` per second. The call
+    rate is only measured every `check_interval` calls, so most calls never read the clock
+    """
+
+    _max_rate: float
+    _check_interval: int
+    _min_period: float
+    _probability: float
+    _calls: int
+    _samples: int
+    _window_calls: int
+    _window_start: float
+    _next_check: int
+
+    def __init__(self, max_rate: float, check_interval: int = 64, min_period: float = 0.1):
+        """
+        :param max_rate: Maximum number of recorded events per second
+        :param check_interval: Number of calls between measurements of the call rate
+        :param min_period: Minimum number of seconds between adjustments of the probability
+        """
+        assert max_rate > 0, f'max_rate should be positive, but is {max_rate}'
+        self._max_rate = max_rate
+        self._check_interval = check_interval
+        self._min_period = min_period
+        self._probability = 1.0
+        self._calls = 0
+        self._samples = 0
+        self._window_calls = 0
+        self._window_start = monotonic()
+        self._next_check = check_interval
+
+    def _adjust(self):
+        now = monotonic()
+        elapsed = now - self._window_start
+        if elapsed < self._min_period:
+            # The window stays open, the clock is read again `check_interval` calls later
+            self._next_check = self._window_calls + self._check_interval
+            return
+
+        self._probability = min(1.0, self._max_rate * elapsed / self._window_calls)
+        self._calls += self._window_calls
+        self._window_calls = 0
+        self._window_start = now
+        self._next_check = self._check_interval
+
+    def sample(self) -> bool:
+        self._window_calls += 1
+        if self._window_calls >= self._next_check:
+            self._adjust()
+
+        if self._probability < 1.0 and random() >= self._probability:
+            return False
+
+        self._samples += 1
+        return True
+
+    def clone(self) -> 'AdaptiveSampler':
+        return AdaptiveSampler(self._max_rate, self._check_interval, self._min_period)
+
+    def to_json(self) -> dict:
+        calls = self._calls + self._window_calls
+        return dict(
+            mode='adaptive',
+            max_rate=self._max_rate,
+            calls=calls,
+            samples=self._samples,
+            rate=self._samples / calls if calls else 1.0)
+
+
+__all__ = [AdaptiveSampler, CountSampler, ProbabilitySampler, Sampler]
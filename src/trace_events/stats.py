@@ -0,0 +1,147 @@
+from math import ceil, erfc, log, sqrt
+import typing as t
+
+
+class LatencyHistogram:
+    """
+    Streaming histogram of durations using logarithmically sized buckets. Quantiles are estimated to
+    within `relative_error` of the true value, and the number of buckets only grows with the log of
+    the range of values seen, so memory is constant in the number of values added
+    """
+
+    __slots__ = ('count', 'total', 'minimum', 'maximum', '_gamma', '_log_gamma', '_zeros', '_buckets')
+
+    quantiles = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p999', 0.999))
+
+    count: int
+    total: float
+    minimum: float | None
+    maximum: float | None
+    _gamma: float
+    _log_gamma: float
+    _zeros: int
+    _buckets: t.Dict[int, int]
+
+    def __init__(self, relative_error: float = 0.01):
+        assert 0.0 < relative_error < 1.0, \
+            f'relative_error should be in (0, 1), but is {relative_error}'
+
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self._gamma = (1.0 + relative_error) / (1.0 - relative_error)
+        self._log_gamma = log(self._gamma)
+        self._zeros = 0
+        self._buckets = dict()
+
+    def add(self, value: float):
+        """ Adds a single duration """
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        self.count += 1
+        self.total += value
+
+        if value <= 0.0:
+            self._zeros += 1
+            return
+
+        index = ceil(log(value) / self._log_gamma)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def merge(self, other: 'LatencyHistogram'):
+        """ Adds the values of another histogram with the same relative error """
+        assert self._gamma == other._gamma, 'Histograms with different errors cannot be merged'
+
+        if not other.count:
+            return
+
+        self.count += other.count
+        self.total += other.total
+        if self.minimum is None or other.minimum < self.minimum:
+            self.minimum = other.minimum
+        if self.maximum is None or other.maximum > self.maximum:
+            self.maximum = other.maximum
+
+        self._zeros += other._zeros
+        for index, count in other._buckets.copy().items():
+            self._buckets[index] = self._buckets.get(index, 0) + count
+
+    def quantile(self, q: float) -> float | None:
+        """ Estimates the value at quantile `q`, where `0 <= q <= 1` """
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = self._zeros
+        if rank < seen:
+            return 0.0
+
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if rank < seen:
+                value = 2.0 * self._gamma ** index / (self._gamma + 1.0)
+                return min(max(value, self.minimum), self.maximum)
+
+        return self.maximum
+
+    def bucket_counts(self) -> t.Dict[float, int]:
+        """ Number of values in each bucket by the index of the bucket, zeros at `-inf` """
+        counts = dict(self._buckets)
+        if self._zeros:
+            counts[float('-inf')] = self._zeros
+        return counts
+
+    def to_json(self) -> dict:
+        """ Convert to json """
+        data = dict(count=self.count, sum=self.total, min=self.minimum, max=self.maximum)
+        for name, q in self.quantiles:
+            data[name] = self.quantile(q)
+        return data
+
+
+def mann_whitney(baseline: LatencyHistogram, candidate: LatencyHistogram) -> float:
+    """
+    One sided p-value of the Mann-Whitney U test that the values of `candidate` tend to be larger
+    than those of `baseline`. The test only compares ranks, so it holds for the skewed distributions
+    of latencies, and values in the same bucket count as ties. Uses the normal approximation with a
+    tie correction, which needs more than a handful of values on each side
+
+    :param baseline: Histogram of the reference values
+    :param candidate: Histogram of the values tested for being larger, with the same relative error
+    """
+    assert baseline._gamma == candidate._gamma, 'Histograms with different errors cannot be compared'
+
+    count_a = baseline.count
+    count_b = candidate.count
+    if not count_a or not count_b:
+        return 1.0
+
+    counts_a = baseline.bucket_counts()
+    counts_b = candidate.bucket_counts()
+    below = 0
+    u_statistic = 0.0
+    ties = 0
+    for index in sorted(counts_a.keys() | counts_b.keys()):
+        bucket_a = counts_a.get(index, 0)
+        bucket_b = counts_b.get(index, 0)
+        u_statistic += bucket_b * (below + bucket_a / 2)
+        tied = bucket_a + bucket_b
+        ties += tied ** 3 - tied
+        below += bucket_a
+
+    total = count_a + count_b
+    mean = count_a * count_b / 2
+    variance = count_a * count_b / 12 * (total + 1 - ties / (total * (total - 1)))
+    if variance <= 0.0:
+        # Every value in the same bucket
+        return 1.0
+
+    # Continuity correction towards the mean
+    z = (u_statistic - mean - 0.5) / sqrt(variance)
+    return 0.5 * erfc(z / sqrt(2.0))
+
+
+__all__ = [LatencyHistogram, mann_whitney]
@@ -0,0 +1,280 @@
+from array import array
+from collections import deque
+from threading import Lock
+import typing as t
+
+from .events import AnyEvent, CompleteEvent, CounterEvent
+
+
+class StringTable:
+    """ Interns strings to integer ids. Lookups are lock free, only new strings take the lock """
+
+    _ids: t.Dict[str, int]
+    _strings: t.List[str]
+    _lock: Lock
+
+    def __init__(self):
+        self._ids = dict()
+        self._strings = []
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def __getitem__(self, string_id: int) -> str:
+        return self._strings[string_id]
+
+    def intern(self, value: str) -> int:
+        """ Return the id of the given string, adding it to the table when missing """
+        try:
+            return self._ids[value]
+        except KeyError:
+            with self._lock:
+                string_id = self._ids.get(value)
+                if string_id is None:
+                    string_id = len(self._strings)
+                    self._strings.append(value)
+                    self._ids[value] = string_id
+                return string_id
+
+
+class EventList(list):
+    """ Stores events as individual event objects """
+
+    def add_complete_event(
+            self, name: str, start_time: float, duration: float, category: str, args: dict,
+            process_id: int, thread_id: int):
+        self.append(CompleteEvent(
+            name, start_time, duration, category, args, process_id=process_id, thread_id=thread_id))
+
+    def add_counter_event(
+            self, name: str, timestamp: float, category: str, args: dict, process_id: int,
+            thread_id: int):
+        self.append(CounterEvent(
+            name, timestamp, category=category, process_id=process_id, thread_id=thread_id,
+            args=args))
+
+    def snapshot(self) -> t.List[AnyEvent]:
+        """ Return a copy of the stored events, safe to call while another thread appends """
+        return self[:]
+
+
+class EventRing(deque):
+    """
+    Stores only the most recent events, bounded by a maximum number of events and/or a maximum age.
+    Events are appended when they finish, so the oldest event is always at the left
+    """
+
+    _max_age: float | None
+
+    def __init__(self, max_events: int | None = None, max_age: float | None = None):
+        """
+        :param max_events: Maximum number of events retained
+        :param max_age: Maximum age of retained events, in the same units as event timestamps
+        """
+        super().__init__(maxlen=max_events)
+        self._max_age = max_age
+
+    def expire(self, now: float):
+        """ Drops the events which ended more than the maximum age before `now` """
+        if self._max_age is None:
+            return
+        horizon = now - self._max_age
+        while self and _end_time(self[0]) < horizon:
+            self.popleft()
+
+    def add_complete_event(
+            self, name: str, start_time: float, duration: float, category: str, args: dict,
+            process_id: int, thread_id: int):
+        self.append(CompleteEvent(
+            name, start_time, duration, category, args, process_id=process_id, thread_id=thread_id))
+        self.expire(start_time + duration)
+
+    def add_counter_event(
+            self, name: str, timestamp: float, category: str, args: dict, process_id: int,
+            thread_id: int):
+        self.append(CounterEvent(
+            name, timestamp, category=category, process_id=process_id, thread_id=thread_id,
+            args=args))
+        self.expire(timestamp)
+
+    def snapshot(self) -> t.List[AnyEvent]:
+        """ Return a copy of the stored events, safe to call while another thread appends """
+        while True:
+            try:
+                return list(self)
+            except RuntimeError:
+                # The owning thread appended mid-copy; try again
+                continue
+
+
+def _end_time(event: AnyEvent) -> float:
+    if isinstance(event, CompleteEvent):
+        return event.start_time + event.duration
+    return event.timestamp
+
+
+_COMPLETE = 0
+_COUNTER = 1
+# Counter whose only series is named after the event, the value is kept in the duration column
+_COUNTER_VALUE = 2
+
+
+class ColumnarEvents:
+    """
+    Stores events in typed array columns rather than one object per event, event objects are only
+    materialized when indexed or iterated. Names and categories are stored as ids in a `StringTable`
+    which can be shared between stores so they can be concatenated without remapping
+
+    Appends from a single thread may be read concurrently from other threads: the event type column
+    is appended last and acts as the count of complete rows
+
+    Single topic counters, as recorded by the profiler, store their value in a column rather than
+    keeping an args dictionary per event
+    """
+
+    strings: StringTable
+    _start_times: array
+    _durations: array
+    _name_ids: array
+    _category_ids: array
+    _process_ids: array
+    _thread_ids: array
+    _event_types: array
+    _args: t.Dict[int, dict]
+
+    def __init__(self, strings: StringTable | None = None, events: t.Iterable[AnyEvent] | None = None):
+        self.strings = strings if strings is not None else StringTable()
+        self._start_times = array('d')
+        self._durations = array('d')
+        self._name_ids = array('L')
+        self._category_ids = array('L')
+        self._process_ids = array('q')
+        self._thread_ids = array('q')
+        self._event_types = array('B')
+        self._args = dict()
+
+        if events is not None:
+            self.extend(events)
+
+    def _add(
+            self, event_type: int, name: str, timestamp: float, duration: float, category: str,
+            args: dict | None, process_id: int, thread_id: int):
+        row = len(self._event_types)
+        self._start_times.append(timestamp)
+        self._durations.append(duration)
+        self._name_ids.append(self.strings.intern(name))
+        self._category_ids.append(self.strings.intern(category))
+        self._process_ids.append(process_id)
+        self._thread_ids.append(thread_id)
+        if args is not None:
+            self._args[row] = args
+        self._event_types.append(event_type)
+
+    def add_complete_event(
+            self, name: str, start_time: float, duration: float, category: str, args: dict,
+            process_id: int, thread_id: int):
+        self._add(
+            _COMPLETE, name, start_time, duration,
+            category or CompleteEvent.category_field.default, args, process_id, thread_id)
+
+    def add_counter_event(
+            self, name: str, timestamp: float, category: str, args: dict, process_id: int,
+            thread_id: int):
+        category = category or CounterEvent.category_field.default
+        if args is not None and len(args) == 1 and name in args:
+            self._add(
+                _COUNTER_VALUE, name, timestamp, args[name], category, None, process_id, thread_id)
+        else:
+            self._add(_COUNTER, name, timestamp, 0.0, category, args, process_id, thread_id)
+
+    def append(self, event: AnyEvent):
+        if isinstance(event, CompleteEvent):
+            self._add(
+                _COMPLETE, event.name, event.start_time, event.duration, event.category, event.args,
+                event.process_id, event.thread_id)
+        elif isinstance(event, CounterEvent):
+            self.add_counter_event(
+                event.name, event.timestamp, event.category, event.args, event.process_id,
+                event.thread_id)
+        else:
+            raise TypeError(f'Unable to store event of type {type(event).__name__}')
+
+    def extend(self, events: t.Iterable[AnyEvent]):
+        if isinstance(events, ColumnarEvents) and events.strings is self.strings:
+            self._extend_columns(events)
+            return
+
+        for event in events:
+            self.append(event)
+
+    def snapshot(self) -> 'ColumnarEvents':
+        """ Return a copy of the complete rows, safe to call while another thread appends """
+        events = ColumnarEvents(self.strings)
+        events._extend_columns(self)
+        return events
+
+    def _extend_columns(self, other: 'ColumnarEvents'):
+        """ Concatenates the complete rows of another store sharing the same string table """
+        count = len(other._event_types)
+        offset = len(self._event_types)
+
+        self._start_times.extend(other._start_times[:count])
+        self._durations.extend(other._durations[:count])
+        self._name_ids.extend(other._name_ids[:count])
+        self._category_ids.extend(other._category_ids[:count])
+        self._process_ids.extend(other._process_ids[:count])
+        self._thread_ids.extend(other._thread_ids[:count])
+        for row, args in other._args.copy().items():
+            if row < count:
+                self._args[offset + row] = args
+        self._event_types.extend(other._event_types[:count])
+
+    def __len__(self) -> int:
+        return len(self._event_types)
+
+    def _event(self, row: int) -> AnyEvent:
+        strings = self.strings
+        name = strings[self._name_ids[row]]
+        category = strings[self._category_ids[row]]
+        args = self._args.get(row)
+        event_type = self._event_types[row]
+
+        if event_type == _COMPLETE:
+            return CompleteEvent(
+                name, self._start_times[row], self._durations[row], category, args,
+                process_id=self._process_ids[row], thread_id=self._thread_ids[row])
+
+        if event_type == _COUNTER_VALUE:
+            value = self._durations[row]
+            args = {name: int(value) if value.is_integer() else value}
+
+        return CounterEvent(
+            name, self._start_times[row], category=category, process_id=self._process_ids[row],
+            thread_id=self._thread_ids[row], args=args)
+
+    def __getitem__(self, index: int | slice) -> AnyEvent | t.List[AnyEvent]:
+        if isinstance(index, slice):
+            return [self._event(row) for row in range(*index.indices(len(self)))]
+
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError('event index out of range')
+
+        return self._event(index)
+
+    def __iter__(self) -> t.Iterator[AnyEvent]:
+        for row in range(len(self)):
+            yield self._event(row)
+
+    def to_json(self) -> list:
+        """ Convert to json """
+        return list(self)
+
+
+AnyEventStore = t.Union[EventList, EventRing, ColumnarEvents]
+
+
+__all__ = [AnyEventStore, ColumnarEvents, EventList, EventRing, StringTable]
@@ -0,0 +1,152 @@
+from json import JSONDecodeError, JSONDecoder
+import typing as t
+
+
+_WHITESPACE = ' \t\n\r'
+
+
+class TraceEventReader:
+    """
+    Parses a json trace file incrementally, yielding the events of `traceEvents` one at a time as
+    plain dictionaries. Only one chunk of the file and the event being parsed are held in memory, so
+    traces larger than memory can be read. Both the object format and the bare array format of the
+    Trace Event Format are supported
+
+    The other top level values, e.g. `otherData`, are available from `data` once iteration is done
+
+    .. code-block:: python
+        with open('trace.json') as file:
+            reader = TraceEventReader(file)
+            for event in reader:
+                ...
+            reader.data['otherData']
+    """
+
+    data: dict
+
+    _file: t.TextIO
+    _chunk_size: int
+    _decoder: JSONDecoder
+    _buffer: str
+    _position: int
+    _end_of_file: bool
+
+    def __init__(self, file: t.TextIO, chunk_size: int = 1 << 16, decoder: JSONDecoder | None = None):
+        """
+        :param file: Text file positioned at the start of the trace
+        :param chunk_size: Number of characters read from the file at a time
+        :param decoder: Decoder for the events, defaults to decoding plain dictionaries
+        """
+        self.data = dict()
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = decoder or JSONDecoder()
+        self._buffer = ''
+        self._position = 0
+        self._end_of_file = False
+
+    def _read(self) -> bool:
+        """ Appends the next chunk to the buffer, dropping what was already parsed """
+        if self._end_of_file:
+            return False
+
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._end_of_file = True
+            return False
+
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+        return True
+
+    def _peek(self) -> str:
+        """ Returns the next non-whitespace character, without consuming it """
+        while True:
+            buffer = self._buffer
+            position = self._position
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            self._position = position
+
+            if position < len(buffer):
+                return buffer[position]
+            if not self._read():
+                raise JSONDecodeError('Unexpected end of trace', self._buffer, self._position)
+
+    def _expect(self, character: str):
+        found = self._peek()
+        if found != character:
+            raise JSONDecodeError(
+                f'Expected \'{character}\' but found \'{found}\'', self._buffer, self._position)
+        self._position += 1
+
+    def _value(self, decoder: JSONDecoder):
+        """ Decodes the next value, reading more of the file until it is complete """
+        self._peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self._buffer, self._position)
+            except JSONDecodeError:
+                if self._read():
+                    continue
+                raise
+
+            # A number may continue in the next chunk
+            if end == len(self._buffer) and self._read():
+                continue
+
+            self._position = end
+            return value
+
+    def _events(self) -> t.Iterator[dict]:
+        self._expect('[')
+        if self._peek() == ']':
+            self._position += 1
+            return
+
+        while True:
+            yield self._value(self._decoder)
+
+            separator = self._peek()
+            self._position += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise JSONDecodeError(
+                    f'Expected \',\' or \']\' but found \'{separator}\'', self._buffer, self._position - 1)
+
+    def __iter__(self) -> t.Iterator[dict]:
+        plain = JSONDecoder()
+
+        if self._peek() == '[':
+            yield from self._events()
+            return
+
+        self._expect('{')
+        if self._peek() == '}':
+            return
+
+        while True:
+            key = self._value(plain)
+            self._expect(':')
+
+            if key == 'traceEvents':
+                yield from self._events()
+            else:
+                self.data[key] = self._value(plain)
+
+            separator = self._peek()
+            self._position += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise JSONDecodeError(
+                    f'Expected \',\' or \'}}\' but found \'{separator}\'', self._buffer, self._position - 1)
+
+
+def iter_trace_events(file: t.TextIO, chunk_size: int = 1 << 16) -> t.Iterator[dict]:
+    """ Yields the events of a json trace file one at a time, see `TraceEventReader` """
+    return iter(TraceEventReader(file, chunk_size))
+
+
+__all__ = [TraceEventReader, iter_trace_events]
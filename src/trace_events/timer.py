@@ -1,6 +1,6 @@
-from .context import global_context
+from .context import trace_switch as _switch
 from .profiler import Profiler, global_profiler
-from .utils import fixup_name, perf_time
+from .utils import fixup_name
 
 
 class EventTimer:
@@ -14,13 +14,13 @@ class EventTimer:
 
     _name: str
     _category: str
-    _start_time: float
+    _start_time: int | None
     _args: dict
     _profiler: Profiler
 
     def __init__(self, name, profiler: Profiler = None, category: str = None, args: dict = None, **kwargs):
         self._name = fixup_name(name)
-        self._category = None
+        self._category = category
         self._start_time = None
 
         self._args = dict() if not args and kwargs else args
@@ -33,13 +33,13 @@ class EventTimer:
             raise RuntimeWarning('Profiler is none')
 
     def __enter__(self):
-        self._start_time = perf_time()
+        self._start_time = self._profiler.clock() if _switch.enabled else None
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        stop_time = perf_time()
+        stop_time = self._profiler.clock()
 
-        if exc_type is not None:
+        if exc_type is not None or self._start_time is None:
             return False
 
         if self._profiler is not None:
@@ -55,14 +55,12 @@ class EventTimer:
 
 def timeit(name, profiler: Profiler | None = None, category: str | None = None, args: dict | None = None, **kwargs):
     """
-    Times a block of code. Used within a method to add events around arbitary code
+    Times a block of code. Used within a method to add events around arbitary code. Nothing is
+    recorded for blocks entered while tracing is disabled
 
     .. code-block:: python
         with trace_events.timeit('my-block', category='suspected-slow'):
             do_my_thing()
     """
 
-    if not global_context().enabled:
-        return None
-
     return EventTimer(name, profiler=profiler, category=category, args=args, **kwargs)
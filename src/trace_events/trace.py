@@ -1,7 +1,9 @@
 import typing as t
 
 from .events import AnyEvent
-from .field import Field, get_fields
+from .field import Field, field_extractor, schema_property
+from .query import TraceQuery
+from .storage import ColumnarEvents
 
 
 class TraceMetaData(type):
@@ -9,36 +11,51 @@ class TraceMetaData(type):
     Trace metadata
     """
 
-    @property
+    @schema_property
     def events_field(cls) -> Field:
         return Field(list, 'traceEvents', False, [])
 
-    @property
+    @schema_property
     def other_data_field(cls) -> Field:
         return Field(dict, 'otherData', False, {})
 
-    @property
+    @schema_property
     def fields(cls):
         return (cls.events_field, cls.other_data_field)
 
 
 class Trace(object, metaclass=TraceMetaData):
-    events: t.List[AnyEvent]
+    """
+    Trace events and other data. Events are held in a list by default, or in a `ColumnarEvents` store
+    when a compact representation is needed
+    """
+
+    events: t.List[AnyEvent] | ColumnarEvents
     data: dict
 
-    def __init__(self, events: list = None, data: dict = None):
-        self.events = events or []
+    _query: TraceQuery | None
+
+    def __init__(self, events: list | ColumnarEvents = None, data: dict = None):
+        self.events = events if events is not None else []
         self.data = data or {}
+        self._query = None
 
     @classmethod
     def from_dict(cls, data: dict):
         """ Load from  dictionary """
-        events, data = get_fields(Trace, data)
+        events, data = field_extractor(Trace)(data)
         return Trace(events=events, data=data)
 
     def add(self, event: AnyEvent):
         self.events.append(event)
 
+    def query(self) -> TraceQuery:
+        """ Returns the indexed queries over the events, rebuilt when events were added or replaced """
+        query = self._query
+        if query is None or query.events is not self.events or query.count != len(self.events):
+            query = self._query = TraceQuery(self.events)
+        return query
+
     def add_data(self, data: dict):
         self.data.update(data)
 
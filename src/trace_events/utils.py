@@ -1,3 +1,5 @@
+from contextlib import contextmanager
+import gc
 from os import environ
 import time
 import typing as t
@@ -46,6 +48,31 @@ def fixup_name(name) -> str:
     return str(name)
 
 
+def qualified_name(func) -> str:
+    """ Module qualified name of a function or class, other objects fall back on `fixup_name` """
+    qualname = getattr(func, '__qualname__', None)
+    if not isinstance(qualname, str):
+        return fixup_name(func)
+
+    module = getattr(func, '__module__', None)
+    return f'{module}.{qualname}' if module else qualname
+
+
 def perf_time():
     """ returns the perf_counter in microseconds """
     return time.perf_counter_ns() * 1e-3
+
+
+@contextmanager
+def gc_paused():
+    """
+    Disables the cyclic garbage collector while loading. Only new containers are created, none of
+    which can be freed, yet every allocation threshold would trigger a collection walking all of them
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
@@ -0,0 +1,154 @@
+from functools import partial
+from glob import glob
+from multiprocessing.util import Finalize
+from os import getpid, kill, makedirs, path
+from shutil import rmtree
+import signal
+from tempfile import mkdtemp
+from threading import Thread
+import typing as t
+
+from .context import global_context, init_context
+from .files import is_perfetto_file, split_trace_extension
+from .merge import merge_traces
+from .profiler import configure_global_profiler, global_profiler
+
+
+# Base name of the worker shard files, the process id is added to it
+_SHARD_FILE_NAME = 'worker.json'
+
+
+def _context_options(directory: str) -> dict:
+    """ Options of the global context for a worker, which writes its trace into `directory` """
+    context = global_context()
+    return dict(
+        enabled=context.enabled,
+        trace_file_dir=directory,
+        global_trace_file_name=_SHARD_FILE_NAME,
+        overwrite_trace_files=True,
+        columnar_storage=context.columnar_storage,
+        max_events=context.max_events,
+        max_age=context.max_age,
+        min_duration=context.min_duration,
+        statistics=context.statistics,
+        stream=context.stream,
+        compact=context.compact,
+        timestamp_precision=context.timestamp_precision,
+        clock=context.clock,
+        sampler=context.sampler,
+        logger=context.logger)
+
+
+def _save_worker_trace():
+    profiler = global_profiler()
+    if profiler.has_events:
+        profiler.save_trace()
+
+
+def _save_and_kill(signum: int):
+    _save_worker_trace()
+    kill(getpid(), signum)
+
+
+def _save_on_terminate(signum, frame):
+    """
+    Saves the trace of a worker terminated by its pool, then lets the signal end the process. The
+    handler interrupts the worker mid task, possibly holding a profiler lock, so the trace is saved
+    from another thread while the worker goes on
+    """
+    signal.signal(signum, signal.SIG_DFL)
+    Thread(target=_save_and_kill, args=(signum,), name='trace-events-save').start()
+
+
+def _init_worker(options: dict, initializer: t.Callable | None, initargs: tuple):
+    # Spawned workers start from a fresh interpreter, forked ones already start a new shard
+    init_context(**options)
+    configure_global_profiler()
+    global_profiler()._start_shard()
+
+    # Pool workers exit without running atexit, but do run the multiprocessing finalizers
+    Finalize(None, _save_worker_trace, exitpriority=0)
+    signal.signal(signal.SIGTERM, _save_on_terminate)
+
+    if initializer is not None:
+        initializer(*initargs)
+
+
+class WorkerTraces:
+    """
+    Traces the workers of a `multiprocessing.Pool` or `concurrent.futures.ProcessPoolExecutor`. Each
+    worker records into the global profiler configured like the one of this process, and saves its
+    trace as a shard file when it exits. The shards are merged into one trace on one timeline when
+    done, whatever the start method of the pool
+
+    .. code-block:: python
+        with WorkerTraces('workers.json') as traces:
+            with ProcessPoolExecutor(initializer=traces.initializer()) as executor:
+                results = list(executor.map(work, items))
+
+    Workers save their shard when the pool shuts them down or terminates them, the pool has to be
+    done before the traces are merged
+    """
+
+    file_name: str | None
+    directory: str | None
+
+    def __init__(self, file_name: str | None = None):
+        """
+        :param file_name: Name of the merged json trace file, defaults to the global trace file name
+            with a `-workers` suffix
+        """
+        self.file_name = file_name
+        self.directory = None
+
+    def __enter__(self) -> 'WorkerTraces':
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.merge()
+
+    def start(self):
+        """ Creates the directory the workers write their shards into, next to the trace files """
+        context = global_context()
+        base_name, _ = split_trace_extension(context.global_trace_file_name)
+        # The profiler only creates the trace directory when it saves
+        makedirs(context.trace_file_dir, exist_ok=True)
+        self.directory = mkdtemp(prefix=f'{base_name}-shards-', dir=context.trace_file_dir)
+
+    def initializer(self, initializer: t.Callable | None = None, initargs: tuple = ()) -> t.Callable[[], None]:
+        """
+        Returns the `initializer` to create the pool with, which sets up tracing in each worker then
+        calls the given `initializer` with `initargs`
+        """
+        if self.directory is None:
+            raise ValueError('Worker traces have to be started before creating the pool')
+        return partial(_init_worker, _context_options(self.directory), initializer, initargs)
+
+    def shard_paths(self) -> t.List[str]:
+        """ Trace files saved by the workers so far, by process id """
+        if self.directory is None:
+            return []
+        return sorted(glob(path.join(self.directory, '*')))
+
+    def merge(self) -> str | None:
+        """ Merges the worker shards into one trace file and removes them, returning the file path """
+        if self.directory is None:
+            return None
+
+        shard_paths = self.shard_paths()
+        file_path = None
+        if shard_paths:
+            context = global_context()
+            base_name, extension = split_trace_extension(context.global_trace_file_name)
+            # The shards are json, which is merged into json
+            extension = '.json' if is_perfetto_file(context.global_trace_file_name) else extension
+            file_path = global_profiler()._file_path(self.file_name or f'{base_name}-workers{extension}')
+            merge_traces(shard_paths, file_path, compact=context.compact)
+
+        rmtree(self.directory, ignore_errors=True)
+        self.directory = None
+        return file_path
+
+
+__all__ = [WorkerTraces]
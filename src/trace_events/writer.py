@@ -0,0 +1,140 @@
+from os import SEEK_END
+import typing as t
+
+from .encoder import TraceEncoder
+from .events import AnyEvent
+
+
+class TraceWriter:
+    """
+    Writes a trace file incrementally. Events are appended to the `traceEvents` array one per line as
+    they are written, `otherData` follows when the writer is closed
+
+    .. code-block:: text
+        {"traceEvents": [
+        {"name": "foo", ...}
+        ,{"name": "bar", ...}
+        ],
+        "otherData": {...}}
+
+    Only one batch of serialized events is held in memory at a time. Every batch ends with a newline,
+    so a file cut short by a crash can be repaired with `recover_trace_file`
+
+    `compact` removes the whitespace from event separators, and `timestamp_precision` rounds event
+    timestamps and durations to that many decimal places of a microsecond. Events are serialized by
+    `TraceEncoder`, compact output uses the optional `orjson` package when it is installed
+    """
+
+    _file: t.TextIO
+    _encoder: TraceEncoder
+    _batch_size: int
+    _lines: t.List[str]
+    _count: int
+    _closed: bool
+
+    def __init__(
+            self, file: t.TextIO, batch_size: int = 1000, compact: bool = False,
+            timestamp_precision: int | None = None, backend: str | None = None):
+        self._file = file
+        self._encoder = TraceEncoder(compact, timestamp_precision, backend)
+        self._batch_size = batch_size
+        self._lines = []
+        self._count = 0
+        self._closed = False
+
+        self._file.write('{"traceEvents": [\n')
+
+    @property
+    def count(self) -> int:
+        """ Number of events written """
+        return self._count
+
+    def write_event(self, event: AnyEvent | dict):
+        """ Buffers one event, writing the batch once it is full """
+        encoded = self._encoder.encode_event(event)
+        self._lines.append(f',{encoded}\n' if self._count else f'{encoded}\n')
+        self._count += 1
+
+        if len(self._lines) >= self._batch_size:
+            self.flush()
+
+    def write_events(self, events: t.Iterable[AnyEvent | dict]):
+        """ Writes events in batches """
+        for event in events:
+            self.write_event(event)
+
+    def flush(self):
+        """ Writes the buffered batch to the file """
+        if self._lines:
+            self._file.write(''.join(self._lines))
+            self._lines = []
+        self._file.flush()
+
+    def close(self, data: dict | None = None):
+        """ Writes any buffered events and completes the trace with `data` as its `otherData` """
+        if self._closed:
+            return
+
+        self.flush()
+        self._file.write(f'],\n"otherData": {self._encoder.encode(data or {})}}}\n')
+        self._file.flush()
+        self._closed = True
+
+
+def _line_ends(file: t.BinaryIO, size: int, count: int) -> t.List[int]:
+    """ Returns the offsets just after the last `count` newlines of the file, latest first """
+    offsets = []
+    end = size
+
+    while end > 0 and len(offsets) < count:
+        start = max(0, end - 4096)
+        file.seek(start)
+        chunk = file.read(end - start)
+
+        index = len(chunk)
+        while len(offsets) < count:
+            index = chunk.rfind(b'\n', 0, index)
+            if index < 0:
+                break
+            offsets.append(start + index + 1)
+
+        end = start
+
+    return offsets
+
+
+def recover_trace_file(file_path: str) -> bool:
+    """
+    Repairs a trace file written by `TraceWriter` that was not closed, e.g. because the process
+    crashed. Any partially written line is dropped and the json is completed. Returns `False` when
+    the file was already complete. Compressed files cannot be repaired in place
+    """
+    with open(file_path, 'rb+') as file:
+        size = file.seek(0, SEEK_END)
+        offsets = _line_ends(file, size, 2)
+
+        if not offsets:
+            file.seek(0)
+            file.truncate()
+            file.write(b'{"traceEvents": [\n],\n"otherData": {}}\n')
+            return True
+
+        cut = offsets[0]
+        previous = offsets[1] if len(offsets) > 1 else 0
+        file.seek(previous)
+        last_line = file.read(cut - previous)
+
+        if cut == size and last_line.startswith(b'"otherData"'):
+            return False
+
+        file.seek(cut)
+        file.truncate()
+        if last_line == b'],\n':
+            file.write(b'"otherData": {}}\n')
+        else:
+            file.write(b'],\n"otherData": {}}\n')
+
+    return True
+
+
+__all__ = [TraceWriter, recover_trace_file]
@@ -4,7 +4,25 @@ Unit tests for trace_events package
 
 import unittest
 
+from .clockstest import *
+from .converttest import *
+from .difftest import *
+from .encodertest import *
+from .eventtest import *
 from .jsontest import *
+from .loadertest import *
+from .mergetest import *
+from .perfettotest import *
+from .profilertest import *
+from .querytest import *
+from .readertest import *
+from .samplingtest import *
+from .statstest import *
+from .storagetest import *
+from .streamtest import *
+from .switchtest import *
+from .workerstest import *
+from .writertest import *
 
 
 if __name__ == '__main__':
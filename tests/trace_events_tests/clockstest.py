@@ -0,0 +1,56 @@
+import unittest
+
+from trace_events.clocks import CLOCK_SOURCES, clock_anchor, clock_source
+from trace_events.profiler import Profiler
+
+
+class ClockTests(unittest.TestCase):
+
+    def test_unknown_clock_raises(self):
+        # Act / Assert
+        with self.assertRaises(ValueError):
+            clock_source('sundial')
+        with self.assertRaises(ValueError):
+            Profiler(clock='sundial')
+
+    def test_clocks_read_integer_nanoseconds(self):
+        # Act
+        readings = [clock_source(name)() for name in ('perf', 'monotonic', 'realtime')]
+
+        # Assert
+        self.assertIn('boottime', CLOCK_SOURCES)
+        self.assertTrue(all(isinstance(reading, int) for reading in readings))
+
+    def test_anchor_pairs_clocks(self):
+        # Arrange
+        before = clock_source('monotonic')()
+
+        # Act
+        anchor = clock_anchor('monotonic')
+        after = clock_source('monotonic')()
+
+        # Assert
+        self.assertEqual(anchor['clock'], 'monotonic')
+        self.assertLessEqual(before, anchor['clock_ns'])
+        self.assertLessEqual(anchor['clock_ns'], after)
+        self.assertLessEqual(abs(anchor['monotonic_ns'] - anchor['clock_ns']), anchor['uncertainty_ns'])
+        self.assertIn('realtime_ns', anchor)
+        self.assertIn('host', anchor)
+
+    def test_profiler_reads_configured_clock(self):
+        # Arrange
+        profiler = Profiler(clock='realtime')
+        before = clock_source('realtime')()
+
+        @profiler.profile
+        def foo():
+            pass
+
+        # Act
+        foo()
+        trace = profiler.trace()
+
+        # Assert
+        self.assertEqual(trace.data['clock'], 'realtime')
+        self.assertEqual(profiler.clock, clock_source('realtime'))
+        self.assertGreaterEqual(profiler.start_ns + trace.events[0].start_time * 1000, before - 1000)
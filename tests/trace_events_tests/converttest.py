@@ -0,0 +1,143 @@
+from io import BytesIO, StringIO
+from json import dumps
+import unittest
+
+from trace_events.convert import json_to_perfetto
+from trace_events.events import CompleteEvent, CounterEvent
+from trace_events.writer import TraceWriter
+
+from . import fixtures
+from .perfettotest import decode_message, decode_packets
+
+
+def make_events(count: int):
+    # Events of two threads, which reuse three names
+    return fixtures.make_events(count, names=3, threads=2, interval=2.0)
+
+
+def write_lines(events) -> str:
+    file = StringIO()
+    writer = TraceWriter(file)
+    writer.write_events(events)
+    writer.close()
+    return file.getvalue()
+
+
+def slices(data: bytes):
+    """ Returns the (timestamp, type, track uuid) of every track event, and the interned names """
+    packets = decode_packets(data)
+    names = dict()
+    result = []
+    for packet in packets:
+        if 12 in packet:
+            for entry in decode_message(packet[12][0]).get(2, []):
+                entry = decode_message(entry)
+                names.setdefault(entry[2][0], set()).add(entry[1][0])
+        if 11 in packet:
+            track_event = decode_message(packet[11][0])
+            result.append((packet[8][0], track_event[9][0], track_event[11][0]))
+    return result, names
+
+
+class JsonToPerfettoTests(unittest.TestCase):
+
+    def test_line_and_json_layouts_convert_the_same(self):
+        # Arrange
+        events = make_events(10)
+        lines = StringIO(write_lines(events))
+        compact = StringIO(dumps(dict(traceEvents=[event.to_json() for event in events])))
+        line_output, compact_output = BytesIO(), BytesIO()
+
+        # Act
+        json_to_perfetto(lines, line_output)
+        json_to_perfetto(compact, compact_output)
+
+        # Assert
+        self.assertEqual(line_output.getvalue(), compact_output.getvalue())
+        self.assertEqual(len(slices(line_output.getvalue())[0]), 20)
+
+    def test_split_first_event_is_parsed_incrementally(self):
+        # Arrange
+        events = make_events(3)
+        lines = write_lines(events)
+        header, _, rest = lines.split('\n', 2)
+        # The header of a line per event trace, but the first event over several lines
+        split = '\n'.join((header, dumps(events[0].to_json(), indent=0), rest))
+        expected, output = BytesIO(), BytesIO()
+
+        # Act
+        json_to_perfetto(StringIO(lines), expected)
+        json_to_perfetto(StringIO(split), output)
+
+        # Assert
+        self.assertEqual(output.getvalue(), expected.getvalue())
+
+    def test_later_split_event_raises(self):
+        # Arrange
+        events = make_events(3)
+        header, first_line, rest = write_lines(events).split('\n', 2)
+        split = '\n'.join((header, first_line, ',' + dumps(events[1].to_json(), indent=0), rest))
+
+        # Act / Assert
+        with self.assertRaisesRegex(ValueError, 'splits an event'):
+            json_to_perfetto(StringIO(split), BytesIO())
+
+    def test_parallel_conversion_matches_sequential(self):
+        # Arrange
+        data = write_lines(make_events(50))
+        sequential, parallel = BytesIO(), BytesIO()
+
+        # Act
+        json_to_perfetto(StringIO(data), sequential)
+        json_to_perfetto(StringIO(data), parallel, jobs=2, chunk_size=7)
+
+        # Assert
+        sequential_slices, sequential_names = slices(sequential.getvalue())
+        parallel_slices, parallel_names = slices(parallel.getvalue())
+        self.assertEqual([slice[:2] for slice in parallel_slices], [slice[:2] for slice in sequential_slices])
+        self.assertEqual(len({slice[2] for slice in parallel_slices}), 2)
+        self.assertEqual(set(parallel_names), {b'event-0', b'event-1', b'event-2'})
+
+        cleared = [packet for packet in decode_packets(parallel.getvalue()) if packet.get(13) == [3]]
+        self.assertEqual(len(cleared), 8)
+
+    def test_negative_first_timestamp_is_shifted(self):
+        # Arrange
+        events = [CompleteEvent('foo', -5.0, 1.0, process_id=1, thread_id=2), CounterEvent('bar', 0.0, process_id=1, thread_id=2, args=dict(bar=1))]
+        output = BytesIO()
+
+        # Act
+        skipped = json_to_perfetto(StringIO(write_lines(events)), output)
+
+        # Assert
+        self.assertEqual(skipped, dict())
+        self.assertEqual([slice[0] for slice in slices(output.getvalue())[0]], [0, 1000, 5000])
+
+    def test_unsupported_events_are_counted(self):
+        # Arrange
+        data = dumps([dict(ph='X', name='foo', ts=1, dur=1, pid=1, tid=1), dict(ph='?', ts=2), dict(ph='?', ts=3)])
+
+        # Act
+        skipped = json_to_perfetto(StringIO(data), BytesIO())
+
+        # Assert
+        self.assertEqual(skipped, {'?': 2})
+
+    def test_all_event_types_are_converted(self):
+        # Arrange
+        events = [
+            dict(ph='M', name='thread_name', pid=1, tid=2, args=dict(name='worker')),
+            dict(ph='M', name='thread_sort_index', pid=1, tid=2, args=dict(sort_index=1)),
+            dict(ph='B', name='foo', pid=1, tid=2, ts=1),
+            dict(ph='i', name='bar', pid=1, tid=2, ts=2, s='g'),
+            dict(ph='E', pid=1, tid=2, ts=3),
+            dict(ph='C', name='baz', pid=1, tid=2, ts=4, args=dict(baz=5)),
+        ]
+        output = BytesIO()
+
+        # Act
+        skipped = json_to_perfetto(StringIO(dumps(dict(traceEvents=events))), output)
+
+        # Assert
+        self.assertEqual(skipped, dict())
+        self.assertEqual([slice[:2] for slice in slices(output.getvalue())[0]], [(1000, 1), (2000, 3), (3000, 2), (4000, 4)])
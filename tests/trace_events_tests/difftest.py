@@ -0,0 +1,149 @@
+from importlib.util import module_from_spec, spec_from_file_location
+from os import path
+import random
+from tempfile import TemporaryDirectory
+import unittest
+
+from trace_events.diff import diff_stats, diff_traces, function_stats
+from trace_events.events import CompleteEvent, CounterEvent
+from trace_events.files import open_trace_file
+from trace_events.writer import TraceWriter
+
+try:
+    from click.testing import CliRunner
+except ImportError:
+    CliRunner = None
+
+
+def load_tools():
+    """ Imports the command line tools, which are scripts rather than part of the package """
+    file_path = path.join(path.dirname(__file__), '..', '..', 'tools', 'json_to_perfetto.py')
+    spec = spec_from_file_location('json_to_perfetto', file_path)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def span(name: str, start: float, duration: float, thread_id: int = 1) -> dict:
+    return CompleteEvent(name, start, duration, process_id=1, thread_id=thread_id).to_json()
+
+
+def write_trace(file_path: str, durations: dict, seed: int):
+    """ Writes one call after the other of each name, with the given median durations """
+    rng = random.Random(seed)
+    start = 0.0
+    with open_trace_file(file_path, 'w') as file:
+        writer = TraceWriter(file)
+        for name, duration in durations.items():
+            for _ in range(100):
+                event = CompleteEvent(name, start, duration * rng.uniform(0.9, 1.1), process_id=1, thread_id=1)
+                writer.write_event(event)
+                start += 2 * duration
+        writer.close(dict())
+
+
+class FunctionStatsTests(unittest.TestCase):
+
+    def test_self_time_excludes_enclosed_spans(self):
+        # Arrange
+        events = [
+            span('child', 20.0, 30.0),
+            span('parent', 10.0, 100.0),
+            span('grandchild', 25.0, 10.0),
+            span('child', 60.0, 20.0),
+            span('other_thread', 0.0, 500.0, thread_id=2),
+            CounterEvent('calls', 5.0, process_id=1, thread_id=1, args=dict(calls=1)).to_json(),
+        ]
+
+        # Act
+        stats = function_stats(events)
+
+        # Assert
+        self.assertEqual({name: function.count for name, function in stats.items()},
+                         dict(parent=1, child=2, grandchild=1, other_thread=1))
+        self.assertEqual(stats['parent'].self_time, 50.0)
+        self.assertEqual(stats['child'].self_time, 40.0)
+        self.assertEqual(stats['child'].inclusive, 50.0)
+        self.assertEqual(stats['other_thread'].self_time, 500.0)
+
+    def test_recursion_is_counted_once_in_inclusive_time(self):
+        # Arrange
+        events = [span('fib', 0.0, 100.0), span('fib', 10.0, 50.0), span('fib', 20.0, 10.0)]
+
+        # Act
+        stats = function_stats(events)
+
+        # Assert
+        self.assertEqual(stats['fib'].count, 3)
+        self.assertEqual(stats['fib'].inclusive, 100.0)
+        self.assertEqual(stats['fib'].self_time, 100.0)
+
+
+class TraceDiffTests(unittest.TestCase):
+
+    def test_regressions_are_detected(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            baseline = path.join(directory, 'baseline.json')
+            candidate = path.join(directory, 'candidate.json.gz')
+            write_trace(baseline, dict(steady=100.0, slower=100.0, removed=10.0), seed=1)
+            write_trace(candidate, dict(steady=100.0, slower=150.0, added=10.0), seed=2)
+
+            # Act
+            result = diff_traces(baseline, candidate, threshold=0.1)
+
+            # Assert
+            self.assertEqual([function.name for function in result.regressions], ['slower'])
+            self.assertAlmostEqual(result.functions[0].change, 0.5, delta=0.1)
+            self.assertEqual({function.name for function in result.functions},
+                             {'steady', 'slower', 'removed', 'added'})
+            self.assertEqual(result.to_json()['regressions'], ['slower'])
+
+    def test_threshold_ignores_small_changes(self):
+        # Arrange
+        baseline = function_stats(span('foo', index * 100.0, 50.0) for index in range(100))
+        candidate = function_stats(span('foo', index * 100.0, 52.0) for index in range(100))
+
+        # Act
+        strict = diff_stats(baseline, candidate, threshold=0.01)
+        lenient = diff_stats(baseline, candidate, threshold=0.05)
+
+        # Assert
+        self.assertEqual(len(strict.regressions), 1)
+        self.assertEqual(lenient.regressions, [])
+
+    def test_perfetto_traces_raise(self):
+        # Act / Assert
+        with self.assertRaises(ValueError):
+            diff_traces('baseline.pftrace', 'candidate.json')
+
+
+@unittest.skipIf(CliRunner is None, 'requires click')
+class DiffCommandTests(unittest.TestCase):
+
+    def run_diff(self, baseline: str, candidate: str):
+        return CliRunner().invoke(load_tools().trace_tools, ['diff', baseline, candidate])
+
+    def test_exit_codes_tell_regressions_from_errors(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            baseline = path.join(directory, 'baseline.json')
+            candidate = path.join(directory, 'candidate.json')
+            malformed = path.join(directory, 'malformed.json')
+            perfetto = path.join(directory, 'trace.pftrace')
+            write_trace(baseline, dict(foo=100.0), seed=1)
+            write_trace(candidate, dict(foo=150.0), seed=2)
+            for file_path, content in ((malformed, '{"traceEvents": [{"na'), (perfetto, '')):
+                with open(file_path, 'w') as file:
+                    file.write(content)
+
+            # Act
+            unchanged = self.run_diff(baseline, baseline)
+            regressed = self.run_diff(baseline, candidate)
+            errors = [self.run_diff(baseline, file_path) for file_path in (malformed, perfetto)]
+
+            # Assert
+            self.assertEqual(unchanged.exit_code, 0, unchanged.output)
+            self.assertEqual(regressed.exit_code, 1, regressed.output)
+            self.assertIn('1 of 1 functions regressed', regressed.output)
+            self.assertEqual([result.exit_code for result in errors], [2, 2])
@@ -0,0 +1,100 @@
+from json import dumps, loads
+import unittest
+
+from trace_events.encoder import TraceEncoder, orjson
+from trace_events.events import CompleteEvent, CounterEvent
+from trace_events.json import TraceJsonEncoder
+from trace_events.trace import Trace
+
+
+def make_events():
+    return [
+        CompleteEvent('foo', 1.5, 2.25, 'bar', process_id=1, thread_id=139816706759552),
+        CompleteEvent('café "quoted"', 10, 42, args=dict(foo=10, bar=[1.5, 'baz']), process_id=1, thread_id=2),
+        CounterEvent('calls', 3.75, process_id=1, thread_id=2, args=dict(calls=5)),
+    ]
+
+
+class TraceEncoderTests(unittest.TestCase):
+
+    def test_events_match_json_encoder(self):
+        # Arrange
+        events = make_events()
+        encoder = TraceEncoder()
+
+        # Act
+        result = [encoder.encode_event(event) for event in events]
+
+        # Assert
+        self.assertEqual(result, [dumps(event, cls=TraceJsonEncoder) for event in events])
+
+    def test_compact_events_match_json_encoder(self):
+        # Arrange
+        events = make_events()
+        encoder = TraceEncoder(compact=True, backend='json')
+
+        # Act
+        result = [encoder.encode_event(event) for event in events]
+
+        # Assert
+        self.assertEqual(result, [dumps(event, cls=TraceJsonEncoder, separators=(',', ':')) for event in events])
+
+    def test_trace_matches_json_encoder(self):
+        # Arrange
+        trace = Trace(make_events(), dict(version='1.0'))
+
+        # Act
+        result = TraceEncoder().encode(trace)
+
+        # Assert
+        self.assertEqual(result, dumps(trace, cls=TraceJsonEncoder))
+
+    def test_unusual_values_fall_back_to_json_encoder(self):
+        # Arrange
+        events = [
+            CompleteEvent('foo', float('nan'), 1.0, process_id=1, thread_id=2),
+            CounterEvent('bar', 1.0, process_id=True, thread_id=2, args=dict(bar=1)),
+            dict(name='baz', ph='i', ts=1.0),
+        ]
+
+        # Act
+        result = [TraceEncoder().encode_event(event) for event in events]
+
+        # Assert
+        self.assertEqual(result, [dumps(event, cls=TraceJsonEncoder) for event in events])
+
+    def test_timestamps_are_rounded(self):
+        # Arrange
+        events = [
+            CompleteEvent('foo', 1.23456, 2.34567, process_id=1, thread_id=2),
+            dict(name='bar', ph='C', ts=3.45678, args=dict(bar=1.23456)),
+        ]
+
+        # Act
+        result = [loads(TraceEncoder(timestamp_precision=2).encode_event(event)) for event in events]
+        whole = loads(TraceEncoder(timestamp_precision=0).encode_event(events[0]))
+
+        # Assert
+        self.assertEqual((result[0]['ts'], result[0]['dur']), (1.23, 2.35))
+        self.assertEqual((result[1]['ts'], result[1]['args']), (3.46, dict(bar=1.23456)))
+        self.assertEqual(whole['ts'], 1)
+        self.assertIsInstance(whole['ts'], int)
+
+    @unittest.skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_backend_writes_the_same_json(self):
+        # Arrange
+        events = make_events()
+        encoder = TraceEncoder(compact=True, backend='orjson')
+
+        # Act
+        result = [loads(encoder.encode_event(event)) for event in events]
+
+        # Assert
+        self.assertEqual(result, [loads(dumps(event, cls=TraceJsonEncoder)) for event in events])
+
+    def test_invalid_backends_raise(self):
+        # Act / Assert
+        with self.assertRaises(ValueError):
+            TraceEncoder(backend='simplejson')
+        with self.assertRaises(ValueError):
+            TraceEncoder(compact=False, backend='orjson')
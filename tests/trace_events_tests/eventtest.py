@@ -0,0 +1,32 @@
+import unittest
+
+from trace_events.events import CompleteEvent, CounterEvent
+from trace_events.trace import Trace
+
+
+class EventSchemaTests(unittest.TestCase):
+
+    def test_schema_fields_are_cached(self):
+        for event_type in (CompleteEvent, CounterEvent):
+            with self.subTest(event_type=event_type.__name__):
+                self.assertIs(event_type.category_field, event_type.category_field)
+                self.assertIs(event_type.fields, event_type.fields)
+                self.assertIs(event_type.fields[2], event_type.category_field)
+
+    def test_events_have_no_instance_dict(self):
+        # Arrange
+        events = (CompleteEvent('foo', 1.0, 2.0), CounterEvent('foo', 1.0))
+
+        # Assert
+        for event in events:
+            with self.subTest(event_type=type(event).__name__):
+                self.assertFalse(hasattr(event, '__dict__'))
+
+    def test_cached_defaults_are_not_shared(self):
+        # Act
+        first = Trace.from_dict(dict(otherData=dict()))
+        second = Trace.from_dict(dict(otherData=dict()))
+        first.events.append(CompleteEvent('foo', 1.0, 2.0))
+
+        # Assert
+        self.assertEqual(second.events, [])
@@ -0,0 +1,29 @@
+from trace_events.events import CompleteEvent, CounterEvent
+
+
+def make_events(
+        count: int, names: int | None = None, threads: int = 1, interval: float = 1.0,
+        duration: float = 1.0) -> list:
+    """
+    Returns `count` complete events of one process, one every `interval` microseconds
+
+    :param names: Number of distinct names the events cycle through, every event has its own by default
+    :param threads: Number of threads the events alternate between, from thread id 2
+    """
+    return [
+        CompleteEvent(
+            f'event-{index % names if names else index}', index * interval, duration, process_id=1,
+            thread_id=2 + index % threads)
+        for index in range(count)]
+
+
+def make_timeline() -> list:
+    """ Returns nested calls of two threads, with a counter event """
+    return [
+        CompleteEvent('main', 0.0, 100.0, 'function', process_id=1, thread_id=1),
+        CompleteEvent('foo', 10.0, 5.0, 'function', process_id=1, thread_id=1),
+        CompleteEvent('bar', 30.0, 20.0, 'io', process_id=1, thread_id=2),
+        CounterEvent('calls', 40.0, process_id=1, thread_id=2, args=dict(calls=3)),
+        CompleteEvent('foo', 70.0, 8.0, 'function', process_id=1, thread_id=2),
+        CompleteEvent('foo', 90.0, 1.0, 'function', process_id=1, thread_id=1),
+    ]
@@ -0,0 +1,105 @@
+from json import dump
+from os import path
+from tempfile import TemporaryDirectory
+import unittest
+
+from trace_events.events import CompleteEvent, CounterEvent
+from trace_events.field import field_extractor, get_fields
+from trace_events.loader import load_event, load_events, load_trace, trace_from_dict
+from trace_events.storage import ColumnarEvents
+
+
+def make_json_events():
+    return [
+        dict(name='foo', ph='X', ts=1.5, dur=2.25, cat='bar', pid=1, tis=2, args=dict(a=1)),
+        dict(name='calls', ph='C', ts=3, pid=1, tis=2, args=dict(calls=5)),
+        dict(name='baz', ph='X', ts=4.75, dur=1, pid=1, tis=3),
+    ]
+
+
+class LoaderTests(unittest.TestCase):
+
+    def test_field_extractor_matches_get_fields(self):
+        # Arrange
+        data = [
+            dict(name='foo', ph='X', ts=1, dur=2.5, pid=1, tis=2),
+            dict(name='foo', ph='X', ts=1.5, dur=2, cat='bar', args=dict(a=1)),
+        ]
+
+        # Act
+        extracted = [field_extractor(CompleteEvent)(item) for item in data]
+
+        # Assert
+        self.assertEqual(extracted, [tuple(get_fields(CompleteEvent, item)) for item in data])
+
+    def test_field_extractor_raises_for_missing_required_field(self):
+        # Arrange
+        data = dict(ph='X', ts=1.0, dur=2.0)
+
+        # Act / Assert
+        with self.assertRaises(KeyError):
+            field_extractor(CompleteEvent)(data)
+
+    def test_events_are_loaded_as_objects(self):
+        # Arrange
+        data = make_json_events()
+
+        # Act
+        events = load_events(data)
+
+        # Assert
+        self.assertEqual(events, [
+            CompleteEvent('foo', 1.5, 2.25, 'bar', dict(a=1), process_id=1, thread_id=2),
+            CounterEvent('calls', 3.0, process_id=1, thread_id=2, args=dict(calls=5)),
+            CompleteEvent('baz', 4.75, 1.0, process_id=1, thread_id=3),
+        ])
+
+    def test_raw_events_match_objects(self):
+        # Arrange
+        data = make_json_events()
+
+        # Act
+        columns = load_events(data, raw=True)
+
+        # Assert
+        self.assertIsInstance(columns, ColumnarEvents)
+        self.assertEqual(list(columns), [load_event(item) for item in data])
+
+    def test_unknown_event_type_raises(self):
+        # Arrange
+        data = [dict(name='foo', ph='Z', ts=1.0)]
+
+        # Act / Assert
+        with self.assertRaises(TypeError):
+            load_events(data)
+        with self.assertRaises(TypeError):
+            load_events(data, raw=True)
+
+    def test_array_format_is_loaded(self):
+        # Arrange
+        data = make_json_events()
+
+        # Act
+        trace = trace_from_dict(data)
+
+        # Assert
+        self.assertEqual(trace.events, load_events(data))
+        self.assertEqual(trace.data, {})
+
+    def test_trace_file_is_loaded(self):
+        # Arrange
+        data = dict(traceEvents=make_json_events(), otherData=dict(version='1.0'))
+
+        with TemporaryDirectory() as directory:
+            file_path = path.join(directory, 'trace.json')
+            with open(file_path, 'w') as file:
+                dump(data, file)
+
+            # Act
+            trace = load_trace(file_path)
+            raw_trace = load_trace(file_path, raw=True)
+
+        # Assert
+        self.assertEqual(trace.events, load_events(data['traceEvents']))
+        self.assertEqual(list(raw_trace.events), trace.events)
+        self.assertEqual(trace.data, dict(version='1.0'))
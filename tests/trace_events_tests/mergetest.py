@@ -0,0 +1,117 @@
+from json import load
+from os import path
+from tempfile import TemporaryDirectory
+from time import time_ns
+import unittest
+
+from trace_events.events import CompleteEvent, CounterEvent
+from trace_events.files import open_trace_file
+from trace_events.merge import merge_clock, merge_traces, read_trace_data, trace_zero
+from trace_events.profiler import Profiler
+from trace_events.writer import TraceWriter
+
+
+def write_trace(file_path: str, events: list, data: dict):
+    with open_trace_file(file_path, 'w') as file:
+        writer = TraceWriter(file)
+        writer.write_events(events)
+        writer.close(data)
+
+
+def trace_data(clock_ns: int, realtime_ns: int, host: str = 'host', **anchor) -> dict:
+    """ `otherData` of a trace starting at `clock_ns`, read when the realtime clock was at `realtime_ns` """
+    return dict(start_ns=clock_ns, clock='perf', clock_anchor=dict(
+        clock='perf', clock_ns=clock_ns, realtime_ns=realtime_ns, host=host, **anchor))
+
+
+class MergeTests(unittest.TestCase):
+
+    def test_trace_data_is_read(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            data = dict(trace_data(1000, 1.5e18), foo=[1, 2])
+            file_paths = [path.join(directory, name) for name in ('trace.json', 'trace.json.gz')]
+            for file_path in file_paths:
+                write_trace(file_path, [CompleteEvent('foo', 1.0, 2.0, process_id=1, thread_id=2)], data)
+
+            # Act
+            result = [read_trace_data(file_path) for file_path in file_paths]
+
+            # Assert
+            self.assertEqual(result, [data, data])
+
+    def test_traces_are_aligned_by_clock_anchor(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            first = path.join(directory, 'first.json')
+            second = path.join(directory, 'second.json.gz')
+            unanchored = path.join(directory, 'unanchored.json')
+            output = path.join(directory, 'merged.json')
+            write_trace(first, [CompleteEvent('foo', 10.0, 5.0, process_id=1, thread_id=1)],
+                        trace_data(7_000_000, 1_000_500_000))
+            write_trace(second, [
+                CompleteEvent('bar', 10.0, 5.0, process_id=2, thread_id=2),
+                CounterEvent('calls', 20.0, process_id=2, thread_id=2, args=dict(calls=1)),
+            ], trace_data(3_000_000, 1_000_000_000, host='other'))
+            write_trace(unanchored, [CompleteEvent('baz', 7.0, 1.0, process_id=3, thread_id=3)], dict())
+
+            # Act
+            data = merge_traces([first, second, unanchored], output)
+            with open(output) as file:
+                result = load(file)
+
+            # Assert
+            self.assertEqual([(event['name'], event['ts']) for event in result['traceEvents']],
+                             [('foo', 510.0), ('bar', 10.0), ('calls', 20.0), ('baz', 7.0)])
+            self.assertEqual(result['otherData'], data)
+            self.assertEqual(data['merge_clock'], 'realtime')
+            self.assertEqual(data['clock_anchor']['realtime_ns'], 1_000_000_000)
+            self.assertEqual([merged['offset'] for merged in data['merged']], [500.0, 0.0, 0.0])
+
+    def test_same_boot_is_aligned_by_monotonic_clock(self):
+        # Arrange
+        first = trace_data(1_000_000, 5_000_000_000, monotonic_ns=2_000_000, boot_id='boot')
+        # The realtime clock stepped back between both traces
+        second = trace_data(9_000_000, 1_000_000_000, monotonic_ns=2_500_000, boot_id='boot')
+
+        # Act
+        clock = merge_clock([first, second])
+        zeros = [trace_zero(data, clock) for data in (first, second)]
+
+        # Assert
+        self.assertEqual(clock, 'monotonic')
+        self.assertEqual(zeros, [(2_000_000, 1.0), (2_500_000, 1.0)])
+
+    def test_clock_drift_is_measured_from_save_anchor(self):
+        # Arrange
+        data = trace_data(1_000_000_000, 5_000_000_000)
+        data['save_anchor'] = dict(clock='perf', clock_ns=11_000_000_000, realtime_ns=15_000_100_000)
+        stepped = dict(data, save_anchor=dict(data['save_anchor'], realtime_ns=25_000_000_000))
+
+        # Act
+        result = trace_zero(data, 'realtime')
+        stepped_result = trace_zero(stepped, 'realtime')
+
+        # Assert
+        self.assertEqual(result, (5_000_000_000, 1.00001))
+        self.assertEqual(stepped_result, (5_000_000_000, 1.0))
+
+    def test_profiler_records_clock_anchor(self):
+        # Arrange
+        profiler = Profiler()
+
+        # Act
+        data = profiler.trace().data
+        anchor = data['clock_anchor']
+
+        # Assert
+        self.assertEqual(data['start_ns'], profiler.start_ns)
+        self.assertEqual(anchor['clock'], 'perf')
+        self.assertGreaterEqual(anchor['clock_ns'], profiler.start_ns)
+        self.assertAlmostEqual(anchor['realtime_ns'], time_ns(), delta=5e9)
+        self.assertGreaterEqual(data['save_anchor']['clock_ns'], anchor['clock_ns'])
+
+    def test_perfetto_traces_raise(self):
+        # Act / Assert
+        with self.assertRaises(ValueError):
+            merge_traces(['trace.pftrace'], 'merged.json')
@@ -0,0 +1,210 @@
+from io import BytesIO
+from os import path
+from tempfile import TemporaryDirectory
+import typing as t
+import unittest
+
+from trace_events.events import CompleteEvent, CounterEvent
+from trace_events.perfetto import PerfettoWriter, encode_varint
+from trace_events.profiler import Profiler
+
+
+def read_varint(data: bytes, offset: int) -> t.Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, offset
+
+
+def decode_message(data: bytes) -> t.Dict[int, list]:
+    """ Decodes a protobuf message into lists of raw values per field number """
+    fields = dict()
+    offset = 0
+    while offset < len(data):
+        key, offset = read_varint(data, offset)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, offset = read_varint(data, offset)
+        elif wire_type == 1:
+            value, offset = data[offset:offset + 8], offset + 8
+        elif wire_type == 2:
+            length, offset = read_varint(data, offset)
+            value, offset = data[offset:offset + length], offset + length
+        else:
+            raise ValueError(f'Unexpected wire type {wire_type}')
+        fields.setdefault(field, []).append(value)
+    return fields
+
+
+def decode_packets(data: bytes) -> t.List[t.Dict[int, list]]:
+    return [decode_message(packet) for packet in decode_message(data).get(1, [])]
+
+
+class PerfettoEncodingTests(unittest.TestCase):
+
+    def test_varint_encoding(self):
+        # Arrange
+        values = [0, 1, 127, 128, 300, 2 ** 63]
+
+        # Act
+        encoded = [encode_varint(value) for value in values]
+
+        # Assert
+        self.assertEqual(encoded[:5], [b'\x00', b'\x01', b'\x7f', b'\x80\x01', b'\xac\x02'])
+        self.assertEqual(read_varint(encoded[5], 0), (2 ** 63, 10))
+        self.assertEqual(len(encode_varint(-1)), 10)
+
+
+class PerfettoWriterTests(unittest.TestCase):
+
+    def test_complete_events_are_written_as_slices(self):
+        # Arrange
+        file = BytesIO()
+        events = [CompleteEvent(f'event-{index}', float(index), 0.5, process_id=1, thread_id=2) for index in range(3)]
+
+        # Act
+        writer = PerfettoWriter(file, batch_size=2)
+        writer.write_events(events)
+        writer.close()
+        packets = decode_packets(file.getvalue())
+
+        # Assert
+        descriptors = [packet for packet in packets if 60 in packet]
+        track_events = [packet for packet in packets if 11 in packet]
+        self.assertEqual(len(descriptors), 2)
+        self.assertEqual(len(track_events), 6)
+        self.assertEqual([packet[8][0] for packet in track_events], [0, 500, 1000, 1500, 2000, 2500])
+
+        begin = decode_message(track_events[0][11][0])
+        self.assertEqual(begin[9], [1])
+        self.assertEqual(begin[10], [1])
+        self.assertEqual(decode_message(track_events[1][11][0])[9], [2])
+
+    def test_names_and_categories_are_interned_once(self):
+        # Arrange
+        file = BytesIO()
+        events = [CompleteEvent(f'event-{index % 2}', float(index), 0.5, process_id=1, thread_id=2) for index in range(4)]
+
+        # Act
+        writer = PerfettoWriter(file)
+        writer.write_events(events)
+        writer.close()
+        packets = decode_packets(file.getvalue())
+
+        # Assert
+        begins = [packet for packet in packets if 11 in packet and 13 in packet]
+        self.assertEqual([packet[13] for packet in begins], [[3], [2], [2], [2]])
+        self.assertEqual([decode_message(packet[11][0])[10] for packet in begins], [[1], [2], [1], [2]])
+
+        interned = [decode_message(packet[12][0]) for packet in begins if 12 in packet]
+        self.assertEqual(len(interned), 2)
+        self.assertEqual(decode_message(interned[0][1][0]), {1: [1], 2: [b'function']})
+        self.assertEqual(decode_message(interned[0][2][0]), {1: [1], 2: [b'event-0']})
+        self.assertNotIn(1, interned[1])
+        self.assertEqual(decode_message(interned[1][2][0]), {1: [2], 2: [b'event-1']})
+
+    def test_counter_series_get_their_own_tracks(self):
+        # Arrange
+        file = BytesIO()
+        events = [
+            CounterEvent('foo', 1.0, process_id=1, thread_id=2, args=dict(foo=1)),
+            CounterEvent('foo', 2.0, process_id=1, thread_id=2, args=dict(foo=2)),
+            CounterEvent('bar', 3.0, process_id=1, thread_id=2, args=dict(x=1.5)),
+        ]
+
+        # Act
+        writer = PerfettoWriter(file)
+        writer.write_events(events)
+        writer.close()
+        packets = decode_packets(file.getvalue())
+
+        # Assert
+        names = [decode_message(packet[60][0]).get(2) for packet in packets if 60 in packet]
+        self.assertEqual(names, [None, [b'foo'], [b'bar x']])
+        values = [decode_message(packet[11][0]) for packet in packets if 11 in packet]
+        self.assertEqual([value.get(30) for value in values], [[1], [2], None])
+        self.assertIn(44, values[2])
+
+
+    def test_json_events_are_written_like_event_objects(self):
+        # Arrange
+        events = [
+            CompleteEvent('foo', 1.0, 0.5, process_id=1, thread_id=2, args=dict(x=1)),
+            CounterEvent('bar', 2.0, process_id=1, thread_id=2, args=dict(bar=3)),
+        ]
+        json_events = [event.to_json() for event in events]
+        json_events[0]['tid'] = json_events[0].pop('tis')
+        expected, result = BytesIO(), BytesIO()
+
+        # Act
+        writer = PerfettoWriter(expected)
+        writer.write_events(events)
+        writer.close()
+        writer = PerfettoWriter(result)
+        for event in json_events:
+            writer.write_json_event(event)
+        writer.close()
+
+        # Assert
+        self.assertEqual(result.getvalue(), expected.getvalue())
+
+    def test_metadata_names_tracks(self):
+        # Arrange
+        file = BytesIO()
+        events = [
+            dict(ph='M', name='process_name', pid=1, args=dict(name='main')),
+            dict(ph='M', name='thread_name', pid=1, tid=2, args=dict(name='worker')),
+            dict(ph='i', name='foo', pid=1, tid=2, ts=1.0),
+        ]
+
+        # Act
+        writer = PerfettoWriter(file)
+        for event in events:
+            writer.write_json_event(event)
+        writer.close()
+        packets = decode_packets(file.getvalue())
+
+        # Assert
+        descriptors = [decode_message(packet[60][0]) for packet in packets if 60 in packet]
+        self.assertEqual(len(descriptors), 2)
+        self.assertEqual(decode_message(descriptors[0][3][0])[6], [b'main'])
+        self.assertEqual(decode_message(descriptors[1][4][0])[5], [b'worker'])
+        instant = decode_message(packets[-1][11][0])
+        self.assertEqual(instant[9], [3])
+        self.assertEqual(instant[11], descriptors[1][1])
+
+    def test_negative_timestamps_are_rejected(self):
+        # Arrange
+        event = CompleteEvent('foo', -10.0, 0.5, process_id=1, thread_id=2)
+
+        # Act
+        shifted = BytesIO()
+        PerfettoWriter(shifted, time_offset=10.0).write_event(event)
+
+        # Assert
+        with self.assertRaises(ValueError):
+            PerfettoWriter(BytesIO()).write_event(event)
+
+
+class ProfilerPerfettoTests(unittest.TestCase):
+
+    def test_perfetto_file_is_selected_by_extension(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            profiler = Profiler(path.join(directory, 'trace.pftrace'), stream=True, batch_size=2)
+
+            # Act
+            start_ns = profiler.start_ns
+            for index in range(5):
+                profiler._add_complete_event('foo', start_ns + index * 1000, start_ns + (index + 1) * 1000)
+            file_path = profiler.save_trace()
+            with open(file_path, 'rb') as file:
+                packets = decode_packets(file.read())
+
+            # Assert
+            self.assertEqual(len([packet for packet in packets if 11 in packet]), 10)
@@ -0,0 +1,358 @@
+from json import load
+import os
+from os import path
+import signal
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+from textwrap import dedent
+from threading import Thread
+from timeit import repeat
+import unittest
+from unittest.mock import patch
+
+from trace_events.events import CompleteEvent, CounterEvent
+from trace_events.profiler import DEFAULT_RING_EVENTS, Profiler
+from trace_events.utils import qualified_name
+
+
+def run_threads(target, thread_count: int):
+    threads = [Thread(target=target) for _ in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return threads
+
+
+def run_script(script: str, timeout: float) -> subprocess.CompletedProcess:
+    """ Runs `script` in a new interpreter which imports this package, killed after `timeout` seconds """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    return subprocess.run(
+        [sys.executable, '-c', dedent(script)], env=env, capture_output=True, text=True, timeout=timeout)
+
+
+class ProfilerThreadingTests(unittest.TestCase):
+
+    def test_events_from_all_threads_are_merged(self):
+        # Arrange
+        profiler = Profiler()
+
+        @profiler.profile
+        def foo():
+            pass
+
+        def work():
+            for _ in range(1000):
+                foo()
+
+        # Act
+        threads = run_threads(work, 8)
+        trace = profiler.trace()
+
+        # Assert
+        self.assertEqual(len(trace.events), 8 * 1000)
+        self.assertTrue(all(isinstance(event, CompleteEvent) for event in trace.events))
+        self.assertEqual(
+            set(event.thread_id for event in trace.events),
+            set(thread.native_id for thread in threads))
+
+    def test_counters_are_correct_across_threads(self):
+        # Arrange
+        profiler = Profiler()
+
+        @profiler.counter(topic='foo-calls')
+        def foo():
+            pass
+
+        def work():
+            for _ in range(1000):
+                foo()
+
+        # Act
+        run_threads(work, 8)
+        trace = profiler.trace()
+
+        # Assert
+        self.assertEqual(len(trace.events), 8 * 1000)
+        self.assertTrue(all(isinstance(event, CounterEvent) for event in trace.events))
+        self.assertEqual(profiler._topics.counters(), {'foo-calls': 8 * 1000})
+
+    def test_reset_discards_buffered_events(self):
+        # Arrange
+        profiler = Profiler()
+
+        @profiler.profile
+        def foo():
+            pass
+
+        foo()
+
+        # Act
+        profiler.reset()
+        foo()
+
+        # Assert
+        self.assertEqual(len(profiler.trace().events), 1)
+
+
+class ProfilerCounterTests(unittest.TestCase):
+
+    def test_counter_events_only_record_changed_topic(self):
+        # Arrange
+        profiler = Profiler()
+
+        @profiler.counter(topic='foo-calls')
+        def foo():
+            pass
+
+        @profiler.exit_counter(topic='bar-exits')
+        def bar():
+            pass
+
+        # Act
+        foo()
+        bar()
+        foo()
+        trace = profiler.trace()
+
+        # Assert
+        self.assertEqual(
+            [(event.name, event.args) for event in trace.events],
+            [('foo-calls', {'foo-calls': 1}), ('bar-exits', {'bar-exits': 1}), ('foo-calls', {'foo-calls': 2})])
+
+    def test_columnar_counter_values_round_trip(self):
+        # Arrange
+        profiler = Profiler(columnar=True)
+
+        # Act
+        for _ in range(3):
+            profiler._add_counter_event('foo', 'foo-calls')
+        trace = profiler.trace()
+
+        # Assert
+        self.assertEqual([event.args for event in trace.events], [{'foo-calls': count} for count in (1, 2, 3)])
+        self.assertEqual(trace.events._args, {})
+
+
+class ProfilerFlightRecorderTests(unittest.TestCase):
+
+    def test_only_last_events_are_retained(self):
+        # Arrange
+        profiler = Profiler(max_events=10)
+
+        # Act
+        for index in range(100):
+            profiler._add_complete_event(f'event-{index}', 1000, 2000)
+        trace = profiler.trace()
+
+        # Assert
+        self.assertEqual(
+            [event.name for event in trace.events], [f'event-{index}' for index in range(90, 100)])
+
+    def test_old_events_are_expired(self):
+        # Arrange
+        profiler = Profiler(max_age=1.0)
+        start_ns = profiler.start_ns
+
+        # Act
+        for index in range(10):
+            start = start_ns + index * 500_000_000
+            profiler._add_complete_event(f'event-{index}', start, start + 1000)
+        trace = profiler.trace()
+
+        # Assert
+        self.assertEqual(
+            [event.name for event in trace.events], [f'event-{index}' for index in range(7, 10)])
+
+    def test_idle_threads_are_expired_when_dumped(self):
+        # Arrange
+        profiler = Profiler(max_age=0.2)
+        # Recorded half a second ago by a thread which has been idle since
+        start = profiler.start_ns - 500_000_000
+
+        def record():
+            for index in range(5):
+                profiler._add_complete_event(f'old-{index}', start, start + 1000)
+
+        run_threads(record, 1)
+        profiler._add_complete_event('recent', profiler.clock(), profiler.clock())
+
+        # Act
+        trace = profiler.trace()
+
+        # Assert
+        self.assertEqual([event.name for event in trace.events], ['recent'])
+
+    def test_max_age_alone_is_bounded(self):
+        # Arrange
+        profiler = Profiler(max_age=60.0)
+
+        # Act
+        store = profiler._new_store()
+
+        # Assert
+        self.assertEqual(store.maxlen, DEFAULT_RING_EVENTS)
+
+    def test_columnar_flight_recorder_is_rejected(self):
+        with self.assertRaises(ValueError):
+            Profiler(columnar=True, max_events=10)
+
+
+class ProfilerMinDurationTests(unittest.TestCase):
+
+    def test_short_spans_are_aggregated(self):
+        # Arrange
+        profiler = Profiler(min_duration=1e-3)
+        start_ns = profiler.start_ns
+
+        # Act
+        for duration in (1000, 2000, 3000):
+            profiler._add_complete_event('short', start_ns, start_ns + duration)
+        profiler._add_complete_event('long', start_ns, start_ns + 2_000_000)
+        trace = profiler.trace()
+
+        # Assert
+        self.assertEqual([event.name for event in trace.events], ['long'])
+        self.assertEqual(trace.data['dropped_spans'], {'short': dict(count=3, total=6.0, max=3.0)})
+
+    def test_aggregates_are_merged_across_threads(self):
+        # Arrange
+        profiler = Profiler(min_duration=1.0)
+
+        @profiler.profile
+        def foo():
+            pass
+
+        def work():
+            for _ in range(100):
+                foo()
+
+        # Act
+        run_threads(work, 4)
+        trace = profiler.trace()
+
+        # Assert
+        self.assertEqual(len(trace.events), 0)
+        self.assertEqual(trace.data['dropped_spans'][qualified_name(foo)]['count'], 400)
+
+
+class ProfilerDecoratorTests(unittest.TestCase):
+
+    def test_names_are_module_qualified(self):
+        # Arrange
+        profiler = Profiler()
+
+        class Foo:
+            @profiler.profile(category='method')
+            def bar(self):
+                pass
+
+        # Act
+        Foo().bar()
+        event = profiler.trace().events[0]
+
+        # Assert
+        self.assertEqual(event.name, f'{__name__}.{Foo.__qualname__}.bar')
+        self.assertEqual(event.category, 'method')
+
+    def test_names_and_profiler_are_resolved_once(self):
+        # Arrange
+        profiler = Profiler()
+
+        @profiler.profile
+        def foo():
+            pass
+
+        # Act
+        with patch('trace_events.profiler.qualified_name') as resolve_name, \
+                patch('trace_events.profiler.global_profiler') as resolve_profiler:
+            for _ in range(10):
+                foo()
+
+        # Assert
+        resolve_name.assert_not_called()
+        resolve_profiler.assert_not_called()
+        self.assertEqual(len(profiler.trace().events), 10)
+
+    def test_per_call_overhead_is_bounded(self):
+        # Arrange
+        profiler = Profiler()
+        calls = 2000
+
+        def bare():
+            pass
+
+        decorated = profiler.profile(bare)
+
+        def timed(func) -> float:
+            # Fastest of several runs, the least disturbed by the rest of the machine
+            return min(repeat(func, number=calls, repeat=5, setup=profiler.reset)) / calls
+
+        # Act
+        decorated_time = timed(decorated)
+        recorded = len(profiler.trace().events)
+        overhead = decorated_time - timed(bare)
+
+        # Assert
+        # Two clock reads and one append take a couple of microseconds, the bound leaves room for slow
+        # and busy machines
+        self.assertLess(overhead, 50e-6)
+        self.assertEqual(recorded, calls)
+
+    def test_configure_keeps_decorated_functions_recording(self):
+        # Arrange
+        profiler = Profiler()
+
+        @profiler.profile
+        def foo():
+            pass
+
+        foo()
+
+        # Act
+        profiler.configure(columnar=True)
+        foo()
+
+        # Assert
+        self.assertEqual(len(profiler.trace().events), 1)
+
+
+@unittest.skipUnless(hasattr(signal, 'SIGUSR1'), 'requires SIGUSR1')
+class ProfilerSignalTests(unittest.TestCase):
+
+    def test_save_signal_during_recording_saves_trace(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            # The signals land while the main thread is appending events, holding its buffer lock
+            script = f"""
+                import os, signal, threading, time
+                from trace_events import init_trace, profile
+
+                init_trace(
+                    trace_file_dir={directory!r}, save_at_exit=False, overwrite_trace_files=True,
+                    max_events=1000, save_signal=signal.SIGUSR1)
+
+                @profile
+                def work():
+                    pass
+
+                def send():
+                    for _ in range(20):
+                        os.kill(os.getpid(), signal.SIGUSR1)
+                        time.sleep(0.01)
+
+                sender = threading.Thread(target=send)
+                sender.start()
+                while sender.is_alive():
+                    work()
+            """
+
+            # Act
+            result = run_script(script, timeout=30)
+            with open(path.join(directory, 'trace.json')) as file:
+                trace = load(file)
+
+            # Assert
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertTrue(trace['traceEvents'])
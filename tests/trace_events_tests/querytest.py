@@ -0,0 +1,91 @@
+import unittest
+
+from trace_events.events import CompleteEvent
+from trace_events.storage import ColumnarEvents
+from trace_events.trace import Trace
+
+from .fixtures import make_timeline
+
+
+class TraceQueryTests(unittest.TestCase):
+
+    def test_select_by_keys(self):
+        # Arrange
+        events = make_timeline()
+        query = Trace(events).query()
+
+        # Act
+        by_name = query.select(name='foo')
+        by_name_and_thread = query.select(name='foo', thread_id=1)
+        by_category = query.select(category='io')
+        missing = query.select(name='baz', thread_id=1)
+
+        # Assert
+        self.assertEqual(by_name, [events[1], events[4], events[5]])
+        self.assertEqual(by_name_and_thread, [events[1], events[5]])
+        self.assertEqual(by_category, [events[2]])
+        self.assertEqual(missing, [])
+
+    def test_select_overlapping_time_range(self):
+        # Arrange
+        events = make_timeline()
+        query = Trace(events).query()
+
+        # Act
+        window = query.overlapping(35.0, 72.0)
+        foo_window = query.select(name='foo', start=14.0, end=75.0)
+        thread_window = query.select(thread_id=2, end=40.0)
+
+        # Assert
+        self.assertEqual(window, [events[0], events[2], events[3], events[4]])
+        self.assertEqual(foo_window, [events[1], events[4]])
+        self.assertEqual(thread_window, [events[2], events[3]])
+
+    def test_slowest_events(self):
+        # Arrange
+        events = make_timeline()
+        query = Trace(events).query()
+
+        # Act
+        slowest = query.slowest(3)
+        slowest_foo = query.slowest(2, name='foo')
+        slowest_in_window = query.slowest(2, category='function', start=60.0, end=95.0)
+        slowest_on_thread = query.slowest(5, thread_id=2)
+
+        # Assert
+        self.assertEqual(slowest, [events[0], events[2], events[4]])
+        self.assertEqual(slowest_foo, [events[4], events[1]])
+        self.assertEqual(slowest_in_window, [events[0], events[4]])
+        self.assertEqual(slowest_on_thread, [events[2], events[4]])
+
+    def test_query_is_rebuilt_when_events_are_added(self):
+        # Arrange
+        trace = Trace(make_timeline())
+        first = trace.query()
+        event = CompleteEvent('foo', 200.0, 1.0, process_id=1, thread_id=3)
+
+        # Act
+        same = trace.query()
+        trace.add(event)
+        result = trace.query().select(thread_id=3)
+
+        # Assert
+        self.assertIs(same, first)
+        self.assertEqual(result, [event])
+
+    def test_columnar_events_are_queried(self):
+        # Arrange
+        events = make_timeline()
+        query = Trace(ColumnarEvents(events=events)).query()
+
+        # Act
+        result = query.select(name='foo', start=60.0)
+
+        # Assert
+        self.assertEqual(result, [events[4], events[5]])
+        self.assertEqual(sorted(query.values('thread_id')), [1, 2])
+
+    def test_unknown_field_raises(self):
+        # Act / Assert
+        with self.assertRaises(ValueError):
+            Trace(make_timeline()).query().rows_by('args', None)
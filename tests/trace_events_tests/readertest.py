@@ -0,0 +1,114 @@
+from os import path
+import random
+from tempfile import TemporaryDirectory
+import unittest
+
+from trace_events.index import IntervalIndex
+from trace_events.reader import IndexedTraceReader, index_file_path
+from trace_events.writer import TraceWriter
+
+from .fixtures import make_timeline
+
+
+def write_trace(file_path: str, events: list, compact: bool = False):
+    with open(file_path, 'w') as file:
+        writer = TraceWriter(file, compact=compact)
+        writer.write_events(events)
+        writer.close(dict(foo='bar'))
+
+
+class IntervalIndexTests(unittest.TestCase):
+
+    def test_overlapping_matches_scan(self):
+        # Arrange
+        generator = random.Random(1)
+        starts = [generator.uniform(0.0, 1000.0) for _ in range(500)]
+        ends = [start + generator.expovariate(0.02) for start in starts]
+        index = IntervalIndex(starts, ends)
+        ranges = [(low, low + generator.uniform(0.0, 50.0)) for low in (generator.uniform(-10.0, 1100.0) for _ in range(50))]
+
+        # Act
+        results = [list(index.overlapping(low, high)) for low, high in ranges]
+
+        # Assert
+        for (low, high), rows in zip(ranges, results):
+            expected = [row for row in range(len(starts)) if starts[row] <= high and ends[row] >= low]
+            self.assertEqual(sorted(rows), expected)
+            self.assertEqual([starts[row] for row in rows], sorted(starts[row] for row in rows))
+
+    def test_open_bounds(self):
+        # Arrange
+        index = IntervalIndex([3.0, 1.0, 2.0], [3.5, 1.5, 2.5])
+
+        # Act / Assert
+        self.assertEqual(list(index.overlapping()), [1, 2, 0])
+        self.assertEqual(list(index.overlapping(start=2.0)), [2, 0])
+        self.assertEqual(list(index.overlapping(end=2.0)), [1, 2])
+        self.assertEqual(list(IntervalIndex([], []).overlapping(0.0, 1.0)), [])
+
+
+class IndexedTraceReaderTests(unittest.TestCase):
+
+    def test_events_overlapping_range_are_read(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            file_path = path.join(directory, 'trace.json')
+            events = make_timeline()
+            write_trace(file_path, events)
+
+            # Act
+            with IndexedTraceReader(file_path) as reader:
+                result = list(reader.events(start=35.0, end=60.0))
+                count = len(reader)
+
+            # Assert
+            self.assertEqual(result, [events[0], events[2], events[3]])
+            self.assertEqual(count, 6)
+
+    def test_events_are_filtered_by_thread_and_name(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            file_path = path.join(directory, 'trace.json')
+            events = make_timeline()
+            write_trace(file_path, events, compact=True)
+
+            # Act
+            with IndexedTraceReader(file_path) as reader:
+                by_thread = list(reader.events(thread_id=2, raw=True))
+                by_name = list(reader.events(start=50.0, name='foo'))
+                missing = list(reader.events(name='baz'))
+
+            # Assert
+            self.assertEqual([data['name'] for data in by_thread], ['bar', 'calls', 'foo'])
+            self.assertEqual(by_name, [events[4], events[5]])
+            self.assertEqual(missing, [])
+
+    def test_saved_index_is_reused_until_trace_changes(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            file_path = path.join(directory, 'trace.json')
+            events = make_timeline()
+            write_trace(file_path, events)
+            IndexedTraceReader(file_path).close()
+
+            # Act
+            with IndexedTraceReader(file_path) as reader:
+                reused = reader._index_map is not None
+                first = list(reader.events(end=20.0))
+
+            write_trace(file_path, events[2:])
+            with IndexedTraceReader(file_path) as reader:
+                rebuilt = reader._index_map is None
+                second = list(reader.events(end=20.0))
+
+            # Assert
+            self.assertTrue(path.exists(index_file_path(file_path)))
+            self.assertTrue(reused)
+            self.assertEqual(first, events[:2])
+            self.assertTrue(rebuilt)
+            self.assertEqual(second, [])
+
+    def test_compressed_trace_raises(self):
+        # Act / Assert
+        with self.assertRaises(ValueError):
+            IndexedTraceReader('trace.json.gz')
@@ -0,0 +1,134 @@
+import random
+import unittest
+from unittest.mock import patch
+
+from trace_events.profiler import Profiler
+from trace_events.sampling import AdaptiveSampler, CountSampler, ProbabilitySampler, Sampler
+from trace_events.utils import qualified_name
+
+
+class SamplerTests(unittest.TestCase):
+
+    def test_count_sampler_records_one_in_n(self):
+        # Arrange
+        sampler = CountSampler(10)
+
+        # Act
+        samples = sum(sampler.sample() for _ in range(1000))
+
+        # Assert
+        self.assertEqual(samples, 100)
+        self.assertEqual(sampler.to_json()['rate'], 0.1)
+
+    def test_probability_sampler_records_roughly_probability(self):
+        # Arrange
+        sampler = ProbabilitySampler(0.5)
+
+        # Act
+        samples = sum(sampler.sample() for _ in range(10000))
+
+        # Assert
+        self.assertTrue(4000 < samples < 6000)
+
+    def test_adaptive_sampler_limits_rate(self):
+        # Arrange
+        random.seed(1)
+        now = [0.0]
+        call_period = 1e-4
+        with patch('trace_events.sampling.monotonic', lambda: now[0]):
+            sampler = AdaptiveSampler(max_rate=100, min_period=0.1)
+
+            # Act
+            # 10k calls per second for 10 seconds, the first second lets the rate settle
+            samples = []
+            for _ in range(100000):
+                now[0] += call_period
+                samples.append(sampler.sample())
+        data = sampler.to_json()
+
+        # Assert
+        settled_rate = sum(samples[10000:]) / 9.0
+        self.assertAlmostEqual(settled_rate, 100, delta=15)
+        self.assertEqual(data['samples'], sum(samples))
+        self.assertEqual(data['calls'], 100000)
+
+    def test_adaptive_sampler_reads_clock_every_check_interval(self):
+        # Arrange
+        reads = [0]
+
+        def clock():
+            # Calls much faster than `min_period`, windows stay open over many checks
+            reads[0] += 1
+            return reads[0] * 1e-9
+
+        with patch('trace_events.sampling.monotonic', clock):
+            sampler = AdaptiveSampler(max_rate=100, check_interval=64, min_period=0.1)
+            reads[0] = 0
+
+            # Act
+            for _ in range(64000):
+                sampler.sample()
+
+        # Assert
+        self.assertEqual(reads[0], 1000)
+
+    def test_incomplete_sampler_cannot_be_created(self):
+        # Arrange
+        class NoClone(Sampler):
+            def sample(self) -> bool:
+                return True
+
+            def to_json(self) -> dict:
+                return dict()
+
+        # Act / Assert
+        with self.assertRaises(TypeError):
+            NoClone()
+
+    def test_clone_does_not_share_state(self):
+        # Arrange
+        sampler = CountSampler(2)
+        sampler.sample()
+
+        # Act
+        clone = sampler.clone()
+
+        # Assert
+        self.assertFalse(clone.sample())
+
+
+class ProfilerSamplingTests(unittest.TestCase):
+
+    def test_profile_records_sampled_calls(self):
+        # Arrange
+        profiler = Profiler()
+
+        @profiler.profile(sampler=CountSampler(10))
+        def foo():
+            return 42
+
+        # Act
+        results = [foo() for _ in range(100)]
+        trace = profiler.trace()
+
+        # Assert
+        self.assertEqual(results, [42] * 100)
+        self.assertEqual(len(trace.events), 10)
+        self.assertEqual(trace.data['sampling'][qualified_name(foo)]['rate'], 0.1)
+
+    def test_counter_counts_unsampled_calls(self):
+        # Arrange
+        profiler = Profiler()
+
+        @profiler.counter('foo-calls', sampler=CountSampler(10))
+        def foo():
+            pass
+
+        # Act
+        for _ in range(100):
+            foo()
+        trace = profiler.trace()
+
+        # Assert
+        self.assertEqual(len(trace.events), 10)
+        self.assertEqual(trace.events[-1].args, {'foo-calls': 100})
@@ -0,0 +1,119 @@
+import random
+from threading import Thread
+import unittest
+
+from trace_events.profiler import Profiler
+from trace_events.stats import LatencyHistogram, mann_whitney
+
+
+class LatencyHistogramTests(unittest.TestCase):
+
+    def test_quantiles_are_within_relative_error(self):
+        # Arrange
+        histogram = LatencyHistogram(relative_error=0.01)
+        values = [random.lognormvariate(3, 1) for _ in range(10000)]
+
+        # Act
+        for value in values:
+            histogram.add(value)
+
+        # Assert
+        values.sort()
+        for q in (0.5, 0.9, 0.99):
+            expected = values[int(q * (len(values) - 1))]
+            self.assertAlmostEqual(histogram.quantile(q) / expected, 1.0, delta=0.02)
+
+        self.assertEqual(histogram.count, 10000)
+        self.assertEqual(histogram.minimum, values[0])
+        self.assertEqual(histogram.maximum, values[-1])
+
+    def test_memory_is_bounded(self):
+        # Arrange
+        histogram = LatencyHistogram()
+
+        # Act
+        for index in range(100000):
+            histogram.add(1.0 + index % 1000)
+
+        # Assert
+        self.assertLess(len(histogram._buckets), 400)
+
+    def test_merge_combines_values(self):
+        # Arrange
+        first = LatencyHistogram()
+        second = LatencyHistogram()
+        for value in range(1, 101):
+            (first if value % 2 else second).add(float(value))
+
+        # Act
+        first.merge(second)
+
+        # Assert
+        data = first.to_json()
+        self.assertEqual(data['count'], 100)
+        self.assertEqual(data['sum'], 5050.0)
+        self.assertEqual((data['min'], data['max']), (1.0, 100.0))
+        self.assertAlmostEqual(data['p50'], 50.5, delta=1.0)
+
+    def test_mann_whitney_detects_shift(self):
+        # Arrange
+        rng = random.Random(1)
+        baseline, same, slower = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for _ in range(200):
+            baseline.add(rng.lognormvariate(3, 0.5))
+            same.add(rng.lognormvariate(3, 0.5))
+            slower.add(rng.lognormvariate(3, 0.5) * 1.3)
+
+        # Act
+        p_same = mann_whitney(baseline, same)
+        p_slower = mann_whitney(baseline, slower)
+        p_faster = mann_whitney(slower, baseline)
+
+        # Assert
+        self.assertGreater(p_same, 0.01)
+        self.assertLess(p_slower, 1e-3)
+        self.assertGreater(p_faster, 0.99)
+
+
+class ProfilerStatisticsTests(unittest.TestCase):
+
+    def test_spans_are_recorded_as_statistics(self):
+        # Arrange
+        profiler = Profiler(statistics=True)
+        start_ns = profiler.start_ns
+
+        # Act
+        for duration in range(1, 101):
+            profiler._add_complete_event('foo', start_ns, start_ns + duration * 1000)
+        trace = profiler.trace()
+
+        # Assert
+        self.assertEqual(trace.events, [])
+        self.assertEqual(profiler.statistics()['foo']['count'], 100)
+        self.assertEqual(trace.data['statistics']['foo']['max'], 100.0)
+
+    def test_statistics_are_read_while_threads_record(self):
+        # Arrange
+        profiler = Profiler(statistics=True)
+        start_ns = profiler.start_ns
+
+        def work():
+            # Each name gets a new histogram which may be read before its first duration is added
+            for index in range(2000):
+                profiler._add_complete_event(f'foo-{index % 500}', start_ns, start_ns + 1000)
+
+        threads = [Thread(target=work) for _ in range(4)]
+
+        # Act
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            profiler.statistics()
+        for thread in threads:
+            thread.join()
+        statistics = profiler.statistics()
+
+        # Assert
+        self.assertEqual(len(statistics), 500)
+        self.assertEqual(sum(data['count'] for data in statistics.values()), 8000)
+        self.assertEqual({data['min'] for data in statistics.values()}, {1.0})
@@ -0,0 +1,87 @@
+from json import dumps
+import unittest
+
+from trace_events.events import CompleteEvent, CounterEvent
+from trace_events.json import TraceJsonEncoder
+from trace_events.profiler import Profiler
+from trace_events.storage import ColumnarEvents, StringTable
+from trace_events.trace import Trace
+from trace_events.utils import qualified_name
+
+
+class ColumnarEventsTests(unittest.TestCase):
+
+    def test_events_are_materialized_on_demand(self):
+        # Arrange
+        events = [
+            CompleteEvent('foo', 10, 42, 'function', args=dict(foo=10), process_id=5, thread_id=6),
+            CounterEvent('bar', 20, 'counter', process_id=5, thread_id=7, args=dict(topic=1))]
+
+        # Act
+        store = ColumnarEvents(events=events)
+
+        # Assert
+        self.assertEqual(len(store), 2)
+        self.assertEqual(list(store), events)
+        self.assertEqual(store[-1], events[1])
+        self.assertEqual(store[0:1], events[0:1])
+
+    def test_names_are_interned(self):
+        # Arrange
+        store = ColumnarEvents()
+
+        # Act
+        for index in range(100):
+            store.add_complete_event('foo', index, 1, None, None, 5, 6)
+
+        # Assert
+        self.assertEqual(len(store), 100)
+        self.assertEqual(len(store.strings), 2)
+        self.assertEqual(store[99].category, 'function')
+
+    def test_stores_sharing_strings_are_concatenated(self):
+        # Arrange
+        strings = StringTable()
+        first = ColumnarEvents(strings)
+        second = ColumnarEvents(strings)
+        first.add_complete_event('foo', 1, 1, None, None, 5, 6)
+        second.add_counter_event('bar', 2, None, dict(topic=1), 5, 7)
+
+        # Act
+        merged = ColumnarEvents(strings)
+        merged.extend(first)
+        merged.extend(second)
+
+        # Assert
+        self.assertEqual(list(merged), list(first) + list(second))
+
+    def test_trace_encodes_same_as_event_list(self):
+        # Arrange
+        events = [
+            CompleteEvent('foo', 10.5, 42.25, 'function', process_id=5, thread_id=6),
+            CounterEvent('bar', 20.5, 'counter', process_id=5, thread_id=7, args=dict(topic=1))]
+
+        # Act
+        result = dumps(Trace(ColumnarEvents(events=events)), cls=TraceJsonEncoder)
+        expected = dumps(Trace(events), cls=TraceJsonEncoder)
+
+        # Assert
+        self.assertEqual(result, expected)
+
+    def test_profiler_records_columns(self):
+        # Arrange
+        profiler = Profiler(columnar=True)
+
+        @profiler.profile
+        def foo():
+            pass
+
+        # Act
+        for _ in range(10):
+            foo()
+        trace = profiler.trace()
+
+        # Assert
+        self.assertIsInstance(trace.events, ColumnarEvents)
+        self.assertEqual(len(trace.events), 10)
+        self.assertTrue(all(event.name == qualified_name(foo) for event in trace.events))
@@ -0,0 +1,72 @@
+from io import StringIO
+from json import dumps
+import unittest
+
+from trace_events.stream import TraceEventReader, iter_trace_events
+
+from . import fixtures
+
+
+def make_events(count: int):
+    # Json events, with long numbers to split over the chunks
+    return [event.to_json() for event in fixtures.make_events(count, interval=1.5, duration=12345.678)]
+
+
+class TraceEventReaderTests(unittest.TestCase):
+
+    def test_events_are_read_across_chunk_boundaries(self):
+        # Arrange
+        events = make_events(20)
+        file = StringIO(dumps(dict(traceEvents=events, otherData=dict(foo=1.25))))
+
+        # Act
+        reader = TraceEventReader(file, chunk_size=7)
+        result = list(reader)
+
+        # Assert
+        self.assertEqual(result, events)
+        self.assertEqual(reader.data, dict(otherData=dict(foo=1.25)))
+
+    def test_values_before_events_are_kept(self):
+        # Arrange
+        events = make_events(3)
+        file = StringIO(dumps(dict(displayTimeUnit='ns', count=12345, traceEvents=events)))
+
+        # Act
+        reader = TraceEventReader(file, chunk_size=4)
+        result = list(reader)
+
+        # Assert
+        self.assertEqual(result, events)
+        self.assertEqual(reader.data, dict(displayTimeUnit='ns', count=12345))
+
+    def test_array_format_is_read(self):
+        # Arrange
+        events = make_events(5)
+
+        # Act
+        result = list(iter_trace_events(StringIO(dumps(events)), chunk_size=5))
+
+        # Assert
+        self.assertEqual(result, events)
+
+    def test_empty_traces_are_read(self):
+        # Arrange
+        files = [StringIO('{}'), StringIO('[]'), StringIO('{"traceEvents": [\n],\n"otherData": {}}\n')]
+
+        # Act
+        results = [list(iter_trace_events(file)) for file in files]
+
+        # Assert
+        self.assertEqual(results, [[], [], []])
+
+    def test_truncated_trace_raises(self):
+        # Arrange
+        file = StringIO(dumps(dict(traceEvents=make_events(3)))[:-20])
+
+        # Act
+        reader = TraceEventReader(file, chunk_size=8)
+
+        # Assert
+        with self.assertRaises(ValueError):
+            list(reader)
@@ -0,0 +1,62 @@
+import unittest
+
+import trace_events
+from trace_events.context import trace_switch
+from trace_events.profiler import Profiler
+
+
+class TraceSwitchTests(unittest.TestCase):
+
+    def setUp(self):
+        self._enabled = trace_switch.enabled
+
+    def tearDown(self):
+        trace_switch.enabled = self._enabled
+
+    def test_decorated_functions_follow_runtime_switch(self):
+        # Arrange
+        profiler = Profiler()
+
+        @profiler.profile
+        def foo():
+            return 42
+
+        # Act
+        trace_events.disable_trace()
+        disabled_result = foo()
+        trace_events.enable_trace()
+        enabled_result = foo()
+
+        # Assert
+        self.assertEqual((disabled_result, enabled_result), (42, 42))
+        self.assertEqual(len(profiler.trace().events), 1)
+
+    def test_functions_decorated_while_disabled_can_be_enabled(self):
+        # Arrange
+        profiler = Profiler()
+        trace_events.disable_trace()
+
+        @profiler.counter(topic='foo-calls')
+        def foo():
+            pass
+
+        # Act
+        foo()
+        trace_events.enable_trace()
+        foo()
+
+        # Assert
+        self.assertTrue(trace_events.is_trace_enabled())
+        self.assertEqual([event.args for event in profiler.trace().events], [{'foo-calls': 1}])
+
+    def test_timeit_is_usable_while_disabled(self):
+        # Arrange
+        profiler = Profiler()
+        trace_events.disable_trace()
+
+        # Act
+        with trace_events.timeit('block', profiler=profiler):
+            pass
+
+        # Assert
+        self.assertEqual(profiler.trace().events, [])
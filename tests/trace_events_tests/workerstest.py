@@ -0,0 +1,161 @@
+from concurrent.futures import ProcessPoolExecutor
+from json import dumps, load, loads
+import multiprocessing
+import os
+from os import path
+from tempfile import TemporaryDirectory
+import unittest
+
+from trace_events.context import init_context
+from trace_events.profiler import Profiler, configure_global_profiler, profile
+from trace_events.workers import WorkerTraces
+
+from .profilertest import run_script
+
+
+@profile
+def square(value: int) -> int:
+    return value * value
+
+
+def run_forked(func) -> dict:
+    """ Calls `func` in a forked child, returning its json result """
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.write(write_end, dumps(func()).encode())
+        finally:
+            os._exit(0)
+
+    os.close(write_end)
+    with os.fdopen(read_end) as file:
+        result = loads(file.read())
+    os.waitpid(pid, 0)
+    return result
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+class ForkTests(unittest.TestCase):
+
+    def test_forked_child_starts_new_shard(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            profiler = Profiler(path.join(directory, 'trace.json'))
+            profiler.profile(square)(2)
+
+            def child():
+                profiler.profile(square)(3)
+                events = profiler.trace().events
+                return dict(
+                    pid=os.getpid(), shard_id=profiler.shard_id, process_ids=[event.process_id for event in events],
+                    file_path=profiler.save_trace())
+
+            # Act
+            result = run_forked(child)
+
+            # Assert
+            self.assertEqual(result['shard_id'], result['pid'])
+            self.assertEqual(result['process_ids'], [result['pid']])
+            self.assertEqual(path.basename(result['file_path']), f'trace.{result["pid"]}.json')
+            self.assertIsNone(profiler.shard_id)
+            self.assertEqual(len(profiler.trace().events), 1)
+
+
+class WorkerTracesTests(unittest.TestCase):
+
+    def tearDown(self):
+        init_context()
+        configure_global_profiler()
+
+    def check_pool(self, start_method: str, use_executor: bool):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            init_context(trace_file_dir=directory, overwrite_trace_files=True)
+            configure_global_profiler()
+            context = multiprocessing.get_context(start_method)
+
+            # Act
+            with WorkerTraces('workers.json') as traces:
+                if use_executor:
+                    with ProcessPoolExecutor(2, mp_context=context, initializer=traces.initializer()) as executor:
+                        results = list(executor.map(square, range(10)))
+                else:
+                    with context.Pool(2, initializer=traces.initializer()) as pool:
+                        results = pool.map(square, range(10))
+                shard_directory = traces.directory
+            with open(path.join(directory, 'workers.json')) as file:
+                trace = load(file)
+
+            # Assert
+            self.assertEqual(results, [value * value for value in range(10)])
+            self.assertEqual(len(trace['traceEvents']), 10)
+            self.assertNotIn(os.getpid(), {event['pid'] for event in trace['traceEvents']})
+            self.assertEqual(len(trace['otherData']['merged']), len({event['pid'] for event in trace['traceEvents']}))
+            self.assertFalse(path.exists(shard_directory))
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_forked_executor_workers_are_merged(self):
+        self.check_pool('fork', use_executor=True)
+
+    def test_spawned_pool_workers_are_merged(self):
+        # The pool is terminated on exit, the workers save their shards on the way out
+        self.check_pool('spawn', use_executor=False)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires fork')
+    def test_busy_workers_are_terminated(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            # The pool terminates the workers while they are recording, holding their buffer lock
+            script = f"""
+                import multiprocessing, time
+                from trace_events import WorkerTraces, init_trace, profile
+
+                init_trace(
+                    trace_file_dir={directory!r}, save_at_exit=False, overwrite_trace_files=True,
+                    max_events=1000)
+
+                @profile
+                def step():
+                    pass
+
+                def busy(seconds):
+                    end = time.monotonic() + seconds
+                    while time.monotonic() < end:
+                        step()
+
+                context = multiprocessing.get_context('fork')
+                with WorkerTraces('workers.json') as traces:
+                    pool = context.Pool(2, initializer=traces.initializer())
+                    pool.map_async(busy, [5.0, 5.0])
+                    time.sleep(1.0)
+                    pool.terminate()
+            """
+
+            # Act
+            result = run_script(script, timeout=30)
+            with open(path.join(directory, 'workers.json')) as file:
+                trace = load(file)
+
+            # Assert
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertEqual(len({event['pid'] for event in trace['traceEvents']}), 2)
+
+    def test_missing_trace_directory_is_created(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            trace_directory = path.join(directory, 'out', 'traces')
+            init_context(trace_file_dir=trace_directory)
+            configure_global_profiler()
+
+            # Act
+            with WorkerTraces() as traces:
+                shard_directory = traces.directory
+
+            # Assert
+            self.assertEqual(path.dirname(shard_directory), trace_directory)
+            self.assertTrue(path.isdir(trace_directory))
+
+    def test_initializer_requires_start(self):
+        with self.assertRaises(ValueError):
+            WorkerTraces().initializer()
@@ -0,0 +1,192 @@
+from io import StringIO
+from json import load, loads
+from os import path
+from tempfile import TemporaryDirectory
+from threading import Thread
+import unittest
+
+from trace_events.events import CompleteEvent
+from trace_events.json import TraceJsonDecoder
+from trace_events.loader import load_trace
+from trace_events.profiler import Profiler
+from trace_events.trace import Trace
+from trace_events.writer import TraceWriter, recover_trace_file
+
+from .fixtures import make_events
+
+
+class TraceWriterTests(unittest.TestCase):
+
+    def test_written_trace_round_trips(self):
+        # Arrange
+        file = StringIO()
+        events = make_events(10)
+
+        # Act
+        writer = TraceWriter(file, batch_size=3)
+        writer.write_events(events)
+        writer.close(dict(foo=1))
+        result = loads(file.getvalue(), cls=TraceJsonDecoder)
+
+        # Assert
+        self.assertIsInstance(result, Trace)
+        self.assertEqual(result.events, events)
+        self.assertEqual(result.data, dict(foo=1))
+
+    def test_only_full_batches_are_written_before_close(self):
+        # Arrange
+        file = StringIO()
+
+        # Act
+        writer = TraceWriter(file, batch_size=4)
+        writer.write_events(make_events(10))
+
+        # Assert
+        self.assertEqual(file.getvalue().count('\n'), 1 + 8)
+
+    def test_compact_trace_has_no_field_whitespace(self):
+        # Arrange
+        file = StringIO()
+        events = make_events(3)
+
+        # Act
+        writer = TraceWriter(file, compact=True)
+        writer.write_events(events)
+        writer.close()
+        result = loads(file.getvalue(), cls=TraceJsonDecoder)
+
+        # Assert
+        self.assertNotIn('", "', file.getvalue())
+        self.assertEqual(result.events, events)
+
+    def test_timestamps_are_rounded(self):
+        # Arrange
+        file = StringIO()
+        event = CompleteEvent('foo', 1.23456, 2.34567, process_id=1, thread_id=2)
+
+        # Act
+        writer = TraceWriter(file, timestamp_precision=2)
+        writer.write_event(event)
+        writer.close()
+        result = loads(file.getvalue(), cls=TraceJsonDecoder)
+
+        # Assert
+        self.assertEqual(result.events[0].start_time, 1.23)
+        self.assertEqual(result.events[0].duration, 2.35)
+        self.assertEqual(event.start_time, 1.23456)
+
+    def test_truncated_trace_is_recovered(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            file_path = path.join(directory, 'trace.json')
+            with open(file_path, 'w') as file:
+                writer = TraceWriter(file, batch_size=2)
+                writer.write_events(make_events(5))
+                writer.flush()
+                file.write('{"name": "partial", "ca')
+
+            # Act
+            recovered = recover_trace_file(file_path)
+            with open(file_path) as file:
+                result = load(file, cls=TraceJsonDecoder)
+
+            # Assert
+            self.assertTrue(recovered)
+            self.assertEqual(result.events, make_events(5))
+            self.assertFalse(recover_trace_file(file_path))
+
+
+class ProfilerStreamTests(unittest.TestCase):
+
+    def test_events_are_streamed_in_batches(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            file_path = path.join(directory, 'trace.json')
+            profiler = Profiler(file_path, stream=True, batch_size=10)
+
+            # Act
+            for index in range(25):
+                profiler._add_complete_event('foo', index * 1000, (index + 1) * 1000)
+            buffered = len(profiler.trace().events)
+            saved_path = profiler.save_trace()
+            with open(saved_path) as file:
+                result = load(file, cls=TraceJsonDecoder)
+
+            # Assert
+            self.assertEqual(saved_path, file_path)
+            self.assertEqual(buffered, 5)
+            self.assertEqual(len(result.events), 25)
+            self.assertIn('start_time', result.data)
+
+    def test_reset_writes_buffered_events(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            file_path = path.join(directory, 'trace.json')
+            profiler = Profiler(file_path, stream=True, batch_size=3)
+            for index in range(5):
+                profiler._add_complete_event('foo', index * 1000, (index + 1) * 1000)
+
+            # Act
+            profiler.reset()
+            result = load_trace(file_path)
+
+            # Assert
+            self.assertEqual(len(result.events), 5)
+
+    def test_buffers_flushed_by_other_threads_keep_every_event(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            profiler = Profiler(path.join(directory, 'trace.json'), stream=True, batch_size=7)
+            thread_count, event_count = 4, 5000
+
+            def record():
+                for index in range(event_count):
+                    profiler._add_complete_event('foo', index * 1000, (index + 1) * 1000)
+
+            threads = [Thread(target=record) for _ in range(thread_count)]
+
+            # Act
+            for thread in threads:
+                thread.start()
+            while any(thread.is_alive() for thread in threads):
+                for buffer in list(profiler._buffers):
+                    profiler._flush(buffer)
+            for thread in threads:
+                thread.join()
+            result = load_trace(profiler.save_trace())
+
+            # Assert
+            self.assertEqual(len(result.events), thread_count * event_count)
+
+
+class ProfilerOutputTests(unittest.TestCase):
+
+    def test_compressed_trace_round_trips(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            profiler = Profiler(path.join(directory, 'trace.json.gz'), compact=True)
+            for index in range(10):
+                profiler._add_complete_event('foo', index * 1000, (index + 1) * 1000)
+
+            # Act
+            saved_path = profiler.save_trace()
+            result = load_trace(saved_path)
+
+            # Assert
+            with open(saved_path, 'rb') as file:
+                self.assertEqual(file.read(2), b'\x1f\x8b')
+            self.assertEqual(len(result.events), 10)
+            self.assertEqual(result.events, profiler.trace().events)
+
+    def test_indexed_file_names_keep_extension(self):
+        with TemporaryDirectory() as directory:
+            # Arrange
+            profiler = Profiler(path.join(directory, 'trace.json.gz'))
+
+            # Act
+            first_path = profiler.save_trace()
+            second_path = profiler.save_trace()
+
+            # Assert
+            self.assertEqual(path.basename(first_path), 'trace.json.gz')
+            self.assertEqual(path.basename(second_path), 'trace-0.json.gz')
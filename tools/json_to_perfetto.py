@@ -3,15 +3,12 @@
 import click
 import json
 import os
-import random
 import sys
 
-from perfetto.trace_processor import TraceProcessor
-import perfetto_trace_pb2 as perfetto_trace
-
-
-def gen_uuid(bits=64):
-    return int(random.getrandbits(bits))
+from trace_events.convert import json_to_perfetto
+from trace_events.diff import diff_traces
+from trace_events.files import open_trace_file
+from trace_events.merge import merge_traces
 
 
 @click.group()
@@ -20,69 +17,114 @@ def trace_tools():
 
 
 @trace_tools.command()
-@click.argument("json_file", type=click.File("r"), default=sys.stdin)
+@click.argument("json_file", type=click.Path(exists=True, dir_okay=False, allow_dash=True), default="-")
 @click.argument("output", type=click.File("wb"))
-def convert(json_file, output):
-    with json_file:
-        trace = json.load(json_file)
-
-    pids = set([event["pid"] for event in trace["traceEvents"]])
-    pid_tids = dict()
-    for event in trace["traceEvents"]:
-        if event["tis"] not in pid_tids:
-            pid_tids[event["tis"]] = {"pid": event["pid"], "tid": event["tis"]}
-
-    procs = {pid: {"pid": pid, "uuid": gen_uuid()} for pid in pids}
-    threads = {pid_tid["tid"]: {"pid": pid_tid["pid"], "tid": pid_tid["tid"], "uuid": gen_uuid(), "seq_id": gen_uuid(32)} for pid_tid in pid_tids.values()}
-
-    trace_msg = perfetto_trace.Trace()
-
-    with output:
-        for proc in procs.values():
-            pkt = trace_msg.packet.add()
-            pkt.track_descriptor.uuid = proc["uuid"]
-            pkt.track_descriptor.process.pid = proc["pid"]
-            pkt.track_descriptor.process.process_name = f"Process {proc['pid']}"
-
-        for thd in threads.values():
-            pkt = trace_msg.packet.add()
-            pkt.track_descriptor.uuid = thd["uuid"]
-            pkt.track_descriptor.parent_uuid = procs[thd["pid"]]["uuid"]
-            pkt.track_descriptor.thread.pid = thd["pid"]
-            pkt.track_descriptor.thread.tid = thd["tid"]
-            pkt.track_descriptor.thread.thread_name = f"Thread {thd['tid']}"
-
-        adjust = None
-
-        for event in trace["traceEvents"]:
-            pkt = trace_msg.packet.add()
-            start = int(event["ts"] * 1e3)
-            if start < 0:
-                if adjust is None:
-                    adjust = -start
-                else:
-                    raise Exception("more than one negative timestamp")
-            start = start + adjust
-            pkt.timestamp = start
-            pkt.track_event.type = perfetto_trace.TrackEvent.Type.TYPE_SLICE_BEGIN
-            pkt.track_event.track_uuid = threads[event["tis"]]["uuid"]
-            pkt.track_event.name = event["name"]
-            pkt.track_event.categories.append(event['cat'])
-            pkt.trusted_packet_sequence_id = threads[event["tis"]]["seq_id"]
-
-            pkt = trace_msg.packet.add()
-            end = start + int(event["dur"]*1e3)
-            pkt.timestamp = end
-            pkt.track_event.type = perfetto_trace.TrackEvent.Type.TYPE_SLICE_END
-            pkt.track_event.track_uuid = threads[event["tis"]]["uuid"]
-            pkt.trusted_packet_sequence_id = threads[event["tis"]]["seq_id"]
-
-        output.write(trace_msg.SerializeToString())
+@click.option("--time-offset", type=float, default=None,
+              help="Microseconds added to every timestamp, defaults to shifting a negative first timestamp to 0")
+@click.option("--jobs", "-j", type=int, default=1, show_default=True,
+              help="Number of processes converting chunks of the trace in parallel")
+@click.option("--chunk-size", type=int, default=50_000, show_default=True,
+              help="Number of events per chunk when converting in parallel")
+def convert(json_file, output, time_offset, jobs, chunk_size):
+    """Converts a json trace into a perfetto trace, one event at a time in constant memory"""
+    json_input = sys.stdin if json_file == "-" else open_trace_file(json_file)
+
+    with json_input, output:
+        try:
+            skipped = json_to_perfetto(json_input, output, time_offset, jobs, chunk_size)
+        except ValueError as error:
+            hint = ", see --time-offset" if "time offset" in str(error) else ""
+            raise click.ClickException(f"{error}{hint}")
+
+    for event_type, count in skipped.items():
+        click.echo(f"skipped {count} events with unsupported 'ph': {event_type!r}", err=True)
+
+
+@trace_tools.command()
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.argument("trace_files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--compact", is_flag=True, help="Removes the whitespace from the merged json")
+def merge(output, trace_files, compact):
+    """Merges json traces of separate processes into one trace, aligned by their clock anchors"""
+    try:
+        data = merge_traces(trace_files, output, compact)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+
+    for merged in data["merged"]:
+        if "clock_anchor" not in merged["data"]:
+            click.echo(f"{merged['file']} has no clock anchor, its timestamps were not shifted", err=True)
+
+
+class _DiffError(click.ClickException):
+    """A trace the diff cannot compare, exits like a usage error so CI can tell it from a regression"""
+
+    exit_code = 2
+
+
+def _compare(baseline, candidate, format_value):
+    values = ["-" if stats is None else format_value(stats) for stats in (baseline, candidate)]
+    return " -> ".join(values)
+
+
+def _diff_row(function):
+    def quantile(q):
+        return lambda stats: f"{stats.histogram.quantile(q):,.1f}"
+
+    return (
+        "!" if function.regression else "",
+        function.name,
+        _compare(function.baseline, function.candidate, lambda stats: str(stats.count)),
+        _compare(function.baseline, function.candidate, lambda stats: f"{stats.self_time:,.1f}"),
+        *(_compare(function.baseline, function.candidate, quantile(q)) for q in (0.5, 0.9, 0.99)),
+        "-" if function.change is None else f"{function.change:+.1%}",
+        "-" if function.p_value is None else f"{function.p_value:.2g}")
+
+
+@trace_tools.command()
+@click.argument("baseline", type=click.Path(exists=True, dir_okay=False))
+@click.argument("candidate", type=click.Path(exists=True, dir_okay=False))
+@click.option("--threshold", type=float, default=0.05, show_default=True,
+              help="Relative growth of the median latency ignored as noise")
+@click.option("--alpha", type=float, default=0.01, show_default=True,
+              help="Significance level of the Mann-Whitney U test")
+@click.option("--min-count", type=int, default=10, show_default=True,
+              help="Functions called fewer times in either trace are not tested")
+@click.option("--category", default=None, help="Only compares events of this category, e.g. function")
+@click.option("--limit", type=int, default=20, show_default=True, help="Number of functions listed, 0 for all")
+@click.option("--json", "as_json", is_flag=True, help="Prints the comparison as json")
+def diff(baseline, candidate, threshold, alpha, min_count, category, limit, as_json):
+    """Compares the function timings of two json traces
+
+    Exits with 0 when no function regressed, 1 when any did, and 2 when a trace cannot be compared,
+    e.g. a perfetto or malformed file
+    """
+    try:
+        result = diff_traces(baseline, candidate, threshold, alpha, min_count, category)
+    except (ValueError, OSError) as error:
+        raise _DiffError(str(error))
+
+    if as_json:
+        click.echo(json.dumps(result.to_json(), indent=2))
+    else:
+        header = ("", "function", "calls", "self us", "p50 us", "p90 us", "p99 us", "change", "p-value")
+        rows = [_diff_row(function) for function in result.functions[:limit or None]]
+        widths = [max(len(row[column]) for row in (header, *rows)) for column in range(len(header))]
+        for row in (header, *rows):
+            click.echo("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+
+        click.echo(f"{len(result.regressions)} of {len(result.functions)} functions regressed by more than "
+                   f"{threshold:.0%} at p < {alpha}")
+
+    if result.regressions:
+        sys.exit(1)
 
 
 @trace_tools.command()
 @click.argument("trace_file", type=click.File("r"), default=sys.stdin)
 def check(trace_file):
+    from perfetto.trace_processor import TraceProcessor
+
     with trace_file:
         TraceProcessor(trace_file)
 